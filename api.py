@@ -1,36 +1,154 @@
-from flask import Flask, request, jsonify
-from flask_mysqldb import MySQL
-from flask_bcrypt import Bcrypt
-import jwt, datetime, json, os
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, stream_with_context, url_for
+import datetime, decimal, functools, hashlib, json, logging, math, os, time
+from urllib.parse import urlencode
+
+from auth import RevocationList, TokenCache, create_token, revoke_token, verify_token
+from cache import create_cache, create_item_cache
+from compression import available_encodings, choose_encoding, compress, compress_chunks, is_compressible, mark_encoded
+from config import DEFAULT_CONFIG, from_environ
+from db import ConnectionPool, PoolTimeout
+from hashing import HasherBusy, PasswordHasher
+from metrics import Metrics, slow_query_logger
+from order_queue import TICKET_INSERT, OrderQueue, RetryLater, ticket_lookup_query
+from ratelimit import ConcurrencyLimiter, create_rate_limiter
+from resources import (
+    RESOURCES, TABLE_RESOURCES, bump_versions_query, changed_fields, delete_queries, etag_version, insert_query,
+    insert_values, is_paginated, item_etag, item_query, layout_columns, lock_ids_query, next_cursor, next_page_args,
+    page_tables, parse_page_args, projection, row_snapshot_query, select_query, update_fields, update_query,
+    update_values, validate_insert, validate_order_values, validate_update,
+)
+from sales import (
+    ORDER_COLUMNS, PERIODS, REPORT_ORDERINGS, customer_value_query, daily_revenue_query, forget_statements,
+    order_from_row, order_from_values, orders_snapshot_query, revenue_by_period, summary_row_to_dict,
+    summary_statements, top_books_query, top_customers_query,
+)
+from serializers import create_serializer, list_envelope
+from tabular import FORMATS, MEDIA_TYPES, choose_format, csv_rows, msgpack_document, table_envelope
+from users import UserRegistry
+
+# routes and request hooks; create_app() registers them on an application
+bp = Blueprint("api", __name__)
+
+# per-process components, set up by create_app()
+pool = None
+catalog_cache = None
+item_cache = None
+serializer = None
+metrics = None
+encodings = None
+token_cache = None
+revoked_tokens = None
+hasher = None
+users = None
+order_queue = None
+rate_limiter = None
+request_slots = None
+full_table_slots = None
+
+# MySQLdb (and its client library) is imported on first connect, not when a
+# worker starts
+def connect_mysql(config):
+    import MySQLdb
+
+    return MySQLdb.connect(
+        host=config["MYSQL_HOST"],
+        port=config["MYSQL_PORT"],
+        user=config["MYSQL_USER"],
+        passwd=config["MYSQL_PASSWORD"],
+        db=config["MYSQL_DB"],
+        charset="utf8mb4",
+        init_command="SET time_zone = '+00:00'",
+    )
+
+@bp.before_app_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+# background threads start with the first request rather than in
+# create_app(), so they run in the worker even when the app was created
+# before the server forked
+@bp.before_app_request
+def start_order_queue():
+    if order_queue is not None:
+        order_queue.start()
+
+@bp.after_app_request
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+def response_encoding():
+    return choose_encoding(request.accept_encodings, encodings)
+
+# buffered responses of COMPRESSION_MIN_SIZE bytes or more; list_resource
+# and stream_resource compress their own bodies before this runs
+@bp.after_app_request
+def compress_response(response):
+    if not is_compressible(response, current_app.config["COMPRESSION_MIN_SIZE"]):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = response_encoding()
+    if encoding is None:
+        return response
+
+    with metrics.phase("compress"):
+        response.set_data(compress(encoding, response.get_data(), current_app.config["COMPRESSION_LEVEL"]))
+    mark_encoded(response, encoding)
+    return response
+
+# one pooled connection per request, checked out on first use; queries on it
+# are timed through the metrics wrapper
+def get_db():
+    if "db" not in g:
+        g.db = metrics.connection(pool.get())
+    return g.db
+
+# app context teardown, registered by create_app()
+def release_db(exception):
+    conn = g.pop("db", None)
+    if conn is None:
+        return
+    conn = conn.raw
 
-app = Flask(__name__)
-bcrypt = Bcrypt(app)
-
-app.config["MYSQL_HOST"] = "localhost"
-app.config["MYSQL_USER"] = "root"
-app.config["MYSQL_PASSWORD"] = "root"
-app.config["MYSQL_DB"] = "booksellerdb"
-app.config["SECRET_KEY"] = "ronald"
-
-mysql = MySQL(app)
+    try:
+        # ends the transaction so the next request doesn't inherit its snapshot or locks
+        conn.rollback()
+    except Exception:
+        pool.put(conn, discard=True)
+    else:
+        pool.put(conn)
 
 # error handler
 def handle_error(error_msg, status_code):
     return jsonify({"error": error_msg}), status_code
 
+# 429 / 503 responses telling the client when to come back
+def retry_later(error_msg, status_code, seconds=1):
+    response, status = handle_error(error_msg, status_code)
+    response.headers["Retry-After"] = str(max(1, math.ceil(seconds)))
+    return response, status
+
+@bp.app_errorhandler(PoolTimeout)
+def handle_pool_timeout(error):
+    return retry_later("Database is busy, please retry", 503)
+
+@bp.app_errorhandler(HasherBusy)
+def handle_hasher_busy(error):
+    return retry_later("Too many login attempts in progress, please retry", 503)
+
 # token validation
 def validate_token():
     token = request.headers.get("x-access-token")
 
-    if not token:
-        return None, handle_error("Token is missing!", 401)
-
-    try:
-        data = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
-        current_user = {"user_id": data["user_id"], "role": data["role"]}
-        return current_user, None
-    except Exception:
-        return None, handle_error("Token is invalid!", 401)
+    with metrics.phase("auth"):
+        current_user, error_msg = verify_token(token, current_app.config["SECRET_KEY"], token_cache, revoked_tokens)
+    if error_msg:
+        return None, handle_error(error_msg, 401)
+    return current_user, None
 
 # role validation
 def validate_role(current_user, valid_roles):
@@ -41,51 +159,92 @@ def validate_role(current_user, valid_roles):
         return jsonify({"error": "Unauthorized access"}), 403
     return None
 
-# users.json
-script_dir = os.path.dirname(os.path.abspath(__file__))
-json_file_path = os.path.join(script_dir, "users.json")
-
-users_data = {
-    "users": []
-}
+# admission control, before a request does any work: it takes a slot under
+# the concurrency caps (MAX_CONCURRENT_REQUESTS, and MAX_CONCURRENT_FULL_TABLE
+# for unpaginated lists; 503 when full) and its cost from its client's token
+# bucket (RATE_LIMIT_PER_SECOND; 429 when empty). The client is the user of a
+# valid token, otherwise the remote address. Routes that cost 0 skip both
+FULL_TABLE_ROUTES = {f"/{name}" for name in RESOURCES}
+
+def is_full_table_request():
+    # list reads without limit, cursor or ids, streamed or not
+    return (
+        request.method == "GET"
+        and request.url_rule is not None
+        and request.url_rule.rule in FULL_TABLE_ROUTES
+        and not any(arg in request.args for arg in ("limit", "after_id", "after", "ids"))
+    )
+
+def request_cost():
+    costs = current_app.config["RATE_LIMIT_COSTS"]
+    if request.url_rule is not None and request.url_rule.rule in costs:
+        return costs[request.url_rule.rule]
+    if is_full_table_request():
+        return current_app.config["RATE_LIMIT_FULL_TABLE_COST"]
+    return 1
+
+def client_key():
+    token = request.headers.get("x-access-token")
+    if token:
+        current_user, error_msg = verify_token(token, current_app.config["SECRET_KEY"], token_cache, revoked_tokens)
+        if not error_msg:
+            return f"user:{current_user['user_id']}"
+    return f"ip:{request.remote_addr}"
+
+@bp.before_app_request
+def admit_request():
+    cost = request_cost()
+    if not cost:
+        return None
+
+    g.slots = []
+    limiters = [request_slots, full_table_slots if is_full_table_request() else None]
+    for limiter in limiters:
+        if limiter is None:
+            continue
+        if not limiter.try_acquire():
+            return retry_later("Server is busy, please retry", 503)
+        g.slots.append(limiter)
+
+    if rate_limiter is not None:
+        wait = rate_limiter.acquire(client_key(), cost)
+        if wait:
+            return retry_later("Too many requests, please retry later", 429, wait)
+    return None
 
-def save_to_json():
-    with open(json_file_path, "w") as f:
-        json.dump(users_data, f)
+# after streamed responses too: the request context lasts until the stream ends
+@bp.teardown_app_request
+def release_slots(exception):
+    for limiter in g.pop("slots", ()):
+        limiter.release()
 
-def load_from_json():
-    global users_data
-    try:
-        with open(json_file_path, "r") as f:
-            users_data = json.load(f)
-    except FileNotFoundError:
-        save_to_json() 
+@bp.route("/metrics")
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # user registration
-@app.route("/register", methods=["POST"])
+@bp.route("/register", methods=["POST"])
 def register():
     data = request.get_json()
     if not data or not data.get("username") or not data.get("password") or not data.get("role"):
         return handle_error("Missing required fields: username, password, and role are mandatory", 400)
 
     username = data["username"]
-    password = bcrypt.generate_password_hash(data["password"]).decode("utf-8")
     role = data["role"]
 
-    load_from_json()
+    if users.get(username):
+        return handle_error("Username already exists", 400)
 
-    for user in users_data["users"]:
-        if user["username"] == username:
-            return handle_error("Username already exists", 400)
+    with metrics.phase("bcrypt"):
+        password = hasher.hash(data["password"])
 
-    new_user = {"username": username, "password": password, "role": role}
-    users_data["users"].append(new_user)
-    save_to_json()
+    if not users.add(username, password, role):
+        return handle_error("Username already exists", 400)
 
     return jsonify({"message": "User registered successfully"}), 201
 
 # user login
-@app.route("/login", methods=["POST"])
+@bp.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
     if not data or not data.get("username") or not data.get("password"):
@@ -94,25 +253,306 @@ def login():
     username = data["username"]
     password = data["password"]
 
-    load_from_json()
-
-    for user in users_data["users"]:
-        if user["username"] == username and bcrypt.check_password_hash(user["password"], password):
-            token = jwt.encode(
-                {
-                    "user_id": username,
-                    "role": user["role"],
-                    "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
-                },
-                app.config["SECRET_KEY"],
-                algorithm="HS256",
-            )
-            return jsonify({"token": token}), 200
+    user = users.get(username)
+
+    with metrics.phase("bcrypt"):
+        valid = user is not None and hasher.check(user["password"], password)
+
+    if valid:
+        if hasher.needs_rehash(user["password"]):
+            hasher.rehash(password, lambda password_hash: users.set_password(username, password_hash))
+
+        token = create_token(username, user["role"], current_app.config["SECRET_KEY"])
+        return jsonify({"token": token}), 200
 
     return handle_error("Invalid credentials", 401)
 
+# user logout
+@bp.route("/logout", methods=["POST"])
+def logout():
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    revoke_token(request.headers["x-access-token"], token_cache, revoked_tokens)
+
+    return jsonify({"message": "Logged out successfully"}), 200
+
+# pagination
+def get_page_args(resource):
+    page, error_msg = parse_page_args(request.args, current_app.config["MAX_PAGE_SIZE"], resource)
+    if error_msg:
+        return None, handle_error(error_msg, 400)
+    return page, None
+
+# cache_tags: tables the response is built from; a write to any of them
+# invalidates the cached body
+def list_resource(name, not_found_msg, cache_tags=None):
+    resource = RESOURCES[name]
+
+    page, error = get_page_args(resource)
+    if error:
+        return error
+
+    fmt, error = list_format(page)
+    if error:
+        return error
+    representation = request_cache_key(fmt)
+
+    # expanded responses also embed rows of the joined tables
+    tables = page_tables(resource, page)
+    if cache_tags:
+        cache_tags = tuple(cache_tags) + tuple(TABLE_RESOURCES[table] for table in tables[1:])
+
+    cache_key = None
+    if cache_tags and not page["stream"]:
+        entry, cache_key = catalog_cache.lookup(representation, cache_tags)
+        if entry is not None:
+            etag, last_modified, body = unpack_cache_entry(entry)
+            response = not_modified_response(etag, last_modified)
+            if response is None:
+                response = Response(body, mimetype=MEDIA_TYPES[fmt])
+                set_validators(response, etag, last_modified)
+                encode_cached_body(response, cache_key, body)
+            response.headers["X-Cache"] = "HIT"
+            response.vary.add("Accept")
+            return response
+
+    etag, last_modified = collection_validators(tables, representation)
+    response = not_modified_response(etag, last_modified)
+    if response is not None:
+        response.vary.add("Accept")
+        return response
+
+    query, params = select_query(resource, page)
+    _, layout = projection(resource, page)
+
+    if page["stream"]:
+        response = current_app.make_response(stream_resource(layout, query, params, page["stream"], not_found_msg))
+    else:
+        response = current_app.make_response(build_list_response(layout, query, params, page, fmt, not_found_msg))
+    response.vary.add("Accept")
+
+    if response.status_code == 200:
+        set_validators(response, etag, last_modified)
+        if cache_key:
+            body = response.get_data()
+            catalog_cache.store(cache_key, pack_cache_entry(etag, last_modified, body))
+            encode_cached_body(response, cache_key, body)
+    if cache_key:
+        response.headers["X-Cache"] = "MISS"
+    return response
+
+# compressed bodies are cached next to the plain one, one entry per encoding,
+# so repeat hits are served without compressing again
+def encode_cached_body(response, cache_key, body):
+    if len(body) < current_app.config["COMPRESSION_MIN_SIZE"]:
+        return
+    encoding = response_encoding()
+    if encoding is None:
+        return
+
+    variant_key = f"{cache_key}#{encoding}"
+    data = catalog_cache.fetch(variant_key)
+    if data is None:
+        with metrics.phase("compress"):
+            data = compress(encoding, body, current_app.config["COMPRESSION_LEVEL"])
+        catalog_cache.store(variant_key, data)
+    response.set_data(data)
+    mark_encoded(response, encoding)
+
+# list formats (see tabular.py): ?format= if given, else negotiated from the
+# Accept header; a stream's format is its ?stream= value
+def list_format(page):
+    # returns (format, error response)
+    if page["stream"]:
+        return page["stream"], None
+    fmt = request.args.get("format")
+    if fmt is None:
+        return choose_format(request.accept_mimetypes), None
+    if fmt not in FORMATS:
+        return None, handle_error(f"'format' must be one of: {', '.join(FORMATS)}", 400)
+    return fmt, None
+
+# cache key and ETag input of a list response: URL and format
+def request_cache_key(fmt="json"):
+    key = request.path + "?" + urlencode(sorted(request.args.items(multi=True)))
+    return key if fmt == "json" else f"{key};{fmt}"
+
+def build_list_response(layout, query, params, page, fmt, not_found_msg):
+    cursor = get_db().cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+
+    if not rows and not is_paginated(page):
+        return handle_error(not_found_msg, 404)
+
+    page_links = None
+    if is_paginated(page):
+        cursor_id = next_cursor(page, rows)
+        next_url = None
+        if cursor_id is not None:
+            next_url = url_for(request.endpoint, **next_page_args(page, cursor_id))
+        page_links = (cursor_id, next_url)
+
+    with metrics.phase("encode"):
+        if fmt == "table":
+            body = table_envelope(serializer, layout, serializer.arrays(layout, rows), page_links) + b"\n"
+        elif fmt == "csv":
+            body = csv_rows(layout, rows, header=True)
+        elif fmt == "msgpack":
+            body = msgpack_document(layout, rows, page_links)
+        else:
+            body = serializer.rows(layout, rows)
+            if page_links is not None:
+                body = list_envelope(serializer, body, *page_links)
+            body += b"\n"
+
+    response = Response(body, mimetype=MEDIA_TYPES[fmt])
+    # CSV has no room for the page links
+    if fmt == "csv" and page_links is not None:
+        cursor_id, next_url = page_links
+        if cursor_id is not None:
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+            response.headers["X-Next-Cursor"] = str(cursor_id)
+    return response, 200
+
+# conditional requests
+#
+# Every table has a change counter in Table_Versions (see migrations/) that
+# the write handlers bump inside their transaction. The counter is read in
+# the same transaction as the list query, so the ETag always describes the
+# rows that were sent. If-None-Match / If-Modified-Since hits are answered
+# with 304 before the list query runs.
+def get_collection_version(tables):
+    placeholders = ", ".join(["%s"] * len(tables))
+    cursor = get_db().cursor()
+    cursor.execute(
+        f"SELECT SUM(version), MAX(updated_at), COUNT(*), CURRENT_TIMESTAMP(6) FROM Table_Versions"
+        f" WHERE table_name IN ({placeholders})",
+        tables,
+    )
+    row = cursor.fetchone()
+
+    # untracked table (migration not applied): no validators
+    if not row or row[2] != len(tables):
+        return None
+    return row[0], row[1], row[3]
+
+def bump_versions(*tables):
+    cursor = get_db().cursor()
+    cursor.execute(bump_versions_query(tables), tables)
+
+def collection_validators(tables, representation):
+    version = get_collection_version(tables)
+    if version is None:
+        return None, None
+
+    total, updated_at, now = version
+    digest = hashlib.sha1(representation.encode("utf-8")).hexdigest()[:12]
+    etag = f"{'-'.join(tables).lower()}-{total}-{digest}"
+
+    # Last-Modified and If-Modified-Since are whole-second HTTP dates. While
+    # the database clock is still in the second of the last change, a later
+    # write could get the same date and a client revalidating with it would
+    # miss that write, so only the ETag is sent until the second is over
+    last_modified = updated_at.replace(microsecond=0)
+    if last_modified >= now.replace(microsecond=0):
+        return etag, None
+    # the session runs in UTC (see connect_mysql)
+    return etag, last_modified.replace(tzinfo=datetime.timezone.utc)
+
+def not_modified_response(etag, last_modified):
+    if etag is None:
+        return None
+
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        # last_modified is never in the current second, see collection_validators
+        matched = last_modified <= request.if_modified_since
+    else:
+        return None
+
+    if not matched:
+        return None
+
+    response = Response(status=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+def set_validators(response, etag, last_modified):
+    if etag is not None:
+        # a compressed body is a different representation, so its ETag is weak
+        response.set_etag(etag, weak="Content-Encoding" in response.headers)
+    if last_modified is not None:
+        response.last_modified = last_modified
+
+def pack_cache_entry(etag, last_modified, body):
+    header = f"{etag or ''}\n{last_modified.isoformat() if last_modified else ''}\n"
+    return header.encode("utf-8") + body
+
+def unpack_cache_entry(entry):
+    etag, last_modified, body = entry.split(b"\n", 2)
+    etag = etag.decode("utf-8") or None
+    last_modified = datetime.datetime.fromisoformat(last_modified.decode("utf-8")) if last_modified else None
+    return etag, last_modified, body
+
+# streaming: rows are read through a server-side cursor in batches of
+# STREAM_BATCH_SIZE and written out as they arrive, so memory stays flat
+def stream_resource(layout, query, params, fmt, not_found_msg):
+    import MySQLdb.cursors
+
+    cursor = get_db().cursor(MySQLdb.cursors.SSCursor)
+    cursor.execute(query, params)
+    batch_size = current_app.config["STREAM_BATCH_SIZE"]
+
+    rows = cursor.fetchmany(batch_size)
+    if not rows:
+        cursor.close()
+        return handle_error(not_found_msg, 404)
+
+    encode = serializer.array(layout) if fmt == "table" else serializer.row(layout)
+
+    # one chunk per batch
+    def generate(rows):
+        try:
+            if fmt == "json":
+                yield b"["
+            elif fmt == "table":
+                yield b'{"columns":' + serializer.dumps(layout_columns(layout)) + b',"rows":['
+            first = True
+            while rows:
+                if fmt == "csv":
+                    yield csv_rows(layout, rows, header=first)
+                elif fmt == "ndjson":
+                    yield b"\n".join([encode(row) for row in rows]) + b"\n"
+                else:
+                    yield (b"" if first else b",") + b",".join([encode(row) for row in rows])
+                first = False
+                rows = cursor.fetchmany(batch_size)
+            if fmt == "json":
+                yield b"]"
+            elif fmt == "table":
+                yield b"]}"
+        finally:
+            cursor.close()
+
+    # compressed chunk by chunk, whatever the size
+    body = generate(rows)
+    encoding = response_encoding()
+    if encoding is not None:
+        body = compress_chunks(encoding, current_app.config["COMPRESSION_LEVEL"], body)
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else MEDIA_TYPES[fmt]
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        mark_encoded(response, encoding)
+    return response
+
 # index
-@app.route("/")
+@bp.route("/")
 def hello_world():
     return """
     <h1>WELCOME TO BOOKSELLER DATABASE</h1>
@@ -126,46 +566,15 @@ def hello_world():
     """
 
 # GET
-@app.route("/authors")
+@bp.route("/authors")
 def get_authors():
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Authors")
-    authors = cursor.fetchall()
-
-    if not authors:
-        return handle_error("No authors found", 404)
-
-    authors_list = [
-        { 
-            "author_FirstName": author[1], 
-            "author_LastName": author[2]
-        }
-        for author in authors
-    ]
-    
-    return jsonify(authors_list), 200
+    return list_resource("authors", "No authors found", cache_tags=("authors",))
 
-@app.route("/books")
+@bp.route("/books")
 def get_books():
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Books")
-    books = cursor.fetchall()
-
-    if not books:
-        return handle_error("No books found", 404)
-
-    books_list = [
-        {
-            "book_Title": book[1], 
-            "ISBN": book[3], 
-            "publication_Date": book[4]
-        }
-        for book in books
-    ]
-    
-    return jsonify(books_list), 200
+    return list_resource("books", "No books found", cache_tags=("books",))
 
-@app.route("/customers")
+@bp.route("/customers")
 def customers():
     current_user, error = validate_token()
     if error:
@@ -175,26 +584,9 @@ def customers():
     if role_error:
         return role_error
 
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Customers")
-    customers = cursor.fetchall()
-
-    if not customers:
-        return handle_error("No customers found", 404)
-
-    customers_list = [
-        {
-            "customer_ID": customer[0],
-            "customer_Name": customer[1],
-            "customer_Phone": customer[2],
-            "customer_Email": customer[3]
-        }
-        for customer in customers
-    ]
-    
-    return jsonify(customers_list), 200
+    return list_resource("customers", "No customers found")
 
-@app.route("/orders")
+@bp.route("/orders")
 def get_orders():
     current_user, error = validate_token()
     if error:
@@ -204,61 +596,141 @@ def get_orders():
     if role_error:
         return role_error
 
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Orders")
-    orders = cursor.fetchall()
-
-    if not orders:
-        return handle_error("No orders found", 404)
-
-    orders_list = [
-        {
-            "order_ID": order[0], 
-            "order_Date": order[1], 
-            "order_Value": order[2], 
-            "customer_ID": order[3], 
-            "book_ID": order[4], 
-        }
-        for order in orders
-    ]
-    
-    return jsonify(orders_list), 200
+    return list_resource("orders", "No orders found")
+
+# single items: a primary key lookup, cached per resource in item_cache
+# until the item is written. The ETag is the row version (see If-Match below).
+def get_item(name, item_id):
+    resource = RESOURCES[name]
+
+    entry = item_cache.get(name, item_id)
+    if entry is not None:
+        etag, _, body = unpack_cache_entry(entry)
+        x_cache = "HIT"
+    else:
+        query, layout = item_query(resource)
+        cursor = get_db().cursor()
+        cursor.execute(query, (item_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return handle_error(f"{resource['label']} not found", 404)
+
+        with metrics.phase("encode"):
+            body = serializer.row(layout)(row) + b"\n"
+        etag = item_etag(resource, item_id, row[-1])
+        item_cache.put(name, item_id, pack_cache_entry(etag, None, body))
+        x_cache = "MISS"
+
+    response = not_modified_response(etag, None)
+    if response is None:
+        response = Response(body, mimetype="application/json")
+        set_validators(response, etag, None)
+    response.headers["X-Cache"] = x_cache
+    return response
+
+def invalidate_items(resource, changed_tables, *item_ids):
+    # the deleted items, and every cached item of a table whose references
+    # to them were set to NULL
+    item_cache.invalidate(resource["name"], *item_ids)
+    for table in changed_tables:
+        if table != resource["table"]:
+            item_cache.invalidate(TABLE_RESOURCES[table])
+
+@bp.route("/authors/<int:author_id>")
+def get_author(author_id):
+    return get_item("authors", author_id)
+
+@bp.route("/books/<int:book_id>")
+def get_book(book_id):
+    return get_item("books", book_id)
+
+@bp.route("/customers/<int:customer_id>")
+def get_customer(customer_id):
+    current_user, error = validate_token()
+    if error:
+        return error
 
-# POST
-@app.route("/authors", methods=["POST"])
-def add_author():
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return get_item("customers", customer_id)
+
+@bp.route("/orders/<int:order_id>")
+def get_order(order_id):
     current_user, error = validate_token()
     if error:
         return error
-    
+
     role_error = validate_role(current_user, ['manager', 'staff'])
     if role_error:
         return role_error
 
+    return get_item("orders", order_id)
+
+# optimistic concurrency: every row has a row_Version that each write bumps,
+# sent as the item's ETag. A write with If-Match reads the row without
+# locking it and applies only if the version is still the same, so a
+# conflicting edit gets a 412 instead of overwriting or waiting on a lock.
+def if_match_version(resource, item_id):
+    # (expected row version, or None without If-Match or with If-Match: *; error response)
+    if not request.if_match or request.if_match.star_tag:
+        return None, None
+    for etag in request.if_match.as_set():
+        version = etag_version(resource, item_id, etag)
+        if version is not None:
+            return version, None
+    return None, precondition_failed(resource)
+
+def precondition_failed(resource):
+    return handle_error(f"{resource['label']} was modified by another request", 412)
+
+def read_row(resource, columns, item_id, lock=True):
+    # ({column: value}, row version), or (None, None) if there is no such row
+    cursor = get_db().cursor()
+    cursor.execute(row_snapshot_query(resource, columns, lock), (item_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, None
+    return dict(zip(columns, row)), row[-1]
+
+# sales summaries (see sales.py), written in the same transaction as the
+# order change they reflect
+def update_sales(old_orders=(), new_orders=()):
+    cursor = get_db().cursor()
+    for query, rows in summary_statements(old_orders, new_orders):
+        cursor.executemany(query, rows)
+
+def forget_sales(resource, *item_ids):
+    cursor = get_db().cursor()
+    for query, params in forget_statements(resource, *item_ids):
+        cursor.execute(query, params)
+
+# POST
+def add_item(name):
+    resource = RESOURCES[name]
     data = request.get_json()
-    
-    if not data or not data.get("author_FirstName") or not data.get("author_LastName"):
-        return handle_error("Missing required fields: author_FirstName and author_LastName are mandatory", 400)
-    
-    author_FirstName = data["author_FirstName"]
-    author_LastName = data["author_LastName"]
+
+    error_msg = validate_insert(resource, data)
+    if error_msg:
+        return handle_error(error_msg, 400)
 
     try:
-        cursor = mysql.connection.cursor()
-        
-        query = """
-        INSERT INTO Authors (author_FirstName, author_LastName) 
-        VALUES (%s, %s)
-        """
-        cursor.execute(query, (author_FirstName, author_LastName))
-        mysql.connection.commit()
-        
-        return jsonify({"message": "Author added successfully"}), 201
+        cursor = get_db().cursor()
+        values = insert_values(resource, data)
+        cursor.execute(insert_query(resource), values)
+        if name == "orders":
+            update_sales(new_orders=[order_from_values(values)])
+        bump_versions(resource["table"])
+        get_db().commit()
+        catalog_cache.invalidate(name)
+
+        return jsonify({"message": f"{resource['label']} added successfully"}), 201
     except Exception as e:
         return handle_error(f"An error occurred: {str(e)}", 500)
 
-@app.route("/books", methods = ["POST"])
-def add_book():
+@bp.route("/authors", methods=["POST"])
+def add_author():
     current_user, error = validate_token()
     if error:
         return error
@@ -267,31 +739,21 @@ def add_book():
     if role_error:
         return role_error
 
-    data = request.get_json()
-    
-    if not data or not data.get("book_Title") or not data.get("ISBN"):
-        return handle_error("Missing required fields: book_Title and ISBN are mandatory", 400)
-    
-    book_Title = data["book_Title"]
-    author_ID = data["author_ID"]
-    ISBN = data["ISBN"]
-    publication_Date = data.get("publication_Date")
+    return add_item("authors")
 
-    try:
-        cursor = mysql.connection.cursor()
-        
-        query = """
-        INSERT INTO Books (book_Title, author_ID, ISBN, publication_Date) 
-        VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (book_Title, author_ID, ISBN, publication_Date))
-        mysql.connection.commit()
-        
-        return jsonify({"message": "Book added successfully"}), 201
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
+@bp.route("/books", methods=["POST"])
+def add_book():
+    current_user, error = validate_token()
+    if error:
+        return error
     
-@app.route("/customers", methods = ["POST"])
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return add_item("books")
+
+@bp.route("/customers", methods=["POST"])
 def add_customer():
     current_user, error = validate_token()
     if error:
@@ -301,30 +763,9 @@ def add_customer():
     if role_error:
         return role_error
 
-    data = request.get_json()
-    
-    if not data or not data.get("customer_Name") or not data.get("customer_Phone"):
-        return handle_error("Missing required fields: customer_Name and customer_Phone are mandatory", 400)
-    
-    customer_Name = data["customer_Name"]
-    customer_Phone = data["customer_Phone"]
-    customer_Email = data["customer_Email"]
+    return add_item("customers")
 
-    try:
-        cursor = mysql.connection.cursor()
-        
-        query = """
-        INSERT INTO Customers (customer_Name, customer_Phone, customer_Email) 
-        VALUES (%s, %s, %s)
-        """
-        cursor.execute(query, (customer_Name, customer_Phone, customer_Email))
-        mysql.connection.commit()
-        
-        return jsonify({"message": "Customer added successfully"}), 201
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
-    
-@app.route("/orders", methods = ["POST"])
+@bp.route("/orders", methods=["POST"])
 def add_order():
     current_user, error = validate_token()
     if error:
@@ -334,115 +775,265 @@ def add_order():
     if role_error:
         return role_error
 
+    if order_queue is not None:
+        return queue_order()
+    return add_item("orders")
+
+# write-behind orders (ORDER_QUEUE_LOG): POST /orders answers 202 with a
+# ticket as soon as the order is in the queue's journal, and the queue's
+# flusher thread inserts queued orders in batches (see order_queue.py)
+def queue_order():
+    resource = RESOURCES["orders"]
     data = request.get_json()
-    
-    if not data or not data.get("order_Date") or not data.get("order_Value") or not data.get("customer_ID") or not data.get("book_ID"):
-        return handle_error("Missing required fields: order_Date, order_Value, customer_ID, and book_ID are mandatory", 400)
-    
-    order_Date = data["order_Date"]
-    order_Value = data["order_Value"]
-    customer_ID = data["customer_ID"]
-    book_ID = data["book_ID"]
+
+    error_msg = validate_insert(resource, data) or validate_order_values(data)
+    if error_msg:
+        return handle_error(error_msg, 400)
+
+    ticket = order_queue.enqueue(dict(zip(resource["writable"], insert_values(resource, data))))
+    response = jsonify({"message": "Order queued", "ticket": ticket, "status": "queued"})
+    response.headers["Location"] = url_for(".get_order_ticket", ticket=ticket)
+    return response, 202
+
+# MySQL error codes worth retrying a batch for: can't connect (2002, 2003),
+# server gone / connection lost (2006, 2013), lock wait timeout (1205) and
+# deadlock (1213). Anything else, e.g. a bad value (1292, 1366), fails the
+# order at fault instead of holding up the ones behind it
+RETRYABLE_MYSQL_ERRORS = {2002, 2003, 2006, 2013, 1205, 1213}
+
+def write_queued_orders(app, batch):
+    # batch: [(ticket, order)]; returns {ticket: order_ID}. One transaction,
+    # on the flusher thread, so it needs its own app context for get_db()
+    import MySQLdb
 
     try:
-        cursor = mysql.connection.cursor()
-        
-        query = """
-        INSERT INTO Orders (order_Date, order_Value, customer_ID, book_ID) 
-        VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (order_Date, order_Value, customer_ID, book_ID))
-        mysql.connection.commit()
-        
-        return jsonify({"message": "Order added successfully"}), 201
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
-    
-# PUT
-@app.route("/authors/<int:author_id>", methods=["PUT"])
-def update_author(author_id):
+        return insert_queued_orders(app, batch)
+    except MySQLdb.OperationalError as e:
+        if e.args and e.args[0] in RETRYABLE_MYSQL_ERRORS:
+            raise RetryLater(str(e)) from e
+        raise
+
+def insert_queued_orders(app, batch):
+    resource = RESOURCES["orders"]
+    tickets = [ticket for ticket, _ in batch]
+
+    with app.app_context():
+        cursor = get_db().cursor()
+        cursor.execute(ticket_lookup_query(len(tickets)), tickets)
+        # already written by a flush that crashed before recording it
+        order_ids = dict(cursor.fetchall())
+
+        new_orders = []
+        for ticket, order in batch:
+            if ticket in order_ids:
+                continue
+            values = insert_values(resource, order)
+            cursor.execute(insert_query(resource), values)
+            order_ids[ticket] = cursor.lastrowid
+            new_orders.append((ticket, values))
+
+        if new_orders:
+            cursor.executemany(TICKET_INSERT, [(ticket, order_ids[ticket]) for ticket, _ in new_orders])
+            update_sales(new_orders=[order_from_values(values) for _, values in new_orders])
+            bump_versions(resource["table"])
+        get_db().commit()
+
+    if new_orders:
+        catalog_cache.invalidate("orders")
+    return order_ids
+
+@bp.route("/orders/tickets/<ticket>")
+def get_order_ticket(ticket):
     current_user, error = validate_token()
     if error:
         return error
-    
+
     role_error = validate_role(current_user, ['manager', 'staff'])
     if role_error:
         return role_error
 
-    data = request.get_json()
+    status = order_queue.status(ticket) if order_queue is not None else None
+    if status is None:
+        return handle_error("Ticket not found", 404)
+    if status["status"] == "queued":
+        return jsonify(status), 202
+    if status["status"] == "created":
+        status["order"] = url_for(".get_order", order_id=status["order_ID"])
+    return jsonify(status), 200
+
+# bulk POST
+#
+# Accepts a JSON array or an NDJSON body (Content-Type: application/x-ndjson).
+# Every row is validated before anything is written; if all rows are valid
+# they are inserted with executemany in chunks of BULK_CHUNK_SIZE inside a
+# single transaction with one commit.
+def parse_bulk_rows():
+    body = request.get_data()
+
+    if request.mimetype == "application/x-ndjson":
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+        return rows, None
 
-    if not data or (not data.get("author_FirstName") and not data.get("author_LastName")):
-        return handle_error("At least one of 'author_FirstName' or 'author_LastName' must be provided", 400)
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        return None, handle_error("Request body must be a JSON array or NDJSON", 400)
 
-    author_FirstName = data.get("author_FirstName")
-    author_LastName = data.get("author_LastName")
+    if not isinstance(rows, list):
+        return None, handle_error("Request body must be a JSON array or NDJSON", 400)
+    return rows, None
+
+def bulk_insert(name):
+    resource = RESOURCES[name]
+
+    rows, error = parse_bulk_rows()
+    if error:
+        return error
+
+    if not rows:
+        return handle_error("No rows provided", 400)
+
+    if len(rows) > current_app.config["BULK_MAX_ROWS"]:
+        return handle_error(f"Too many rows: at most {current_app.config['BULK_MAX_ROWS']} per request", 413)
+
+    errors = [(index, validate_insert(resource, row)) for index, row in enumerate(rows)]
+    errors = [(index, message) for index, message in errors if message]
+    if errors:
+        return jsonify({
+            "error": f"{len(errors)} of {len(rows)} rows are invalid, nothing was inserted",
+            "results": [{"index": index, "status": "invalid", "error": message} for index, message in errors],
+        }), 400
+
+    query = insert_query(resource)
+    values = [insert_values(resource, row) for row in rows]
+    chunk_size = current_app.config["BULK_CHUNK_SIZE"]
 
     try:
-        cursor = mysql.connection.cursor()
-
-        query = """
-        UPDATE Authors 
-        SET author_FirstName = %s, author_LastName = %s 
-        WHERE author_ID = %s
-        """
-        
-        cursor.execute(query, (author_FirstName if author_FirstName else "", 
-                               author_LastName if author_LastName else "", 
-                               author_id))
-        mysql.connection.commit()
-        
-        if cursor.rowcount == 0:
-            return handle_error("Author not found", 404)
-
-        return jsonify({"message": "Author updated successfully"}), 200
+        cursor = get_db().cursor()
+        for start in range(0, len(values), chunk_size):
+            cursor.executemany(query, values[start:start + chunk_size])
+        if name == "orders":
+            update_sales(new_orders=[order_from_values(row) for row in values])
+        bump_versions(resource["table"])
+        get_db().commit()
     except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
-    
-@app.route("/books/<int:book_id>", methods=["PUT"])
-def update_book(book_id):
+        get_db().rollback()
+        return handle_error(f"An error occurred, nothing was inserted: {str(e)}", 500)
+
+    catalog_cache.invalidate(name)
+
+    return jsonify({
+        "message": f"{len(rows)} {name} added successfully",
+        "results": [{"index": index, "status": "created"} for index in range(len(rows))],
+    }), 201
+
+@bp.route("/authors/bulk", methods=["POST"])
+def add_authors_bulk():
     current_user, error = validate_token()
     if error:
         return error
-    
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return bulk_insert("authors")
+
+@bp.route("/books/bulk", methods=["POST"])
+def add_books_bulk():
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return bulk_insert("books")
+
+@bp.route("/customers/bulk", methods=["POST"])
+def add_customers_bulk():
+    current_user, error = validate_token()
+    if error:
+        return error
+
     role_error = validate_role(current_user, ['manager', 'staff'])
     if role_error:
         return role_error
 
+    return bulk_insert("customers")
+
+@bp.route("/orders/bulk", methods=["POST"])
+def add_orders_bulk():
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return bulk_insert("orders")
+
+# PUT
+# PUT and PATCH both update only the fields in the body; fields whose value
+# is unchanged are left out of the UPDATE, and a request that changes
+# nothing writes nothing
+def update_item(name, item_id):
+    resource = RESOURCES[name]
     data = request.get_json()
 
-    if not data or (not data.get("book_Title") and not data.get("ISBN") and not data.get("author_ID") and not data.get("publication_Date")):
-        return handle_error("At least one of 'book_Title', 'ISBN', 'author_ID', or 'publication_Date' must be provided", 400)
+    error_msg = validate_update(resource, data)
+    if error_msg:
+        return handle_error(error_msg, 400)
 
-    book_Title = data.get("book_Title")
-    author_ID = data.get("author_ID")
-    ISBN = data.get("ISBN")
-    publication_Date = data.get("publication_Date")
+    expected, error = if_match_version(resource, item_id)
+    if error:
+        return error
+
+    fields = update_fields(resource, data)
+    # orders read every column for the sales summaries
+    columns = ORDER_COLUMNS if name == "orders" else tuple(fields)
 
     try:
-        cursor = mysql.connection.cursor()
-
-        query = """
-        UPDATE Books
-        SET book_Title = %s, author_ID = %s, ISBN = %s, publication_Date = %s
-        WHERE book_ID = %s
-        """
-        
-        cursor.execute(query, (book_Title if book_Title else "", 
-                               author_ID if author_ID else "", 
-                               ISBN if ISBN else "", 
-                               publication_Date if publication_Date else "", 
-                               book_id))
-        mysql.connection.commit()
-        
-        if cursor.rowcount == 0:
-            return handle_error("Book not found", 404)
-
-        return jsonify({"message": "Book updated successfully"}), 200
+        current, version = read_row(resource, columns, item_id, lock=expected is None)
+        if current is None:
+            return handle_error(f"{resource['label']} not found", 404)
+        if expected is not None and version != expected:
+            return precondition_failed(resource)
+
+        changes = changed_fields(current, fields)
+        if changes:
+            cursor = get_db().cursor()
+            cursor.execute(update_query(resource, changes), update_values(changes, item_id, version))
+            if cursor.rowcount == 0:
+                # changed after an unlocked (If-Match) read
+                get_db().rollback()
+                return precondition_failed(resource)
+            if name == "orders":
+                update_sales([current], [dict(current, **changes)])
+            bump_versions(resource["table"])
+            get_db().commit()
+            catalog_cache.invalidate(name)
+            item_cache.invalidate(name, item_id)
+            version += 1
+
+        response = jsonify({"message": f"{resource['label']} updated successfully", "changed": list(changes)})
+        response.set_etag(item_etag(resource, item_id, version))
+        return response, 200
     except Exception as e:
+        get_db().rollback()
         return handle_error(f"An error occurred: {str(e)}", 500)
-    
-@app.route("/customers/<int:customer_id>", methods=["PUT"])
-def update_customer(customer_id):
+
+@bp.route("/authors/<int:author_id>", methods=["PUT", "PATCH"])
+def update_author(author_id):
     current_user, error = validate_token()
     if error:
         return error
@@ -451,38 +1042,33 @@ def update_customer(customer_id):
     if role_error:
         return role_error
 
-    data = request.get_json()
+    return update_item("authors", author_id)
 
-    if not data or (not data.get("customer_Name") and not data.get("customer_Phone") and not data.get("customer_Email")):
-        return handle_error("At least one of 'customer_Name', 'customer_Phone', or 'customer_Email' must be provided", 400)
+@bp.route("/books/<int:book_id>", methods=["PUT", "PATCH"])
+def update_book(book_id):
+    current_user, error = validate_token()
+    if error:
+        return error
+    
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
 
-    customer_Name = data.get("customer_Name")
-    customer_Phone = data.get("customer_Phone")
-    customer_Email = data.get("customer_Email")
+    return update_item("books", book_id)
 
-    try:
-        cursor = mysql.connection.cursor()
-
-        query = """
-        UPDATE Customers
-        SET customer_Name = %s, customer_Phone = %s, customer_Email = %s
-        WHERE customer_ID = %s
-        """
-        
-        cursor.execute(query, (customer_Name if customer_Name else "", 
-                               customer_Phone if customer_Phone else "", 
-                               customer_Email if customer_Email else "", 
-                               customer_id))
-        mysql.connection.commit()
-        
-        if cursor.rowcount == 0:
-            return handle_error("Customer not found", 404)
-
-        return jsonify({"message": "Customer updated successfully"}), 200
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
+@bp.route("/customers/<int:customer_id>", methods=["PUT", "PATCH"])
+def update_customer(customer_id):
+    current_user, error = validate_token()
+    if error:
+        return error
+    
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return update_item("customers", customer_id)
 
-@app.route("/orders/<int:order_id>", methods=["PUT"])
+@bp.route("/orders/<int:order_id>", methods=["PUT", "PATCH"])
 def update_order(order_id):
     current_user, error = validate_token()
     if error:
@@ -492,41 +1078,60 @@ def update_order(order_id):
     if role_error:
         return role_error
 
-    data = request.get_json()
-
-    if not data or (not data.get("order_Date") and not data.get("order_Value") and not data.get("customer_ID") and not data.get("book_ID")):
-        return handle_error("At least one of 'order_Date', 'order_Value', 'customer_ID', or 'book_ID' must be provided", 400)
+    return update_item("orders", order_id)
 
-    order_Date = data.get("order_Date")
-    order_Value = data.get("order_Value")
-    customer_ID = data.get("customer_ID")
-    book_ID = data.get("book_ID")
+# DELETE
+#
+# The references are nulled and the row deleted in one transaction with one
+# commit, so a failure leaves nothing half-done and a missing row is rolled
+# back before anything else is written. With If-Match the DELETE also
+# checks the row version.
+def delete_item(name, item_id):
+    resource = RESOURCES[name]
+    referencing = [table for table, _ in resource["references"]]
+
+    expected, error = if_match_version(resource, item_id)
+    if error:
+        return error
 
     try:
-        cursor = mysql.connection.cursor()
-
-        query = """
-        UPDATE Orders
-        SET order_Date = %s, order_Value = %s, customer_ID = %s, book_ID = %s
-        WHERE order_ID = %s
-        """
-        
-        cursor.execute(query, (order_Date if order_Date else "", 
-                               order_Value if order_Value else "", 
-                               customer_ID if customer_ID else "", 
-                               book_ID if book_ID else "", 
-                               order_id))
-        mysql.connection.commit()
-        
-        if cursor.rowcount == 0:
-            return handle_error("Order not found", 404)
-
-        return jsonify({"message": "Order updated successfully"}), 200
+        if name == "orders" or expected is not None:
+            current, version = read_row(resource, ORDER_COLUMNS if name == "orders" else (), item_id, lock=expected is None)
+            if current is None:
+                return handle_error(f"{resource['label']} not found", 404)
+            if expected is not None and version != expected:
+                return precondition_failed(resource)
+            if name == "orders":
+                update_sales(old_orders=[current])
+        if name != "orders":
+            forget_sales(resource, item_id)
+
+        cursor = get_db().cursor()
+        queries = delete_queries(resource, versioned=expected is not None)
+        changed = []
+        for query, table in zip(queries, referencing + [resource["table"]]):
+            params = (item_id, expected) if query is queries[-1] and expected is not None else (item_id,)
+            cursor.execute(query, params)
+            if cursor.rowcount:
+                changed.append(table)
+
+        if resource["table"] not in changed:
+            get_db().rollback()
+            if expected is not None:
+                return precondition_failed(resource)
+            return handle_error(f"{resource['label']} not found", 404)
+
+        bump_versions(*changed)
+        get_db().commit()
     except Exception as e:
+        get_db().rollback()
         return handle_error(f"An error occurred: {str(e)}", 500)
-    
-# DELETE
-@app.route("/authors/<int:author_id>", methods=["DELETE"])
+
+    catalog_cache.invalidate(*[TABLE_RESOURCES[table] for table in changed])
+    invalidate_items(resource, changed, item_id)
+    return jsonify({"message": f"{resource['label']} deleted successfully"}), 200
+
+@bp.route("/authors/<int:author_id>", methods=["DELETE"])
 def delete_author(author_id):
     current_user, error = validate_token()
     if error:
@@ -536,26 +1141,34 @@ def delete_author(author_id):
     if role_error:
         return role_error
 
-    try:
-        cursor = mysql.connection.cursor()
-
-        update_books_query = "UPDATE Books SET author_ID = NULL WHERE author_ID = %s"
-        cursor.execute(update_books_query, (author_id,))
-        mysql.connection.commit()
+    return delete_item("authors", author_id)
 
-        delete_author_query = "DELETE FROM Authors WHERE author_ID = %s"
-        cursor.execute(delete_author_query, (author_id,))
-        mysql.connection.commit()
+@bp.route("/books/<int:book_id>", methods=["DELETE"])
+def delete_book(book_id):
+    current_user, error = validate_token()
+    if error:
+        return error
+    
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
 
-        if cursor.rowcount == 0:
-            return handle_error("Author not found", 404)
+    return delete_item("books", book_id)
 
-        return jsonify({"message": "Author deleted successfully"}), 200
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
+@bp.route("/customers/<int:customer_id>", methods=["DELETE"])
+def delete_customer(customer_id):
+    current_user, error = validate_token()
+    if error:
+        return error
     
-@app.route("/books/<int:book_id>", methods=["DELETE"])
-def delete_book(book_id):
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
+
+    return delete_item("customers", customer_id)
+
+@bp.route("/orders/<int:order_id>", methods=["DELETE"])
+def delete_order(order_id):
     current_user, error = validate_token()
     if error:
         return error
@@ -564,75 +1177,334 @@ def delete_book(book_id):
     if role_error:
         return role_error
 
+    return delete_item("orders", order_id)
+
+# bulk DELETE: a JSON array of ids, removed in chunks of BULK_CHUNK_SIZE
+# inside one transaction. Ids that don't exist are reported, not an error,
+# unless none of them do.
+def parse_bulk_ids():
     try:
-        cursor = mysql.connection.cursor()
+        ids = json.loads(request.get_data())
+    except ValueError:
+        ids = None
+
+    if not isinstance(ids, list) or not all(isinstance(item_id, int) and not isinstance(item_id, bool) for item_id in ids):
+        return None, handle_error("Request body must be a JSON array of ids", 400)
+    if not ids:
+        return None, handle_error("No ids provided", 400)
+    if len(ids) > current_app.config["BULK_MAX_ROWS"]:
+        return None, handle_error(f"Too many ids: at most {current_app.config['BULK_MAX_ROWS']} per request", 413)
+    return list(dict.fromkeys(ids)), None
+
+def lock_rows(resource, ids):
+    # (existing ids, their orders' snapshots) for ids, locked until commit
+    cursor = get_db().cursor()
+    if resource["table"] == "Orders":
+        cursor.execute(orders_snapshot_query(len(ids)), ids)
+        rows = cursor.fetchall()
+        return [row[0] for row in rows], [order_from_row(row[1:]) for row in rows]
+
+    cursor.execute(lock_ids_query(resource, len(ids)), ids)
+    return [row[0] for row in cursor.fetchall()], []
+
+def bulk_delete(name):
+    resource = RESOURCES[name]
+    referencing = [table for table, _ in resource["references"]]
+
+    ids, error = parse_bulk_ids()
+    if error:
+        return error
 
-        update_orders_query = "UPDATE Orders SET book_ID = NULL WHERE book_ID = %s"
-        cursor.execute(update_orders_query, (book_id,))
-        mysql.connection.commit()
+    chunk_size = current_app.config["BULK_CHUNK_SIZE"]
+    deleted = []
+    changed = set()
 
-        delete_book_query = "DELETE FROM Books WHERE book_ID = %s"
-        cursor.execute(delete_book_query, (book_id,))
-        mysql.connection.commit()
+    try:
+        cursor = get_db().cursor()
+        for start in range(0, len(ids), chunk_size):
+            found, old_orders = lock_rows(resource, ids[start:start + chunk_size])
+            if not found:
+                continue
+
+            if old_orders:
+                update_sales(old_orders=old_orders)
+            forget_sales(resource, *found)
+
+            for query, table in zip(delete_queries(resource, len(found)), referencing + [resource["table"]]):
+                cursor.execute(query, found)
+                if cursor.rowcount:
+                    changed.add(table)
+            deleted.extend(found)
+
+        if not deleted:
+            get_db().rollback()
+            return handle_error(f"No {name} found", 404)
+
+        bump_versions(*sorted(changed))
+        get_db().commit()
+    except Exception as e:
+        get_db().rollback()
+        return handle_error(f"An error occurred, nothing was deleted: {str(e)}", 500)
 
-        if cursor.rowcount == 0:
-            return handle_error("Book not found", 404)
+    catalog_cache.invalidate(*[TABLE_RESOURCES[table] for table in sorted(changed)])
+    invalidate_items(resource, changed, *deleted)
 
-        return jsonify({"message": "Book deleted successfully"}), 200
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
-    
-@app.route("/customers/<int:customer_id>", methods=["DELETE"])
-def delete_customer(customer_id):
+    found = set(deleted)
+    return jsonify({
+        "message": f"{len(deleted)} {name} deleted successfully",
+        "deleted": deleted,
+        "not_found": [item_id for item_id in ids if item_id not in found],
+    }), 200
+
+@bp.route("/authors/bulk", methods=["DELETE"])
+def delete_authors_bulk():
     current_user, error = validate_token()
     if error:
         return error
-    
+
     role_error = validate_role(current_user, ['manager'])
     if role_error:
         return role_error
 
-    try:
-        cursor = mysql.connection.cursor()
+    return bulk_delete("authors")
 
-        update_orders_query = "UPDATE Orders SET customer_ID = NULL WHERE customer_ID = %s"
-        cursor.execute(update_orders_query, (customer_id,))
-        mysql.connection.commit()
+@bp.route("/books/bulk", methods=["DELETE"])
+def delete_books_bulk():
+    current_user, error = validate_token()
+    if error:
+        return error
 
-        delete_customer_query = "DELETE FROM Customers WHERE customer_ID = %s"
-        cursor.execute(delete_customer_query, (customer_id,))
-        mysql.connection.commit()
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
 
-        if cursor.rowcount == 0:
-            return handle_error("Customer not found", 404)
+    return bulk_delete("books")
 
-        return jsonify({"message": "Customer deleted successfully"}), 200
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
+@bp.route("/customers/bulk", methods=["DELETE"])
+def delete_customers_bulk():
+    current_user, error = validate_token()
+    if error:
+        return error
 
-@app.route("/orders/<int:order_id>", methods=["DELETE"])
-def delete_order(order_id):
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
+
+    return bulk_delete("customers")
+
+@bp.route("/orders/bulk", methods=["DELETE"])
+def delete_orders_bulk():
     current_user, error = validate_token()
     if error:
         return error
-    
+
     role_error = validate_role(current_user, ['manager'])
     if role_error:
         return role_error
 
+    return bulk_delete("orders")
+
+# reports, read from the sales summaries
+def get_report_args():
     try:
-        cursor = mysql.connection.cursor()
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return None, handle_error("'limit' must be an integer", 400)
+    if not 1 <= limit <= current_app.config["MAX_PAGE_SIZE"]:
+        return None, handle_error(f"'limit' must be between 1 and {current_app.config['MAX_PAGE_SIZE']}", 400)
 
-        delete_order_query = "DELETE FROM Orders WHERE order_ID = %s"
-        cursor.execute(delete_order_query, (order_id,))
-        mysql.connection.commit()
+    by = request.args.get("by", "revenue")
+    if by not in REPORT_ORDERINGS:
+        return None, handle_error(f"'by' must be one of: {', '.join(REPORT_ORDERINGS)}", 400)
 
-        if cursor.rowcount == 0:
-            return handle_error("Order not found", 404)
+    return (limit, by), None
 
-        return jsonify({"message": "Order deleted successfully"}), 200
-    except Exception as e:
-        return handle_error(f"An error occurred: {str(e)}", 500)
+@bp.route("/reports/top-books")
+def report_top_books():
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    args, error = get_report_args()
+    if error:
+        return error
+    limit, by = args
+
+    cursor = get_db().cursor()
+    cursor.execute(top_books_query(by), (limit,))
+    return jsonify([summary_row_to_dict("book_ID", "book_Title", row) for row in cursor.fetchall()]), 200
+
+@bp.route("/reports/top-customers")
+def report_top_customers():
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    args, error = get_report_args()
+    if error:
+        return error
+    limit, by = args
+
+    cursor = get_db().cursor()
+    cursor.execute(top_customers_query(by), (limit,))
+    return jsonify([summary_row_to_dict("customer_ID", "customer_Name", row) for row in cursor.fetchall()]), 200
+
+@bp.route("/reports/customers/<int:customer_id>")
+def report_customer_value(customer_id):
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    cursor = get_db().cursor()
+    cursor.execute(customer_value_query(), (customer_id,))
+    row = cursor.fetchone()
+    if row is None:
+        # same type as a stored revenue, serialized as a string
+        return jsonify({"customer_ID": customer_id, "order_count": 0, "revenue": decimal.Decimal("0.00")}), 200
+    return jsonify(summary_row_to_dict("customer_ID", "customer_Name", row)), 200
+
+@bp.route("/reports/revenue")
+def report_revenue():
+    current_user, error = validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    period = request.args.get("period", "day")
+    if period not in PERIODS:
+        return handle_error(f"'period' must be one of: {', '.join(PERIODS)}", 400)
+
+    dates = [request.args.get("from"), request.args.get("to")]
+    try:
+        for date in dates:
+            if date is not None:
+                datetime.date.fromisoformat(date)
+    except ValueError:
+        return handle_error("'from' and 'to' must be dates (YYYY-MM-DD)", 400)
+
+    query, params = daily_revenue_query(*dates)
+    cursor = get_db().cursor()
+    cursor.execute(query, params)
+    return jsonify(revenue_by_period(cursor.fetchall(), period)), 200
+
+# one handler per file, however often create_app() runs in the process
+def add_slow_query_log(path):
+    path = os.path.abspath(path)
+    if not any(getattr(handler, "baseFilename", None) == path for handler in slow_query_logger.handlers):
+        slow_query_logger.addHandler(logging.FileHandler(path, delay=True))
+
+# application factory: settings come from DEFAULT_CONFIG, then environment
+# variables of the same names (see config.py), then config. The components
+# are module-level, one application per process (e.g. per pre-forked
+# worker); nothing here connects to MySQL, reads the user registry or starts
+# a thread, that all happens on first use
+def create_app(config=None):
+    global pool, catalog_cache, item_cache, serializer, metrics, encodings
+    global token_cache, revoked_tokens, hasher, users, order_queue
+    global rate_limiter, request_slots, full_table_slots
+
+    app = Flask(__name__)
+    app.config.from_mapping(DEFAULT_CONFIG)
+    app.config.from_mapping(from_environ(DEFAULT_CONFIG))
+    app.config.from_mapping(config or {})
+
+    # connection pool
+    pool = ConnectionPool(
+        functools.partial(connect_mysql, app.config),
+        min_size=app.config["MYSQL_POOL_MIN_SIZE"],
+        max_size=app.config["MYSQL_POOL_MAX_SIZE"],
+        idle_timeout=app.config["MYSQL_POOL_IDLE_TIMEOUT"],
+        checkout_timeout=app.config["MYSQL_POOL_CHECKOUT_TIMEOUT"],
+        ping_interval=app.config["MYSQL_POOL_PING_INTERVAL"],
+    )
+
+    # cache for the public catalog endpoints
+    catalog_cache = create_cache(app.config)
+
+    # single rows for the item endpoints, per resource
+    item_cache = create_item_cache(app.config, RESOURCES)
+
+    # JSON encoder for list responses
+    serializer = create_serializer(app.config["JSON_SERIALIZER"])
+
+    # request, query and phase timings, served at /metrics
+    slow_query_ms = app.config["SLOW_QUERY_THRESHOLD_MS"]
+    metrics = Metrics(slow_query_threshold=slow_query_ms / 1000 if slow_query_ms is not None else None)
+    if app.config["SLOW_QUERY_LOG"]:
+        add_slow_query_log(app.config["SLOW_QUERY_LOG"])
+
+    # response compression: encodings this process can produce, best first
+    encodings = available_encodings(app.config["COMPRESSION_ENCODINGS"])
+
+    # token cache and revocation list
+    token_cache = TokenCache(app.config["TOKEN_CACHE_SIZE"])
+    revoked_tokens = RevocationList(app.config["TOKEN_REVOCATION_LOG"])
+
+    # password hashing pool
+    hasher = PasswordHasher(
+        rounds=app.config["BCRYPT_LOG_ROUNDS"],
+        workers=app.config["BCRYPT_WORKERS"],
+        max_queue=app.config["BCRYPT_MAX_QUEUE"],
+        timeout=app.config["BCRYPT_TIMEOUT"],
+    )
+
+    # user registry
+    users = UserRegistry(app.config["USERS_LOG"], legacy_path=app.config["USERS_LEGACY_JSON"])
+
+    # write-behind orders; the flusher thread starts with the first request
+    order_queue = None
+    if app.config["ORDER_QUEUE_LOG"]:
+        order_queue = OrderQueue(
+            app.config["ORDER_QUEUE_LOG"],
+            functools.partial(write_queued_orders, app),
+            batch_size=app.config["ORDER_QUEUE_BATCH_SIZE"],
+            interval=app.config["ORDER_QUEUE_INTERVAL"],
+            retention=app.config["ORDER_QUEUE_RETENTION"],
+            retryable=(PoolTimeout,),
+        )
+
+    # admission control; None when off
+    rate_limiter = create_rate_limiter(app.config)
+    request_slots = full_table_slots = None
+    if app.config["MAX_CONCURRENT_REQUESTS"]:
+        request_slots = ConcurrencyLimiter(app.config["MAX_CONCURRENT_REQUESTS"])
+    if app.config["MAX_CONCURRENT_FULL_TABLE"]:
+        full_table_slots = ConcurrencyLimiter(app.config["MAX_CONCURRENT_FULL_TABLE"])
+
+    # component stats are read at scrape time; the lambdas pick up a pool
+    # swapped in afterwards (tests, benchmark.py)
+    metrics.register("pool", lambda: pool.stats())
+    metrics.register("catalog_cache", lambda: catalog_cache.stats())
+    metrics.register("item_cache", lambda: item_cache.stats())
+    metrics.register("token_cache", lambda: token_cache.stats())
+    metrics.register("hasher", lambda: hasher.stats())
+    if order_queue is not None:
+        metrics.register("order_queue", lambda: order_queue.stats())
+    if rate_limiter is not None:
+        metrics.register("rate_limit", lambda: rate_limiter.stats())
+    if request_slots is not None:
+        metrics.register("request_slots", lambda: request_slots.stats())
+    if full_table_slots is not None:
+        metrics.register("full_table_slots", lambda: full_table_slots.stats())
+
+    app.register_blueprint(bp)
+    app.teardown_appcontext(release_db)
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -1,13 +1,52 @@
+import datetime
+import decimal
+import gzip
+import json
+import time
+import jwt
 import pytest
-from api import app
+import sys
+import api
+from auth import RevocationList
+from order_queue import OrderQueue
+from users import UserRegistry
+
+app = api.create_app()
+
+# database clock for Table_Versions lookups, past every change in the tests
+LATER = datetime.datetime(2024, 6, 1)
 
 @pytest.fixture
 def mock_db(mocker):
-    mock_conn = mocker.patch('flask_mysqldb.MySQL.connection')
+    mock_conn = mocker.MagicMock()
+    mocker.patch.object(api.pool, 'get', return_value=mock_conn)
+    mocker.patch.object(api.pool, 'put')
     mock_cursor = mocker.MagicMock()
+    mock_cursor.fetchone.return_value = None
     mock_conn.cursor.return_value = mock_cursor
     return mock_cursor
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    api.catalog_cache.clear()
+    api.item_cache.clear()
+    api.token_cache.clear()
+
+def auth_headers(role='manager'):
+    token = jwt.encode(
+        {'user_id': 'tester', 'role': role, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+        app.config['SECRET_KEY'],
+        algorithm='HS256',
+    )
+    return {'x-access-token': token}
+
+@pytest.fixture
+def user_registry(tmp_path, monkeypatch):
+    registry = UserRegistry(str(tmp_path / "users.log"))
+    monkeypatch.setattr(api, "users", registry)
+    monkeypatch.setattr(api.hasher, "rounds", 4)
+    return registry
+
 # General Tests
 def test_index():
     client = app.test_client()
@@ -15,6 +54,161 @@ def test_index():
     assert response.status_code == 200
     assert b"WELCOME TO BOOKSELLER DATABASE" in response.data
 
+def test_connection_returned_to_pool(mock_db):
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+
+    client = app.test_client()
+    client.get('/authors')
+
+    api.pool.get.assert_called_once()
+    api.pool.put.assert_called_once_with(api.pool.get.return_value)
+
+def test_pool_timeout_returns_503(mocker):
+    mocker.patch.object(api.pool, 'get', side_effect=api.PoolTimeout("busy"))
+
+    client = app.test_client()
+    response = client.get('/authors')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+# Application Factory Tests
+@pytest.fixture
+def restore_components(monkeypatch):
+    # create_app() replaces the module's components; put them back afterwards
+    for name in ('pool', 'catalog_cache', 'item_cache', 'serializer', 'metrics', 'encodings',
+                 'token_cache', 'revoked_tokens', 'hasher', 'users', 'order_queue',
+                 'rate_limiter', 'request_slots', 'full_table_slots'):
+        monkeypatch.setattr(api, name, getattr(api, name))
+
+def test_create_app_settings(monkeypatch, restore_components):
+    monkeypatch.setenv('MAX_PAGE_SIZE', '5')
+    monkeypatch.setenv('COMPRESSION_ENCODINGS', 'gzip')
+    monkeypatch.setenv('MYSQL_DB', 'from_env')
+    other = api.create_app({'MYSQL_DB': 'from_config'})
+
+    assert other.config['MAX_PAGE_SIZE'] == 5
+    assert other.config['MYSQL_DB'] == 'from_config'
+    assert api.encodings == ['gzip']
+    assert other.test_client().get('/authors?limit=6').status_code == 400
+
+def test_create_app_is_lazy(tmp_path, monkeypatch, restore_components):
+    monkeypatch.setitem(sys.modules, 'MySQLdb', None)
+    journal = str(tmp_path / 'orders.log')
+    OrderQueue(journal, None, fsync=False).enqueue({'book_ID': 1})
+    other = api.create_app({'ORDER_QUEUE_LOG': journal, 'USERS_LOG': str(tmp_path / 'users.log')})
+
+    # no driver import, connection, journal read or thread until a request
+    # needs them
+    assert api.pool.stats()['size'] == 0
+    assert api.order_queue.journal.offset == 0
+    assert api.order_queue._thread is None
+    other.test_client().get('/')
+    assert api.order_queue._thread is not None
+    assert api.order_queue.stats()['pending'] == 1
+    api.order_queue.stop(5)
+
+def test_create_app_adds_slow_query_log_once(tmp_path, restore_components):
+    path = str(tmp_path / 'slow.log')
+    before = list(api.slow_query_logger.handlers)
+    try:
+        api.create_app({'SLOW_QUERY_LOG': path})
+        api.create_app({'SLOW_QUERY_LOG': path})
+        added = [handler for handler in api.slow_query_logger.handlers if handler not in before]
+        assert len(added) == 1
+    finally:
+        for handler in api.slow_query_logger.handlers[:]:
+            if handler not in before:
+                api.slow_query_logger.removeHandler(handler)
+                handler.close()
+
+# User Tests
+def test_register_and_login(user_registry):
+    client = app.test_client()
+    response = client.post('/register', json={'username': 'alice', 'password': 'secret', 'role': 'staff'})
+    assert response.status_code == 201
+
+    response = client.post('/login', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 200
+    assert b"token" in response.data
+
+def test_register_duplicate(user_registry):
+    client = app.test_client()
+    client.post('/register', json={'username': 'alice', 'password': 'secret', 'role': 'staff'})
+    response = client.post('/register', json={'username': 'alice', 'password': 'other', 'role': 'manager'})
+
+    assert response.status_code == 400
+    assert b"Username already exists" in response.data
+
+def test_login_invalid_credentials(user_registry):
+    client = app.test_client()
+    client.post('/register', json={'username': 'alice', 'password': 'secret', 'role': 'staff'})
+    response = client.post('/login', json={'username': 'alice', 'password': 'wrong'})
+
+    assert response.status_code == 401
+    assert b"Invalid credentials" in response.data
+
+def test_login_rehashes_on_cost_change(user_registry, monkeypatch):
+    client = app.test_client()
+    client.post('/register', json={'username': 'alice', 'password': 'secret', 'role': 'staff'})
+    assert user_registry.get('alice')['password'].startswith('$2b$04$')
+
+    monkeypatch.setattr(api.hasher, "rounds", 5)
+    response = client.post('/login', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 200
+
+    for _ in range(100):
+        if user_registry.get('alice')['password'].startswith('$2b$05$'):
+            break
+        time.sleep(0.01)
+    assert user_registry.get('alice')['password'].startswith('$2b$05$')
+    assert client.post('/login', json={'username': 'alice', 'password': 'secret'}).status_code == 200
+
+def test_login_when_hasher_busy(user_registry, mocker):
+    mocker.patch.object(api.hasher, 'submit_check', side_effect=api.HasherBusy("busy"))
+    user_registry.add('alice', '$2b$04$abcdefghijklmnopqrstuu5qfaAAKTQ1b3bVzuAXxbQlGDKZLStSe', 'staff')
+
+    client = app.test_client()
+    response = client.post('/login', json={'username': 'alice', 'password': 'secret'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+# Token Tests
+def test_validate_token_uses_cache(mock_db, mocker):
+    decode = mocker.spy(jwt, 'decode')
+    headers = auth_headers()
+
+    client = app.test_client()
+    client.get('/customers', headers=headers)
+    client.get('/customers', headers=headers)
+
+    assert decode.call_count == 1
+    assert api.token_cache.stats()['hits'] == 1
+
+def test_expired_token_rejected(mock_db):
+    token = jwt.encode(
+        {'user_id': 'tester', 'role': 'manager', 'exp': datetime.datetime.utcnow() - datetime.timedelta(seconds=1)},
+        app.config['SECRET_KEY'],
+        algorithm='HS256',
+    )
+
+    client = app.test_client()
+    response = client.get('/customers', headers={'x-access-token': token})
+
+    assert response.status_code == 401
+
+def test_logout_revokes_token(mock_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(api, 'revoked_tokens', RevocationList(str(tmp_path / "revoked.log")))
+    headers = auth_headers()
+
+    client = app.test_client()
+    assert client.post('/logout', headers=headers).status_code == 200
+
+    response = client.get('/customers', headers=headers)
+    assert response.status_code == 401
+    assert b"Token has been revoked!" in response.data
+
 # Authors Table Tests
 def test_get_authors_empty(mock_db):
     mock_db.fetchall.return_value = []
@@ -68,6 +262,84 @@ def test_update_author_not_found(mock_db):
     assert response.status_code == 404
     assert b"Author not found" in response.data
 
+def test_patch_author_writes_only_changed_fields(mock_db):
+    mock_db.fetchone.return_value = ('John', 'Doe', 4)
+
+    client = app.test_client()
+    response = client.patch('/authors/1', json={'author_FirstName': 'Jon', 'author_LastName': 'Doe'}, headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.json['changed'] == ['author_FirstName']
+    queries = [call[0] for call in mock_db.execute.call_args_list]
+    assert queries[0] == ('SELECT author_FirstName, author_LastName, row_Version FROM Authors WHERE author_ID = %s FOR UPDATE', (1,))
+    assert queries[1] == (
+        'UPDATE Authors SET author_FirstName = %s, row_Version = row_Version + 1 WHERE author_ID = %s AND row_Version = %s',
+        ('Jon', 1, 4),
+    )
+    assert response.headers['ETag'] == '"authors-1-v5"'
+    assert api.pool.get.return_value.commit.call_count == 1
+
+def test_patch_unchanged_writes_nothing(mock_db):
+    mock_db.fetchone.return_value = (datetime.date(2024, 1, 1), decimal.Decimal('10.00'), 1, 2, 3)
+
+    client = app.test_client()
+    response = client.patch('/orders/7', json={'order_Value': 10, 'order_Date': '2024-01-01'}, headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.json['changed'] == []
+    assert mock_db.execute.call_count == 1
+    api.pool.get.return_value.commit.assert_not_called()
+
+def test_patch_required_field_cannot_be_emptied(mock_db):
+    client = app.test_client()
+    response = client.patch('/books/1', json={'ISBN': ''}, headers=auth_headers())
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'ISBN cannot be empty'
+
+def test_update_if_match_conflict(mock_db):
+    mock_db.fetchone.return_value = ('John', 5)
+
+    client = app.test_client()
+    response = client.patch('/authors/1', json={'author_FirstName': 'Jon'},
+                            headers={**auth_headers(), 'If-Match': '"authors-1-v4"'})
+
+    assert response.status_code == 412
+    query = mock_db.execute.call_args_list[0][0][0]
+    assert not query.endswith('FOR UPDATE')
+    assert mock_db.execute.call_count == 1
+
+def test_update_if_match_lost_race(mock_db):
+    mock_db.fetchone.return_value = ('John', 4)
+    mock_db.rowcount = 0
+
+    client = app.test_client()
+    response = client.put('/authors/1', json={'author_FirstName': 'Jon'},
+                          headers={**auth_headers(), 'If-Match': '"authors-1-v4"'})
+
+    assert response.status_code == 412
+    api.pool.get.return_value.commit.assert_not_called()
+
+def test_update_if_match_other_item(mock_db):
+    client = app.test_client()
+    response = client.put('/authors/1', json={'author_FirstName': 'Jon'},
+                          headers={**auth_headers(), 'If-Match': '"authors-2-v4"'})
+
+    assert response.status_code == 412
+    mock_db.execute.assert_not_called()
+
+def test_delete_if_match(mock_db):
+    mock_db.fetchone.return_value = (4,)
+    mock_db.rowcount = 1
+
+    client = app.test_client()
+    response = client.delete('/customers/1', headers={**auth_headers(), 'If-Match': '"customers-1-v4"'})
+
+    assert response.status_code == 200
+    assert ('DELETE FROM Customers WHERE customer_ID = %s AND row_Version = %s', (1, 4)) in [
+        call[0] for call in mock_db.execute.call_args_list
+    ]
+
 def test_delete_author_not_found(mock_db):
     mock_db.rowcount = 0
     
@@ -86,6 +358,12 @@ def test_delete_author_success(mock_db):
     assert response.status_code == 200
     assert b"Author deleted successfully" in response.data
 
+def test_get_authors_invalid_limit(mock_db):
+    client = app.test_client()
+    response = client.get('/authors?limit=abc')
+
+    assert response.status_code == 400
+
 # Books Table Tests
 def test_get_books_empty(mock_db):
     mock_db.fetchall.return_value = []
@@ -97,7 +375,7 @@ def test_get_books_empty(mock_db):
     assert b"No books found" in response.data
 
 def test_get_books(mock_db):
-    mock_db.fetchall.return_value = [(1, 'Book Title', 1, '123456789', '2024-01-01')]
+    mock_db.fetchall.return_value = [(1, 'Book Title', '123456789', '2024-01-01')]
     
     client = app.test_client()
     response = client.get('/books')
@@ -105,6 +383,231 @@ def test_get_books(mock_db):
     assert response.status_code == 200
     assert b"Book Title" in response.data
 
+def test_get_books_paginated(mock_db):
+    mock_db.fetchall.return_value = [(1, 'First', '111', '2024-01-01'), (2, 'Second', '222', '2024-01-02')]
+
+    client = app.test_client()
+    response = client.get('/books?limit=2&after_id=0')
+
+    assert response.status_code == 200
+    assert response.json['next_cursor'] == 2
+    assert 'after_id=2' in response.json['next']
+    assert [book['book_Title'] for book in response.json['data']] == ['First', 'Second']
+    mock_db.execute.assert_called_with("SELECT book_ID, book_Title, ISBN, publication_Date FROM Books WHERE book_ID > %s ORDER BY book_ID LIMIT %s", (0, 2))
+
+def test_get_books_last_page(mock_db):
+    mock_db.fetchall.return_value = [(3, 'Third', '333', '2024-01-03')]
+
+    client = app.test_client()
+    response = client.get('/books?limit=2&after_id=2')
+
+    assert response.status_code == 200
+    assert response.json['next_cursor'] is None
+    assert response.json['next'] is None
+
+def test_get_books_fields(mock_db):
+    mock_db.fetchall.return_value = [(1, 'First'), (2, 'Second')]
+
+    client = app.test_client()
+    response = client.get('/books?fields=book_Title&limit=2')
+
+    assert response.status_code == 200
+    assert response.json['data'] == [{'book_Title': 'First'}, {'book_Title': 'Second'}]
+    assert 'fields=book_Title' in response.json['next']
+    mock_db.execute.assert_called_with("SELECT book_ID, book_Title FROM Books ORDER BY book_ID LIMIT %s", (2,))
+
+def test_get_books_unknown_field(mock_db):
+    client = app.test_client()
+    response = client.get('/books?fields=book_Title,author_ID')
+
+    assert response.status_code == 400
+    assert b"Unknown fields: author_ID" in response.data
+
+def test_get_books_filtered_and_searched(mock_db):
+    mock_db.fetchall.return_value = [(4, 'Dune', '9780441013593', '1965-08-01')]
+
+    client = app.test_client()
+    response = client.get('/books?author_ID=2&publication_Date_from=1960-01-01&q=dune')
+
+    assert response.status_code == 200
+    mock_db.execute.assert_called_with(
+        "SELECT book_ID, book_Title, ISBN, publication_Date FROM Books"
+        " WHERE author_ID = %s AND publication_Date >= %s AND MATCH (book_Title) AGAINST (%s IN BOOLEAN MODE)",
+        (2, '1960-01-01', '+dune*'),
+    )
+
+def test_get_authors_search_both_names(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Frank', 'Herbert')]
+
+    client = app.test_client()
+    assert client.get('/authors?q=frank+"herb*').status_code == 200
+    mock_db.execute.assert_called_with(
+        "SELECT author_ID, author_FirstName, author_LastName FROM Authors"
+        " WHERE MATCH (author_FirstName, author_LastName) AGAINST (%s IN BOOLEAN MODE)",
+        ('+frank* +herb*',),
+    )
+    assert client.get('/authors?q=*').status_code == 400
+
+def test_get_books_sorted_next_link_keeps_query(mock_db):
+    mock_db.fetchall.return_value = [(7, 'Zebra', '111', None), (3, 'Yak', '222', None)]
+
+    client = app.test_client()
+    response = client.get('/books?sort=-book_Title&limit=2&author_ID=1')
+
+    assert response.status_code == 200
+    assert [book['book_Title'] for book in response.json['data']] == ['Zebra', 'Yak']
+    next_url = response.json['next']
+    assert 'sort=-book_Title' in next_url and 'author_ID=1' in next_url and 'after=' in next_url
+    assert 'ORDER BY book_Title DESC, book_ID DESC' in mock_db.execute.call_args[0][0]
+
+def test_get_orders_invalid_filter(mock_db):
+    client = app.test_client()
+    response = client.get('/orders?customer_ID=abc', headers=auth_headers())
+
+    assert response.status_code == 400
+    assert b"Invalid value for 'customer_ID'" in response.data
+
+def test_get_books_expand_author(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Dune', '978', None, 3, 'Frank', 'Herbert'), (2, 'Orphan', '979', None, None, None, None)]
+
+    client = app.test_client()
+    response = client.get('/books?expand=author')
+
+    assert response.status_code == 200
+    assert response.json[0]['author'] == {'author_FirstName': 'Frank', 'author_LastName': 'Herbert'}
+    assert response.json[1]['author'] is None
+    assert 'LEFT JOIN Authors ON Authors.author_ID = Books.author_ID' in mock_db.execute.call_args[0][0]
+
+def test_update_author_invalidates_expanded_books(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Dune', '978', None, 3, 'Frank', 'Herbert')]
+    mock_db.rowcount = 1
+
+    client = app.test_client()
+    client.get('/books?expand=author')
+    plain = client.get('/books')
+    assert client.get('/books?expand=author').headers['X-Cache'] == 'HIT'
+
+    mock_db.fetchone.return_value = ('Frank', 1)
+    client.put('/authors/3', json={'author_FirstName': 'F.'}, headers=auth_headers())
+    mock_db.fetchone.return_value = None
+
+    assert client.get('/books?expand=author').headers['X-Cache'] == 'MISS'
+    assert plain.headers['X-Cache'] == 'MISS'
+    assert client.get('/books').headers['X-Cache'] == 'HIT'
+
+def test_get_books_stream_ndjson(mock_db):
+    mock_db.fetchmany.side_effect = [[(1, 'First', '111', None)], [(2, 'Second', '222', None)], []]
+
+    client = app.test_client()
+    response = client.get('/books?stream=ndjson')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 2
+    assert '"Second"' in lines[1]
+
+def test_get_books_stream_json_array(mock_db):
+    mock_db.fetchmany.side_effect = [[(1, 'First', '111', None), (2, 'Second', '222', None)], []]
+
+    client = app.test_client()
+    response = client.get('/books?stream=json')
+
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+def test_get_books_table_format(mock_db):
+    mock_db.fetchall.return_value = [(1, 'First', '111', None), (2, 'Second', '222', None)]
+
+    client = app.test_client()
+    response = client.get('/books?limit=2&format=table')
+
+    assert response.mimetype == 'application/vnd.bookseller.table+json'
+    assert response.json['columns'] == ['book_Title', 'ISBN', 'publication_Date']
+    assert response.json['rows'] == [['First', '111', None], ['Second', '222', None]]
+    assert 'format=table' in response.json['next']
+
+def test_get_books_csv_negotiated(mock_db):
+    mock_db.fetchall.return_value = [(1, 'First, Vol. 1', '111', None), (2, 'Second', '222', None)]
+
+    client = app.test_client()
+    response = client.get('/books?limit=2', headers={'Accept': 'text/csv'})
+
+    assert response.mimetype == 'text/csv'
+    assert 'Accept' in response.headers['Vary']
+    assert response.get_data(as_text=True).splitlines() == [
+        'book_Title,ISBN,publication_Date', '"First, Vol. 1",111,', 'Second,222,',
+    ]
+    assert 'after_id=2' in response.headers['Link']
+    assert response.headers['X-Next-Cursor'] == '2'
+
+def test_get_books_stream_csv_and_table(mock_db):
+    batches = [[(1, 'First', '111', None)], [(2, 'Second', '222', None)], []]
+    client = app.test_client()
+
+    mock_db.fetchmany.side_effect = list(batches)
+    response = client.get('/books?stream=csv')
+    assert response.get_data(as_text=True).splitlines() == ['book_Title,ISBN,publication_Date', 'First,111,', 'Second,222,']
+
+    mock_db.fetchmany.side_effect = list(batches)
+    response = client.get('/books?stream=table')
+    assert response.json == {'columns': ['book_Title', 'ISBN', 'publication_Date'], 'rows': [['First', '111', None], ['Second', '222', None]]}
+
+def test_get_books_msgpack(mock_db):
+    msgpack = pytest.importorskip('msgpack')
+    mock_db.fetchall.return_value = [(1, 'First', '111', None)]
+
+    client = app.test_client()
+    response = client.get('/books', headers={'Accept': 'application/msgpack'})
+
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data) == {'columns': ['book_Title', 'ISBN', 'publication_Date'], 'rows': [['First', '111', None]]}
+
+def test_get_books_unknown_format(mock_db):
+    client = app.test_client()
+    response = client.get('/books?format=xml')
+
+    assert response.status_code == 400
+    assert b"'format' must be one of" in response.data
+
+def test_get_books_cached_per_format(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Book Title', '123456789', '2024-01-01')]
+
+    client = app.test_client()
+    assert client.get('/books').headers['X-Cache'] == 'MISS'
+    response = client.get('/books', headers={'Accept': 'text/csv'})
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.mimetype == 'text/csv'
+
+    response = client.get('/books', headers={'Accept': 'text/csv'})
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.mimetype == 'text/csv'
+    assert client.get('/books').json[0]['book_Title'] == 'Book Title'
+
+def test_get_books_cached(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Book Title', '123456789', '2024-01-01')]
+
+    client = app.test_client()
+    first = client.get('/books')
+    calls = mock_db.execute.call_count
+    second = client.get('/books')
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert mock_db.execute.call_count == calls
+
+def test_add_book_invalidates_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Book Title', '123456789', '2024-01-01')]
+    client = app.test_client()
+    client.get('/books')
+    client.get('/authors')
+
+    client.post('/books', json={'book_Title': 'New Book', 'author_ID': 1, 'ISBN': '987654321'}, headers=auth_headers())
+
+    assert client.get('/books').headers['X-Cache'] == 'MISS'
+    assert client.get('/authors').headers['X-Cache'] == 'HIT'
+
 def test_add_book_missing_fields(mock_db):
     client = app.test_client()
     response = client.post('/books', json={})
@@ -156,6 +659,338 @@ def test_delete_book_success(mock_db):
     assert response.status_code == 200
     assert b"Book deleted successfully" in response.data
 
+# Bulk Insert Tests
+def test_bulk_add_authors(mock_db):
+    app.config['BULK_CHUNK_SIZE'] = 2
+    try:
+        client = app.test_client()
+        response = client.post('/authors/bulk', headers=auth_headers(), json=[
+            {'author_FirstName': 'John', 'author_LastName': 'Doe'},
+            {'author_FirstName': 'Jane', 'author_LastName': 'Smith'},
+            {'author_FirstName': 'Ann', 'author_LastName': 'Lee'},
+        ])
+    finally:
+        app.config['BULK_CHUNK_SIZE'] = 1000
+
+    assert response.status_code == 201
+    assert [result['status'] for result in response.json['results']] == ['created'] * 3
+    assert mock_db.executemany.call_count == 2
+    assert mock_db.executemany.call_args_list[0][0][1] == [('John', 'Doe'), ('Jane', 'Smith')]
+    assert api.pool.get.return_value.commit.call_count == 1
+
+def test_bulk_add_orders_ndjson(mock_db):
+    body = '{"order_Date": "2024-01-01", "order_Value": 10, "customer_ID": 1, "book_ID": 1}\n' \
+           '{"order_Date": "2024-01-02", "order_Value": 20, "customer_ID": 2, "book_ID": 2}\n'
+
+    client = app.test_client()
+    response = client.post('/orders/bulk', headers=auth_headers(), data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 201
+    assert len(mock_db.executemany.call_args[0][1]) == 2
+
+def test_bulk_add_books_invalid_rows(mock_db):
+    client = app.test_client()
+    response = client.post('/books/bulk', headers=auth_headers(), json=[
+        {'book_Title': 'Good', 'ISBN': '111'},
+        {'book_Title': 'No ISBN'},
+    ])
+
+    assert response.status_code == 400
+    assert response.json['results'] == [
+        {'index': 1, 'status': 'invalid', 'error': 'Missing required fields: book_Title and ISBN are mandatory'}
+    ]
+    mock_db.executemany.assert_not_called()
+
+def test_bulk_add_customers_rolls_back_on_error(mock_db):
+    mock_db.executemany.side_effect = Exception("Duplicate entry")
+
+    client = app.test_client()
+    response = client.post('/customers/bulk', headers=auth_headers(), json=[
+        {'customer_Name': 'John Doe', 'customer_Phone': '123'},
+    ])
+
+    assert response.status_code == 500
+    api.pool.get.return_value.rollback.assert_called()
+    api.pool.get.return_value.commit.assert_not_called()
+
+# Item Tests
+def test_get_book_item_cached(mock_db):
+    mock_db.fetchone.return_value = (1, 'Dune', '978', datetime.date(1965, 8, 1), 3)
+
+    client = app.test_client()
+    first = client.get('/books/1')
+    second = client.get('/books/1')
+
+    assert first.json == {'book_Title': 'Dune', 'ISBN': '978', 'publication_Date': 'Sun, 01 Aug 1965 00:00:00 GMT'}
+    assert first.headers['ETag'] == '"books-1-v3"'
+    assert (first.headers['X-Cache'], second.headers['X-Cache']) == ('MISS', 'HIT')
+    assert second.data == first.data
+    assert mock_db.execute.call_count == 1
+    assert mock_db.execute.call_args[0] == (
+        'SELECT book_ID, book_Title, ISBN, publication_Date, row_Version FROM Books WHERE book_ID = %s', (1,)
+    )
+
+def test_get_book_item_not_modified(mock_db):
+    mock_db.fetchone.return_value = (1, 'Dune', '978', None, 3)
+
+    client = app.test_client()
+    response = client.get('/books/1', headers={'If-None-Match': '"books-1-v3"'})
+
+    assert response.status_code == 304
+
+def test_get_order_item_not_found(mock_db):
+    client = app.test_client()
+
+    assert client.get('/orders/9').status_code == 401
+    response = client.get('/orders/9', headers=auth_headers())
+    assert response.status_code == 404
+    assert response.json == {'error': 'Order not found'}
+
+def test_update_invalidates_item(mock_db):
+    mock_db.fetchone.return_value = (1, 'John', 'Doe', 4)
+    client = app.test_client()
+    client.get('/authors/1')
+
+    mock_db.fetchone.return_value = ('John', 4)
+    client.patch('/authors/1', json={'author_FirstName': 'Jon'}, headers=auth_headers())
+
+    mock_db.fetchone.return_value = (1, 'Jon', 'Doe', 5)
+    response = client.get('/authors/1')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['author_FirstName'] == 'Jon'
+
+def test_delete_author_invalidates_books(mock_db):
+    mock_db.fetchone.return_value = (2, 'Dune', '978', None, 1)
+    mock_db.rowcount = 1
+    client = app.test_client()
+    client.get('/books/2')
+
+    client.delete('/authors/1', headers=auth_headers())
+
+    assert client.get('/books/2').headers['X-Cache'] == 'MISS'
+
+def test_get_books_by_ids(mock_db):
+    mock_db.fetchall.return_value = [(1, 'A', '1', None), (3, 'C', '3', None)]
+
+    client = app.test_client()
+    response = client.get('/books?ids=3,1,3')
+
+    assert len(response.json) == 2
+    query, params = mock_db.execute.call_args[0]
+    assert 'WHERE book_ID IN (%s, %s)' in query
+    assert params == (3, 1)
+    assert client.get('/books?ids=1,x').status_code == 400
+
+# Delete Tests
+def test_delete_author_commits_once(mock_db):
+    mock_db.rowcount = 1
+
+    client = app.test_client()
+    response = client.delete('/authors/1', headers=auth_headers())
+
+    assert response.status_code == 200
+    queries = [call[0][0] for call in mock_db.execute.call_args_list]
+    assert queries[0] == 'UPDATE Books SET author_ID = NULL, row_Version = row_Version + 1 WHERE author_ID = %s'
+    assert queries[1] == 'DELETE FROM Authors WHERE author_ID = %s'
+    assert 'Table_Versions' in queries[2]
+    assert api.pool.get.return_value.commit.call_count == 1
+
+def test_delete_author_not_found_rolls_back(mock_db):
+    mock_db.rowcount = 0
+
+    client = app.test_client()
+    response = client.delete('/authors/999', headers=auth_headers())
+
+    assert response.status_code == 404
+    api.pool.get.return_value.commit.assert_not_called()
+    api.pool.get.return_value.rollback.assert_called()
+
+def test_bulk_delete_books(mock_db):
+    mock_db.fetchall.return_value = [(1,), (3,)]
+    mock_db.rowcount = 2
+
+    client = app.test_client()
+    response = client.delete('/books/bulk', headers=auth_headers(), json=[1, 2, 3, 3])
+
+    assert response.status_code == 200
+    assert response.json['deleted'] == [1, 3]
+    assert response.json['not_found'] == [2]
+    queries = [call[0] for call in mock_db.execute.call_args_list]
+    assert queries[0] == ('SELECT book_ID FROM Books WHERE book_ID IN (%s, %s, %s) FOR UPDATE', [1, 2, 3])
+    assert ('DELETE FROM Books WHERE book_ID IN (%s, %s)', [1, 3]) in queries
+    assert api.pool.get.return_value.commit.call_count == 1
+
+def test_bulk_delete_none_found(mock_db):
+    mock_db.fetchall.return_value = []
+
+    client = app.test_client()
+    response = client.delete('/customers/bulk', headers=auth_headers(), json=[7, 8])
+
+    assert response.status_code == 404
+    api.pool.get.return_value.commit.assert_not_called()
+
+def test_bulk_delete_invalid_ids(mock_db):
+    client = app.test_client()
+
+    assert client.delete('/orders/bulk', headers=auth_headers(), json=[1, 'two']).status_code == 400
+    assert client.delete('/orders/bulk', headers=auth_headers(), json=[]).status_code == 400
+    assert client.delete('/orders/bulk', headers=auth_headers('staff'), json=[1]).status_code == 403
+    mock_db.execute.assert_not_called()
+
+# Conditional Request Tests
+def test_get_books_sends_validators(mock_db):
+    mock_db.fetchone.return_value = (7, datetime.datetime(2024, 1, 1, 12, 0, 0, 500000), 1, LATER)
+    mock_db.fetchall.return_value = [(1, 'Book Title', '123456789', '2024-01-01')]
+
+    client = app.test_client()
+    response = client.get('/books')
+
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('"books-7-')
+    assert response.headers['Last-Modified'] == 'Mon, 01 Jan 2024 12:00:00 GMT'
+
+def test_get_orders_not_modified_skips_query(mock_db):
+    mock_db.fetchone.return_value = (3, datetime.datetime(2024, 1, 1), 1, LATER)
+    mock_db.fetchall.return_value = [(1, '2024-01-01', 100.00, 1, 1)]
+    client = app.test_client()
+    etag = client.get('/orders', headers=auth_headers()).headers['ETag']
+    mock_db.execute.reset_mock()
+
+    response = client.get('/orders', headers={**auth_headers(), 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert mock_db.execute.call_count == 1
+    assert 'Table_Versions' in mock_db.execute.call_args[0][0]
+
+def test_get_orders_modified_after_write(mock_db):
+    mock_db.fetchone.return_value = (3, datetime.datetime(2024, 1, 1), 1, LATER)
+    mock_db.fetchall.return_value = [(1, '2024-01-01', 100.00, 1, 1)]
+    client = app.test_client()
+    etag = client.get('/orders', headers=auth_headers()).headers['ETag']
+
+    mock_db.fetchone.return_value = (4, datetime.datetime(2024, 1, 2), 1, LATER)
+    response = client.get('/orders', headers={**auth_headers(), 'If-None-Match': etag})
+
+    assert response.status_code == 200
+
+def test_get_customers_if_modified_since(mock_db):
+    mock_db.fetchone.return_value = (2, datetime.datetime(2024, 1, 1, 12, 0, 0), 1, LATER)
+
+    client = app.test_client()
+    response = client.get('/customers', headers={**auth_headers(), 'If-Modified-Since': 'Mon, 01 Jan 2024 12:00:00 GMT'})
+
+    assert response.status_code == 304
+
+def test_get_authors_if_modified_since_fractional_timestamp(mock_db):
+    mock_db.fetchone.return_value = (2, datetime.datetime(2024, 1, 1, 12, 0, 0, 250000), 1, LATER)
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+    client = app.test_client()
+    last_modified = client.get('/authors').headers['Last-Modified']
+
+    response = client.get('/authors', headers={'If-Modified-Since': last_modified})
+
+    assert response.status_code == 304
+
+def test_get_authors_no_last_modified_in_the_changed_second(mock_db):
+    # another write in the same second would carry the same Last-Modified
+    changed = datetime.datetime(2024, 1, 1, 12, 0, 0, 200000)
+    mock_db.fetchone.return_value = (2, changed, 1, datetime.datetime(2024, 1, 1, 12, 0, 0, 900000))
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+    client = app.test_client()
+
+    response = client.get('/authors')
+    assert 'Last-Modified' not in response.headers
+    assert response.headers['ETag']
+
+    mock_db.fetchone.return_value = (3, datetime.datetime(2024, 1, 1, 12, 0, 0, 700000), 1, datetime.datetime(2024, 1, 1, 12, 0, 0, 800000))
+    response = client.get('/authors', headers={'If-Modified-Since': 'Mon, 01 Jan 2024 12:00:00 GMT'})
+    assert response.status_code == 200
+
+def test_get_authors_not_modified_from_cache(mock_db):
+    mock_db.fetchone.return_value = (5, datetime.datetime(2024, 1, 1), 1, LATER)
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+    client = app.test_client()
+    etag = client.get('/authors').headers['ETag']
+    mock_db.execute.reset_mock()
+
+    response = client.get('/authors', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['X-Cache'] == 'HIT'
+    assert mock_db.execute.call_count == 0
+
+# Compression Tests
+def many_books(count=100):
+    return [(i, f'Book Title {i}', f'{i:09d}', '2024-01-01') for i in range(1, count + 1)]
+
+def test_get_books_gzip_cached(mock_db, mocker):
+    mock_db.fetchone.return_value = (7, datetime.datetime(2024, 1, 1), 1, LATER)
+    mock_db.fetchall.return_value = many_books()
+    compress = mocker.spy(api, 'compress')
+    client = app.test_client()
+    plain = client.get('/books')
+
+    first = client.get('/books', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/books', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert gzip.decompress(second.data) == plain.data
+    assert compress.call_count == 1
+    assert second.headers['ETag'].startswith('W/"books-7-')
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert 'Content-Encoding' not in plain.headers
+
+def test_compressed_etag_revalidates(mock_db):
+    mock_db.fetchone.return_value = (7, datetime.datetime(2024, 1, 1), 1, LATER)
+    mock_db.fetchall.return_value = many_books()
+    client = app.test_client()
+    etag = client.get('/books', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    api.catalog_cache.clear()
+
+    response = client.get('/books', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+def test_small_response_not_compressed(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Book Title', '123456789', '2024-01-01')]
+
+    client = app.test_client()
+    response = client.get('/books', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.json[0]['book_Title'] == 'Book Title'
+
+def test_uncached_response_compressed(mock_db):
+    mock_db.fetchall.return_value = [(i, '2024-01-01', 100.00, 1, 1) for i in range(1, 100)]
+
+    client = app.test_client()
+    response = client.get('/orders', headers={**auth_headers(), 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.data))) == 99
+
+def test_identity_only_not_compressed(mock_db):
+    mock_db.fetchall.return_value = many_books()
+
+    client = app.test_client()
+    response = client.get('/books', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.json) == 100
+
+def test_get_books_stream_gzip(mock_db):
+    mock_db.fetchmany.side_effect = [[(1, 'First', '111', None)], [(2, 'Second', '222', None)], []]
+
+    client = app.test_client()
+    response = client.get('/books?stream=ndjson', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+    assert len(lines) == 2
+    assert '"Second"' in lines[1]
+
 # Customers Table Tests
 def test_get_customers_empty(mock_db):
     mock_db.fetchall.return_value = []
@@ -295,3 +1130,72 @@ def test_delete_order_success(mock_db):
 
 if __name__ == "__main__":
     pytest.main()
+
+# Metrics Tests
+def test_metrics_endpoint(mock_db):
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+
+    client = app.test_client()
+    client.get('/authors')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'bookseller_request_duration_seconds_count{route="/authors",method="GET",status="200"}' in text
+    assert 'bookseller_db_query_duration_seconds_count{statement="SELECT Authors"}' in text
+    assert 'bookseller_phase_duration_seconds_count{phase="encode"}' in text
+    assert 'bookseller_pool_in_use' in text
+    assert 'bookseller_hasher_queue_depth' in text
+
+# Admission Control Tests
+@pytest.fixture
+def client_with(mocker, restore_components):
+    # a client of an app with extra settings, its database mocked like mock_db
+    def create(settings):
+        other = api.create_app(settings)
+        mock_conn = mocker.MagicMock()
+        mocker.patch.object(api.pool, 'get', return_value=mock_conn)
+        mocker.patch.object(api.pool, 'put')
+        mock_conn.cursor.return_value.fetchone.return_value = None
+        return other.test_client(), mock_conn.cursor.return_value
+    return create
+
+def test_rate_limit_per_client(client_with):
+    client, mock_db = client_with({'RATE_LIMIT_PER_SECOND': 0.1, 'RATE_LIMIT_BURST': 3})
+    mock_db.fetchall.return_value = []
+
+    assert [client.get('/').status_code for _ in range(3)] == [200, 200, 200]
+    response = client.get('/')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
+
+    # a token's user has a budget of its own; /metrics is free
+    assert client.get('/customers?limit=1', headers=auth_headers()).status_code == 200
+    assert client.get('/metrics').status_code == 200
+
+def test_rate_limit_route_costs(client_with):
+    client, mock_db = client_with({'RATE_LIMIT_PER_SECOND': 0.1, 'RATE_LIMIT_BURST': 10})
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+
+    # an unpaginated list takes the whole bucket, a page of it doesn't
+    assert client.get('/authors?limit=1').status_code == 200
+    assert client.get('/authors').status_code == 429
+    assert client.post('/login', json={}).status_code == 429
+
+def test_concurrency_cap_sheds_load(client_with):
+    client, mock_db = client_with({'MAX_CONCURRENT_REQUESTS': 4, 'MAX_CONCURRENT_FULL_TABLE': 1})
+    mock_db.fetchall.return_value = [(1, 'John', 'Doe')]
+
+    # one full-table read already in flight
+    assert api.full_table_slots.try_acquire()
+    response = client.get('/authors')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/authors?limit=1').status_code == 200
+
+    # every slot is handed back, also after a rejection
+    api.full_table_slots.release()
+    assert client.get('/authors').status_code == 200
+    assert api.request_slots.stats()['active'] == 0
+    assert api.full_table_slots.stats() == {'limit': 1, 'active': 0, 'rejected': 1}
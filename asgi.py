@@ -0,0 +1,724 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiomysql
+from quart import Quart, Response, jsonify, request, url_for
+
+from auth import RevocationList, TokenCache, create_token, revoke_token, verify_token
+from compression import (
+    available_encodings, choose_encoding, compress, compress_chunks_async, is_compressible, mark_encoded,
+)
+from config import DEFAULT_CONFIG, from_environ
+from db import PoolTimeout
+from hashing import HasherBusy, PasswordHasher
+from resources import (
+    RESOURCES, bump_versions_query, changed_fields, delete_queries, etag_version, insert_query, insert_values,
+    is_paginated, item_etag, item_query, layout_columns, next_cursor, next_page_args, parse_page_args, projection,
+    row_snapshot_query, select_query, update_fields, update_query, update_values, validate_insert, validate_update,
+)
+from sales import ORDER_COLUMNS, forget_statements, order_from_values, summary_statements
+from serializers import create_serializer, list_envelope
+from tabular import FORMATS, MEDIA_TYPES, choose_format, csv_rows, msgpack_document, table_envelope
+from users import UserRegistry
+
+# Asynchronous entry point serving the same routes as api.py on an asyncio
+# event loop, e.g.:
+#
+#     hypercorn asgi:app
+#
+# Validation, SQL and row mapping come from resources.py and auth.py, so both
+# apps accept and return exactly the same documents.
+app = Quart(__name__)
+app.config.from_mapping(DEFAULT_CONFIG)
+app.config.from_mapping(from_environ(DEFAULT_CONFIG))
+
+token_cache = TokenCache(app.config["TOKEN_CACHE_SIZE"])
+revoked_tokens = RevocationList(app.config["TOKEN_REVOCATION_LOG"])
+users = UserRegistry(app.config["USERS_LOG"], legacy_path=app.config["USERS_LEGACY_JSON"])
+serializer = create_serializer(app.config["JSON_SERIALIZER"])
+encodings = available_encodings(app.config["COMPRESSION_ENCODINGS"])
+hasher = PasswordHasher(
+    rounds=app.config["BCRYPT_LOG_ROUNDS"],
+    workers=app.config["BCRYPT_WORKERS"],
+    max_queue=app.config["BCRYPT_MAX_QUEUE"],
+    timeout=app.config["BCRYPT_TIMEOUT"],
+)
+
+# async connection pool, opened once the event loop is running
+@app.before_serving
+async def open_pool():
+    app.db_pool = await aiomysql.create_pool(
+        host=app.config["MYSQL_HOST"],
+        port=app.config["MYSQL_PORT"],
+        user=app.config["MYSQL_USER"],
+        password=app.config["MYSQL_PASSWORD"],
+        db=app.config["MYSQL_DB"],
+        charset="utf8mb4",
+        init_command="SET time_zone = '+00:00'",
+        autocommit=False,
+        minsize=app.config["MYSQL_POOL_MIN_SIZE"],
+        maxsize=app.config["MYSQL_POOL_MAX_SIZE"],
+        pool_recycle=app.config["MYSQL_POOL_IDLE_TIMEOUT"],
+    )
+
+@app.after_serving
+async def close_pool():
+    app.db_pool.close()
+    await app.db_pool.wait_closed()
+
+@asynccontextmanager
+async def connection():
+    try:
+        conn = await asyncio.wait_for(app.db_pool.acquire(), app.config["MYSQL_POOL_CHECKOUT_TIMEOUT"])
+    except asyncio.TimeoutError:
+        raise PoolTimeout(f"No database connection available within {app.config['MYSQL_POOL_CHECKOUT_TIMEOUT']}s")
+
+    try:
+        yield conn
+    finally:
+        try:
+            # ends the transaction so the next request doesn't inherit its snapshot or locks
+            await conn.rollback()
+        except Exception:
+            conn.close()
+        app.db_pool.release(conn)
+
+def response_encoding():
+    return choose_encoding(request.accept_encodings, encodings)
+
+# buffered responses of COMPRESSION_MIN_SIZE bytes or more, same as api.py
+@app.after_request
+async def compress_response(response):
+    if not is_compressible(response, app.config["COMPRESSION_MIN_SIZE"]):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = response_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(encoding, await response.get_data(), app.config["COMPRESSION_LEVEL"]))
+    mark_encoded(response, encoding)
+    return response
+
+async def bump_versions(conn, *tables):
+    async with conn.cursor() as cursor:
+        await cursor.execute(bump_versions_query(tables), tables)
+
+# optimistic concurrency with row versions and If-Match (see api.py)
+def if_match_version(resource, item_id):
+    if not request.if_match or request.if_match.star_tag:
+        return None, None
+    for etag in request.if_match.as_set():
+        version = etag_version(resource, item_id, etag)
+        if version is not None:
+            return version, None
+    return None, precondition_failed(resource)
+
+def precondition_failed(resource):
+    return handle_error(f"{resource['label']} was modified by another request", 412)
+
+async def read_row(conn, resource, columns, item_id, lock=True):
+    async with conn.cursor() as cursor:
+        await cursor.execute(row_snapshot_query(resource, columns, lock), (item_id,))
+        row = await cursor.fetchone()
+    if row is None:
+        return None, None
+    return dict(zip(columns, row)), row[-1]
+
+# sales summaries (see sales.py), written in the same transaction as the
+# order change they reflect
+
+async def update_sales(conn, old_orders=(), new_orders=()):
+    async with conn.cursor() as cursor:
+        for query, rows in summary_statements(old_orders, new_orders):
+            await cursor.executemany(query, rows)
+
+async def forget_sales(conn, resource, item_id):
+    async with conn.cursor() as cursor:
+        for query, params in forget_statements(resource, item_id):
+            await cursor.execute(query, params)
+
+# error handler
+def handle_error(error_msg, status_code):
+    return jsonify({"error": error_msg}), status_code
+
+@app.errorhandler(PoolTimeout)
+async def handle_pool_timeout(error):
+    response, status = handle_error("Database is busy, please retry", 503)
+    response.headers["Retry-After"] = "1"
+    return response, status
+
+# token validation; the revocation list may read its journal, so off the
+# event loop
+async def validate_token():
+    token = request.headers.get("x-access-token")
+
+    current_user, error_msg = await asyncio.to_thread(
+        verify_token, token, app.config["SECRET_KEY"], token_cache, revoked_tokens
+    )
+    if error_msg:
+        return None, handle_error(error_msg, 401)
+    return current_user, None
+
+# role validation
+def validate_role(current_user, valid_roles):
+    if isinstance(valid_roles, str):
+        valid_roles = [valid_roles]
+
+    if current_user["role"] not in valid_roles:
+        return jsonify({"error": "Unauthorized access"}), 403
+    return None
+
+@app.errorhandler(HasherBusy)
+async def handle_hasher_busy(error):
+    response, status = handle_error("Too many login attempts in progress, please retry", 503)
+    response.headers["Retry-After"] = "1"
+    return response, status
+
+# bcrypt runs on the hasher's worker pool, never on the event loop
+async def wait_hasher(future):
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), hasher.timeout)
+    except asyncio.TimeoutError:
+        raise HasherBusy(f"Password operation did not finish within {hasher.timeout}s")
+
+# user registration
+@app.route("/register", methods=["POST"])
+async def register():
+    data = await request.get_json()
+    if not data or not data.get("username") or not data.get("password") or not data.get("role"):
+        return handle_error("Missing required fields: username, password, and role are mandatory", 400)
+
+    username = data["username"]
+    role = data["role"]
+
+    if await asyncio.to_thread(users.get, username):
+        return handle_error("Username already exists", 400)
+
+    password = await wait_hasher(hasher.submit_hash(data["password"]))
+
+    if not await asyncio.to_thread(users.add, username, password, role):
+        return handle_error("Username already exists", 400)
+
+    return jsonify({"message": "User registered successfully"}), 201
+
+# user login
+@app.route("/login", methods=["POST"])
+async def login():
+    data = await request.get_json()
+    if not data or not data.get("username") or not data.get("password"):
+        return handle_error("Missing required fields: username and password are mandatory", 400)
+
+    username = data["username"]
+    user = await asyncio.to_thread(users.get, username)
+
+    if user and await wait_hasher(hasher.submit_check(user["password"], data["password"])):
+        if hasher.needs_rehash(user["password"]):
+            hasher.rehash(data["password"], lambda password_hash: users.set_password(username, password_hash))
+
+        token = create_token(username, user["role"], app.config["SECRET_KEY"])
+        return jsonify({"token": token}), 200
+
+    return handle_error("Invalid credentials", 401)
+
+# user logout
+@app.route("/logout", methods=["POST"])
+async def logout():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    await asyncio.to_thread(revoke_token, request.headers["x-access-token"], token_cache, revoked_tokens)
+
+    return jsonify({"message": "Logged out successfully"}), 200
+
+# index
+@app.route("/")
+async def hello_world():
+    return """
+    <h1>WELCOME TO BOOKSELLER DATABASE</h1>
+    <p>This is the main page of the Bookseller Database API.</p>
+    <p>You can interact with the database through various endpoints like:</p>
+    <ul>
+        <li><a href="/authors">Authors</a></li>
+        <li><a href="/books">Books</a></li>
+    </ul>
+    <p>Use the provided routes to interact with the API. Ensure to use valid authentication tokens when necessary.</p>
+    """
+
+# response format of a list request, see tabular.py
+def list_format(page):
+    # returns (format, error response)
+    if page["stream"]:
+        return page["stream"], None
+    fmt = request.args.get("format")
+    if fmt is None:
+        return choose_format(request.accept_mimetypes), None
+    if fmt not in FORMATS:
+        return None, handle_error(f"'format' must be one of: {', '.join(FORMATS)}", 400)
+    return fmt, None
+
+# GET
+async def list_resource(name, not_found_msg):
+    resource = RESOURCES[name]
+
+    page, error_msg = parse_page_args(request.args, app.config["MAX_PAGE_SIZE"], resource)
+    if error_msg:
+        return handle_error(error_msg, 400)
+
+    fmt, error = list_format(page)
+    if error:
+        return error
+
+    query, params = select_query(resource, page)
+    _, layout = projection(resource, page)
+
+    if page["stream"]:
+        return await stream_resource(layout, query, params, fmt, not_found_msg)
+
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+
+    if not rows and not is_paginated(page):
+        return handle_error(not_found_msg, 404)
+
+    page_links = None
+    if is_paginated(page):
+        cursor_id = next_cursor(page, rows)
+        next_url = None
+        if cursor_id is not None:
+            next_url = url_for(request.endpoint, **next_page_args(page, cursor_id))
+        page_links = (cursor_id, next_url)
+
+    if fmt == "table":
+        body = table_envelope(serializer, layout, serializer.arrays(layout, rows), page_links) + b"\n"
+    elif fmt == "csv":
+        body = csv_rows(layout, rows, header=True)
+    elif fmt == "msgpack":
+        body = msgpack_document(layout, rows, page_links)
+    else:
+        body = serializer.rows(layout, rows)
+        if page_links is not None:
+            body = list_envelope(serializer, body, *page_links)
+        body += b"\n"
+
+    response = Response(body, mimetype=MEDIA_TYPES[fmt])
+    response.vary.add("Accept")
+    # CSV has no room for the page links
+    if fmt == "csv" and page_links is not None and page_links[0] is not None:
+        response.headers["Link"] = f'<{page_links[1]}>; rel="next"'
+        response.headers["X-Next-Cursor"] = str(page_links[0])
+    return response, 200
+
+# streaming: the connection stays checked out until the last batch is sent
+async def stream_resource(layout, query, params, fmt, not_found_msg):
+    conn_context = connection()
+    conn = await conn_context.__aenter__()
+    cursor = await conn.cursor(aiomysql.SSCursor)
+    batch_size = app.config["STREAM_BATCH_SIZE"]
+
+    async def close():
+        await cursor.close()
+        await conn_context.__aexit__(None, None, None)
+
+    try:
+        await cursor.execute(query, params)
+        rows = await cursor.fetchmany(batch_size)
+    except BaseException:
+        await close()
+        raise
+
+    if not rows:
+        await close()
+        return handle_error(not_found_msg, 404)
+
+    encode = serializer.array(layout) if fmt == "table" else serializer.row(layout)
+
+    # one chunk per batch
+    async def generate(rows):
+        try:
+            if fmt == "json":
+                yield b"["
+            elif fmt == "table":
+                yield b'{"columns":' + serializer.dumps(layout_columns(layout)) + b',"rows":['
+            first = True
+            while rows:
+                if fmt == "csv":
+                    yield csv_rows(layout, rows, header=first)
+                elif fmt == "ndjson":
+                    yield b"\n".join([encode(row) for row in rows]) + b"\n"
+                else:
+                    yield (b"" if first else b",") + b",".join([encode(row) for row in rows])
+                first = False
+                rows = await cursor.fetchmany(batch_size)
+            if fmt == "json":
+                yield b"]"
+            elif fmt == "table":
+                yield b"]}"
+        finally:
+            await close()
+
+    # compressed chunk by chunk, whatever the size
+    body = generate(rows)
+    encoding = response_encoding()
+    if encoding is not None:
+        body = compress_chunks_async(encoding, app.config["COMPRESSION_LEVEL"], body)
+
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else MEDIA_TYPES[fmt]
+    response = Response(body, mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        mark_encoded(response, encoding)
+    return response
+
+@app.route("/authors")
+async def get_authors():
+    return await list_resource("authors", "No authors found")
+
+@app.route("/books")
+async def get_books():
+    return await list_resource("books", "No books found")
+
+@app.route("/customers")
+async def customers():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await list_resource("customers", "No customers found")
+
+@app.route("/orders")
+async def get_orders():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await list_resource("orders", "No orders found")
+
+# single items by primary key (api.py also caches them)
+async def get_item(name, item_id):
+    resource = RESOURCES[name]
+    query, layout = item_query(resource)
+
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(query, (item_id,))
+            row = await cursor.fetchone()
+
+    if row is None:
+        return handle_error(f"{resource['label']} not found", 404)
+
+    etag = item_etag(resource, item_id, row[-1])
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(serializer.row(layout)(row) + b"\n", mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+@app.route("/authors/<int:author_id>")
+async def get_author(author_id):
+    return await get_item("authors", author_id)
+
+@app.route("/books/<int:book_id>")
+async def get_book(book_id):
+    return await get_item("books", book_id)
+
+@app.route("/customers/<int:customer_id>")
+async def get_customer(customer_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await get_item("customers", customer_id)
+
+@app.route("/orders/<int:order_id>")
+async def get_order(order_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await get_item("orders", order_id)
+
+# POST
+async def add_item(name):
+    resource = RESOURCES[name]
+    data = await request.get_json()
+
+    error_msg = validate_insert(resource, data)
+    if error_msg:
+        return handle_error(error_msg, 400)
+
+    try:
+        async with connection() as conn:
+            values = insert_values(resource, data)
+            async with conn.cursor() as cursor:
+                await cursor.execute(insert_query(resource), values)
+            if name == "orders":
+                await update_sales(conn, new_orders=[order_from_values(values)])
+            await bump_versions(conn, resource["table"])
+            await conn.commit()
+
+        return jsonify({"message": f"{resource['label']} added successfully"}), 201
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        return handle_error(f"An error occurred: {str(e)}", 500)
+
+@app.route("/authors", methods=["POST"])
+async def add_author():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await add_item("authors")
+
+@app.route("/books", methods=["POST"])
+async def add_book():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await add_item("books")
+
+@app.route("/customers", methods=["POST"])
+async def add_customer():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await add_item("customers")
+
+@app.route("/orders", methods=["POST"])
+async def add_order():
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await add_item("orders")
+
+# PUT
+# only the supplied, changed fields are written (see api.py)
+async def update_item(name, item_id):
+    resource = RESOURCES[name]
+    data = await request.get_json()
+
+    error_msg = validate_update(resource, data)
+    if error_msg:
+        return handle_error(error_msg, 400)
+
+    expected, error = if_match_version(resource, item_id)
+    if error:
+        return error
+
+    fields = update_fields(resource, data)
+    columns = ORDER_COLUMNS if name == "orders" else tuple(fields)
+
+    try:
+        async with connection() as conn:
+            current, version = await read_row(conn, resource, columns, item_id, lock=expected is None)
+            if current is None:
+                return handle_error(f"{resource['label']} not found", 404)
+            if expected is not None and version != expected:
+                return precondition_failed(resource)
+
+            changes = changed_fields(current, fields)
+            if changes:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(update_query(resource, changes), update_values(changes, item_id, version))
+                    rowcount = cursor.rowcount
+                if rowcount == 0:
+                    return precondition_failed(resource)
+                if name == "orders":
+                    await update_sales(conn, [current], [dict(current, **changes)])
+                await bump_versions(conn, resource["table"])
+                await conn.commit()
+                version += 1
+
+        response = jsonify({"message": f"{resource['label']} updated successfully", "changed": list(changes)})
+        response.set_etag(item_etag(resource, item_id, version))
+        return response, 200
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        return handle_error(f"An error occurred: {str(e)}", 500)
+
+@app.route("/authors/<int:author_id>", methods=["PUT", "PATCH"])
+async def update_author(author_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await update_item("authors", author_id)
+
+@app.route("/books/<int:book_id>", methods=["PUT", "PATCH"])
+async def update_book(book_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await update_item("books", book_id)
+
+@app.route("/customers/<int:customer_id>", methods=["PUT", "PATCH"])
+async def update_customer(customer_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await update_item("customers", customer_id)
+
+@app.route("/orders/<int:order_id>", methods=["PUT", "PATCH"])
+async def update_order(order_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager', 'staff'])
+    if role_error:
+        return role_error
+
+    return await update_item("orders", order_id)
+
+# DELETE: one transaction, one commit (see api.py)
+async def delete_item(name, item_id):
+    resource = RESOURCES[name]
+    referencing = [table for table, _ in resource["references"]]
+
+    expected, error = if_match_version(resource, item_id)
+    if error:
+        return error
+
+    try:
+        async with connection() as conn:
+            if name == "orders" or expected is not None:
+                columns = ORDER_COLUMNS if name == "orders" else ()
+                current, version = await read_row(conn, resource, columns, item_id, lock=expected is None)
+                if current is None:
+                    return handle_error(f"{resource['label']} not found", 404)
+                if expected is not None and version != expected:
+                    return precondition_failed(resource)
+                if name == "orders":
+                    await update_sales(conn, old_orders=[current])
+            if name != "orders":
+                await forget_sales(conn, resource, item_id)
+
+            queries = delete_queries(resource, versioned=expected is not None)
+            changed = []
+            async with conn.cursor() as cursor:
+                for query, table in zip(queries, referencing + [resource["table"]]):
+                    params = (item_id, expected) if query is queries[-1] and expected is not None else (item_id,)
+                    await cursor.execute(query, params)
+                    if cursor.rowcount:
+                        changed.append(table)
+
+            if resource["table"] not in changed:
+                if expected is not None:
+                    return precondition_failed(resource)
+                return handle_error(f"{resource['label']} not found", 404)
+
+            await bump_versions(conn, *changed)
+            await conn.commit()
+
+        return jsonify({"message": f"{resource['label']} deleted successfully"}), 200
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        return handle_error(f"An error occurred: {str(e)}", 500)
+
+@app.route("/authors/<int:author_id>", methods=["DELETE"])
+async def delete_author(author_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
+
+    return await delete_item("authors", author_id)
+
+@app.route("/books/<int:book_id>", methods=["DELETE"])
+async def delete_book(book_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
+
+    return await delete_item("books", book_id)
+
+@app.route("/customers/<int:customer_id>", methods=["DELETE"])
+async def delete_customer(customer_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
+
+    return await delete_item("customers", customer_id)
+
+@app.route("/orders/<int:order_id>", methods=["DELETE"])
+async def delete_order(order_id):
+    current_user, error = await validate_token()
+    if error:
+        return error
+
+    role_error = validate_role(current_user, ['manager'])
+    if role_error:
+        return role_error
+
+    return await delete_item("orders", order_id)
+
+if __name__ == '__main__':
+    app.run(debug=True)
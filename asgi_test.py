@@ -0,0 +1,232 @@
+import asyncio
+import datetime
+import functools
+import jwt
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("aiomysql")
+
+import asgi
+from asgi import app
+from users import UserRegistry
+
+def run_async(test):
+    @functools.wraps(test)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(test(*args, **kwargs))
+    return wrapper
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = conn.rowcount
+
+    def __await__(self):
+        async def ready():
+            return self
+        return ready().__await__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, query, params=None):
+        self.conn.executed.append((query, params))
+
+    async def executemany(self, query, params):
+        self.conn.executed.append((query, list(params)))
+
+    async def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+
+    async def fetchall(self):
+        return self.conn.rows
+
+    async def fetchmany(self, size):
+        rows, self.conn.rows = self.conn.rows[:size], self.conn.rows[size:]
+        return rows
+
+    async def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self):
+        self.rows = []
+        self.rowcount = 1
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+        self.released = 0
+
+    async def acquire(self):
+        return self.conn
+
+    def release(self, conn):
+        self.released += 1
+
+@pytest.fixture
+def db():
+    app.db_pool = FakePool()
+    return app.db_pool.conn
+
+def auth_headers(role='manager'):
+    token = jwt.encode(
+        {'user_id': 'tester', 'role': role, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+        app.config['SECRET_KEY'],
+        algorithm='HS256',
+    )
+    return {'x-access-token': token}
+
+@run_async
+async def test_get_authors(db):
+    db.rows = [(1, 'John', 'Doe'), (2, 'Jane', 'Smith')]
+
+    response = await app.test_client().get('/authors')
+
+    assert response.status_code == 200
+    assert await response.get_json() == [
+        {'author_FirstName': 'John', 'author_LastName': 'Doe'},
+        {'author_FirstName': 'Jane', 'author_LastName': 'Smith'},
+    ]
+    assert db.rollbacks == 1
+    assert app.db_pool.released == 1
+
+@run_async
+async def test_get_books_empty(db):
+    response = await app.test_client().get('/books')
+
+    assert response.status_code == 404
+    assert b"No books found" in await response.get_data()
+
+@run_async
+async def test_get_author_item(db):
+    db.rows = [(1, 'John', 'Doe', 2)]
+    client = app.test_client()
+
+    response = await client.get('/authors/1')
+    assert await response.get_json() == {'author_FirstName': 'John', 'author_LastName': 'Doe'}
+    assert response.headers['ETag'] == '"authors-1-v2"'
+
+    response = await client.get('/authors/1', headers={'If-None-Match': '"authors-1-v2"'})
+    assert response.status_code == 304
+
+@run_async
+async def test_get_orders_paginated(db):
+    db.rows = [(5, '2024-01-01', 100.0, 1, 1)]
+
+    response = await app.test_client().get('/orders?limit=1', headers=auth_headers())
+
+    data = await response.get_json()
+    assert data['next_cursor'] == 5
+    assert db.executed[0] == ("SELECT order_ID, order_Date, order_Value, customer_ID, book_ID FROM Orders ORDER BY order_ID LIMIT %s", (1,))
+
+@run_async
+async def test_get_customers_requires_token(db):
+    response = await app.test_client().get('/customers')
+
+    assert response.status_code == 401
+
+@run_async
+async def test_get_books_stream(db):
+    db.rows = [(1, 'First', '111', None), (2, 'Second', '222', None)]
+
+    response = await app.test_client().get('/books?stream=ndjson')
+
+    assert response.status_code == 200
+    assert len((await response.get_data(as_text=True)).splitlines()) == 2
+
+@run_async
+async def test_get_books_tabular_formats(db):
+    rows = [(1, 'First', '111', None), (2, 'Second', '222', None)]
+    client = app.test_client()
+
+    db.rows = list(rows)
+    response = await client.get('/books?stream=csv')
+    assert response.mimetype == 'text/csv'
+    assert (await response.get_data(as_text=True)).splitlines() == ['book_Title,ISBN,publication_Date', 'First,111,', 'Second,222,']
+
+    db.rows = list(rows)
+    response = await client.get('/books?stream=table')
+    assert await response.get_json() == {'columns': ['book_Title', 'ISBN', 'publication_Date'], 'rows': [['First', '111', None], ['Second', '222', None]]}
+
+    db.rows = list(rows)
+    response = await client.get('/books?limit=2', headers={'Accept': 'text/csv'})
+    assert response.mimetype == 'text/csv'
+    assert response.headers['X-Next-Cursor'] == '2'
+
+    response = await client.get('/books?format=xml')
+    assert response.status_code == 400
+
+@run_async
+async def test_add_book(db):
+    response = await app.test_client().post('/books', headers=auth_headers(), json={'book_Title': 'New', 'ISBN': '1'})
+
+    assert response.status_code == 201
+    assert db.executed[0][0].startswith("INSERT INTO Books")
+    assert db.commits == 1
+
+@run_async
+async def test_add_author_missing_fields(db):
+    response = await app.test_client().post('/authors', headers=auth_headers(), json={})
+
+    assert response.status_code == 400
+    assert b"Missing required fields: author_FirstName and author_LastName are mandatory" in await response.get_data()
+
+@run_async
+async def test_update_customer_not_found(db):
+    db.rowcount = 0
+
+    response = await app.test_client().put('/customers/999', headers=auth_headers(), json={'customer_Name': 'X'})
+
+    assert response.status_code == 404
+
+@run_async
+async def test_delete_author_requires_manager(db):
+    response = await app.test_client().delete('/authors/1', headers=auth_headers('staff'))
+
+    assert response.status_code == 403
+
+@run_async
+async def test_register_and_login(tmp_path, monkeypatch):
+    monkeypatch.setattr(asgi, 'users', UserRegistry(str(tmp_path / "users.log")))
+    monkeypatch.setattr(asgi.hasher, 'rounds', 4)
+    client = app.test_client()
+
+    response = await client.post('/register', json={'username': 'alice', 'password': 'secret', 'role': 'staff'})
+    assert response.status_code == 201
+
+    response = await client.post('/login', json={'username': 'alice', 'password': 'secret'})
+    assert response.status_code == 200
+    assert 'token' in await response.get_json()
+
+@run_async
+async def test_update_order_moves_sales(db):
+    db.rows = [('2024-01-01', 10, 1, 2, 1)]
+
+    response = await app.test_client().put('/orders/7', json={
+        'order_Date': '2024-01-01', 'order_Value': 10, 'customer_ID': 1, 'book_ID': 3,
+    }, headers=auth_headers())
+
+    assert response.status_code == 200
+    queries = [query for query, _ in db.executed]
+    assert queries[0].endswith("WHERE order_ID = %s FOR UPDATE")
+    assert queries[1].startswith("UPDATE Orders SET")
+    upserts = [params for query, params in db.executed if query.startswith("INSERT INTO Sales_By_Book")]
+    assert upserts == [[(2, -1, -10), (3, 1, 10)]]
+    assert db.commits == 1
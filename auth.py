@@ -0,0 +1,193 @@
+import collections
+import datetime
+import hashlib
+import threading
+import time
+
+import jwt
+
+from journal import Journal
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def create_token(username, role, secret, lifetime=datetime.timedelta(hours=1)):
+    return jwt.encode(
+        {
+            "user_id": username,
+            "role": role,
+            "exp": datetime.datetime.now(datetime.timezone.utc) + lifetime,
+        },
+        secret,
+        algorithm="HS256",
+    )
+
+
+# token verification shared by the WSGI and ASGI apps
+#
+# Verified tokens are cached by digest until their exp, so a hot token costs
+# a dict lookup instead of an HMAC check and a JSON decode.
+def verify_token(token, secret, cache, revoked):
+    # returns (current_user, error message)
+    if not token:
+        return None, "Token is missing!"
+
+    digest = token_digest(token)
+    if digest in revoked:
+        return None, "Token has been revoked!"
+
+    current_user = cache.get(digest)
+    if current_user is not None:
+        return current_user, None
+
+    try:
+        data = jwt.decode(token, secret, algorithms=["HS256"])
+        current_user = {"user_id": data["user_id"], "role": data["role"]}
+    except Exception:
+        return None, "Token is invalid!"
+
+    cache.put(digest, current_user, data.get("exp"))
+    return current_user, None
+
+
+def revoke_token(token, cache, revoked):
+    digest = token_digest(token)
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except Exception:
+        exp = None
+
+    revoked.revoke(digest, exp)
+    cache.discard(digest)
+
+
+# bounded LRU of verified JWT claims keyed by token digest
+#
+# An entry lives until the token's own exp claim, so a cached token is never
+# accepted after it would have failed jwt.decode.
+class TokenCache:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # digest -> (claims, exp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            claims, exp = entry
+            if exp is not None and exp <= time.time():
+                del self._entries[digest]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return claims
+
+    def put(self, digest, claims, exp=None):
+        with self._lock:
+            self._entries[digest] = (claims, exp)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# revoked token digests, shared between worker processes through a journal
+#
+# Membership checks are set lookups; the journal is polled for revocations
+# made by other workers at most once every refresh_interval seconds.
+# Entries are dropped once the token would have expired anyway, and the
+# journal is rewritten without them once compact_after have expired.
+class RevocationList:
+    def __init__(self, path, refresh_interval=1.0, compact_after=1000):
+        self.journal = Journal(path)
+        self.refresh_interval = refresh_interval
+        self.compact_after = compact_after
+        self._revoked = {}  # digest -> exp
+        self._expired = 0  # dropped since the journal was last rewritten
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _apply(self, records, reset):
+        if reset:
+            self._revoked.clear()
+        for record in records:
+            self._revoked[bytes.fromhex(record["digest"])] = record.get("exp")
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        self._next_refresh = now + self.refresh_interval
+        self._apply(*self.journal.read_new())
+        self._drop_expired()
+
+    def _drop_expired(self):
+        wall = time.time()
+        expired = [d for d, exp in self._revoked.items() if exp is not None and exp <= wall]
+        for digest in expired:
+            del self._revoked[digest]
+        self._expired += len(expired)
+
+    def __contains__(self, digest):
+        with self._lock:
+            self._refresh()
+            return digest in self._revoked
+
+    def revoke(self, digest, exp=None):
+        with self._lock:
+            with self.journal.transaction() as f:
+                self._apply(*self.journal.read_new())
+                self.journal.append(f, {"digest": digest.hex(), "exp": exp})
+            self._revoked[digest] = exp
+            self._drop_expired()
+            if self._expired >= self.compact_after:
+                self._compact()
+
+    def compact(self):
+        # drops the records of tokens that have expired since they were revoked
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        with self.journal.transaction():
+            self._apply(*self.journal.read_new())
+            self._drop_expired()
+            self.journal.rewrite([{"digest": digest.hex(), "exp": exp} for digest, exp in self._revoked.items()])
+        self._expired = 0
+
+    def __len__(self):
+        with self._lock:
+            self._refresh(force=True)
+            return len(self._revoked)
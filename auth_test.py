@@ -0,0 +1,60 @@
+import time
+from auth import RevocationList, TokenCache, token_digest
+
+def test_token_cache_hit_and_miss():
+    cache = TokenCache()
+    digest = token_digest('token')
+    assert cache.get(digest) is None
+
+    cache.put(digest, {'user_id': 'alice', 'role': 'staff'}, time.time() + 60)
+    assert cache.get(digest) == {'user_id': 'alice', 'role': 'staff'}
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_token_cache_honours_exp():
+    cache = TokenCache()
+    digest = token_digest('token')
+    cache.put(digest, {'user_id': 'alice', 'role': 'staff'}, time.time() - 1)
+
+    assert cache.get(digest) is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['size'] == 0
+
+def test_token_cache_lru_eviction():
+    cache = TokenCache(max_entries=2)
+    for name in ('a', 'b'):
+        cache.put(token_digest(name), {'user_id': name})
+    cache.get(token_digest('a'))
+    cache.put(token_digest('c'), {'user_id': 'c'})
+
+    assert cache.get(token_digest('b')) is None
+    assert cache.get(token_digest('a')) is not None
+    assert cache.stats()['evictions'] == 1
+
+def test_revocation_shared_between_workers(tmp_path):
+    path = str(tmp_path / "revoked.log")
+    worker_a = RevocationList(path, refresh_interval=0)
+    worker_b = RevocationList(path, refresh_interval=0)
+    digest = token_digest('token')
+
+    worker_a.revoke(digest, time.time() + 60)
+    assert digest in worker_b
+
+def test_revocation_expires_with_token(tmp_path):
+    revoked = RevocationList(str(tmp_path / "revoked.log"), refresh_interval=0)
+    revoked.revoke(token_digest('token'), time.time() - 1)
+
+    assert len(revoked) == 0
+
+def test_revocation_journal_is_compacted(tmp_path):
+    path = tmp_path / "revoked.log"
+    revoked = RevocationList(str(path), refresh_interval=0, compact_after=2)
+    live = token_digest('live')
+    revoked.revoke(live, time.time() + 60)
+    revoked.revoke(token_digest('a'), time.time() - 1)
+    assert len(path.read_text().splitlines()) == 2
+
+    revoked.revoke(token_digest('b'), time.time() - 1)
+
+    assert len(path.read_text().splitlines()) == 1
+    assert live in RevocationList(str(path))
@@ -0,0 +1,453 @@
+import argparse
+import concurrent.futures
+import datetime
+import decimal
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import api
+from db import ConnectionPool
+from users import UserRegistry
+
+# Load-test harness for every endpoint.
+#
+# Seeds a SQLite database with generated authors, books, customers and orders,
+# points the app's connection pool at it, serves the app on a local port and
+# drives each route with concurrent HTTP clients. Latency percentiles and
+# throughput per route are printed and saved as JSON, e.g.:
+#
+#     python benchmark.py --orders 100000 --concurrency 16 --requests 1000
+#
+# SQLite stands in for MySQL so the suite runs anywhere; absolute numbers are
+# only comparable between runs on the same machine and settings.
+#
+# --startup RUNS times cold starts of a worker process instead (see
+# measure_startup).
+
+SQLITE_SCHEMA = """
+CREATE TABLE Authors (
+    author_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    author_FirstName TEXT,
+    author_LastName TEXT
+);
+CREATE TABLE Books (
+    book_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    book_Title TEXT,
+    author_ID INTEGER,
+    ISBN TEXT,
+    publication_Date TEXT
+);
+CREATE TABLE Customers (
+    customer_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_Name TEXT,
+    customer_Phone TEXT,
+    customer_Email TEXT
+);
+CREATE TABLE Orders (
+    order_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_Date TEXT,
+    order_Value REAL,
+    customer_ID INTEGER,
+    book_ID INTEGER
+);
+CREATE TABLE Table_Versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+INSERT INTO Table_Versions (table_name) VALUES ('Authors'), ('Books'), ('Customers'), ('Orders');
+"""
+
+sqlite3.register_adapter(decimal.Decimal, float)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(SCRIPT_DIR, "migrations")
+
+VALUES_FUNCTION = re.compile(r"\bVALUES\((\w+)\)")
+
+TIMESTAMP = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(\.\d+)?$")
+
+MATCH_AGAINST = re.compile(r"MATCH \(([^)]*)\) AGAINST \(%s IN BOOLEAN MODE\)")
+
+
+def fulltext_match(query, *texts):
+    # the "+word*" boolean-mode queries of resources.parse_search, without
+    # an index: every term starts some word of the texts
+    words = re.findall(r"\w+", " ".join(text for text in texts if text).lower())
+    terms = [term.strip("+*").lower() for term in query.split()]
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+# MySQLdb-style wrapper around a sqlite3 connection: %s placeholders, MySQL
+# timestamp functions, upserts, FOR UPDATE, FULLTEXT searches and DATETIME
+# results are translated on the fly
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _translate(query):
+        query = MATCH_AGAINST.sub(r"fulltext_match(%s, \1)", query)
+        query = query.replace("%s", "?").replace(" FOR UPDATE", "")
+        query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+        query = VALUES_FUNCTION.sub(r"excluded.\1", query)
+        return query.replace("CURRENT_TIMESTAMP(6)", "strftime('%Y-%m-%d %H:%M:%f', 'now')")
+
+    @staticmethod
+    def _convert(row):
+        if row is None:
+            return None
+        return tuple(
+            datetime.datetime.fromisoformat(value) if isinstance(value, str) and TIMESTAMP.match(value) else value
+            for value in row
+        )
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(self._translate(query), params)
+
+    def executemany(self, query, params):
+        return self._cursor.executemany(self._translate(query), params)
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.create_function("fulltext_match", -1, fulltext_match, deterministic=True)
+
+    def cursor(self, cursor_class=None):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+def seed_database(path, authors, books, customers, orders, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SQLITE_SCHEMA)
+    # the index, row version and ticket migrations are plain SQL SQLite accepts too
+    for migration in ("002_list_indexes.sql", "004_row_versions.sql", "005_order_tickets.sql"):
+        with open(os.path.join(MIGRATIONS_DIR, migration)) as f:
+            conn.executescript(f.read())
+
+    conn.executemany(
+        "INSERT INTO Authors (author_FirstName, author_LastName) VALUES (?, ?)",
+        ((f"First{i}", f"Last{i}") for i in range(authors)),
+    )
+    conn.executemany(
+        "INSERT INTO Books (book_Title, author_ID, ISBN, publication_Date) VALUES (?, ?, ?, ?)",
+        (
+            (f"Book {i}", rng.randint(1, max(authors, 1)), f"978{i:010d}", f"{rng.randint(1950, 2024)}-01-01")
+            for i in range(books)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO Customers (customer_Name, customer_Phone, customer_Email) VALUES (?, ?, ?)",
+        ((f"Customer {i}", f"555-{i:07d}", f"customer{i}@example.com") for i in range(customers)),
+    )
+    conn.executemany(
+        "INSERT INTO Orders (order_Date, order_Value, customer_ID, book_ID) VALUES (?, ?, ?, ?)",
+        (
+            (
+                f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                round(rng.uniform(5, 200), 2),
+                rng.randint(1, max(customers, 1)),
+                rng.randint(1, max(books, 1)),
+            )
+            for i in range(orders)
+        ),
+    )
+    # backfills the sales summaries from the orders above
+    with open(os.path.join(MIGRATIONS_DIR, "003_sales_summaries.sql")) as f:
+        conn.executescript(f.read())
+    conn.commit()
+    conn.close()
+
+
+# each scenario returns (method, path, body, needs_token) for one request
+def scenarios(volumes, rng):
+    counter = itertools.count()
+
+    # deletes walk through their own ID range so every request hits a row
+    delete_ids = iter(range(1, max(volumes["orders"], 1) + 1))
+
+    return {
+        "index": lambda: ("GET", "/", None, False),
+        "list_authors": lambda: ("GET", "/authors", None, False),
+        "list_books": lambda: ("GET", "/books", None, False),
+        "list_books_page": lambda: ("GET", f"/books?limit=100&after_id={rng.randint(0, volumes['books'])}", None, False),
+        "list_orders_fields": lambda: ("GET", "/orders?fields=order_ID,order_Value", None, True),
+        "filter_orders": lambda: ("GET", f"/orders?customer_ID={rng.randint(1, max(volumes['customers'], 1))}&order_Date_from=2024-06-01", None, True),
+        "sort_orders_page": lambda: ("GET", "/orders?sort=-order_Value&limit=100", None, True),
+        "search_books": lambda: ("GET", f"/books?q={rng.randint(0, 99)}&limit=100", None, False),
+        "expand_orders_page": lambda: ("GET", f"/orders?expand=customer,book&limit=100&after_id={rng.randint(0, volumes['orders'])}", None, True),
+        "expand_books": lambda: ("GET", "/books?expand=author&limit=100", None, False),
+        "list_customers": lambda: ("GET", "/customers", None, True),
+        "list_orders": lambda: ("GET", "/orders", None, True),
+        "list_orders_page": lambda: ("GET", f"/orders?limit=100&after_id={rng.randint(0, volumes['orders'])}", None, True),
+        "stream_orders": lambda: ("GET", "/orders?stream=ndjson", None, True),
+        "report_top_books": lambda: ("GET", "/reports/top-books?limit=20", None, True),
+        "report_revenue_by_month": lambda: ("GET", "/reports/revenue?period=month", None, True),
+        "add_author": lambda: ("POST", "/authors", {"author_FirstName": "Bench", "author_LastName": f"Author{next(counter)}"}, True),
+        "add_order": lambda: ("POST", "/orders", {
+            "order_Date": "2024-06-01",
+            "order_Value": 42.5,
+            "customer_ID": rng.randint(1, max(volumes["customers"], 1)),
+            "book_ID": rng.randint(1, max(volumes["books"], 1)),
+        }, True),
+        "bulk_add_customers": lambda: ("POST", "/customers/bulk", [
+            {"customer_Name": f"Bulk {i}", "customer_Phone": "555-0000", "customer_Email": "bulk@example.com"}
+            for i in range(100)
+        ], True),
+        "update_book": lambda: ("PUT", f"/books/{rng.randint(1, max(volumes['books'], 1))}", {
+            "book_Title": f"Retitled {rng.random()}", "ISBN": "9780000000000", "author_ID": 1, "publication_Date": "2020-01-01",
+        }, True),
+        "delete_order": lambda: ("DELETE", f"/orders/{next(delete_ids, 0)}", None, True),
+        "login": lambda: ("POST", "/login", {"username": "bench", "password": "bench-password"}, False),
+    }
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def percentile(sorted_values, pct):
+    # nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_scenario(host, port, make_request, token, requests, concurrency):
+    local = threading.local()
+
+    def one():
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(host, port, timeout=60)
+
+        method, path, body, needs_token = make_request()
+        headers = {"Content-Type": "application/json"}
+        if needs_token:
+            headers["x-access-token"] = token
+
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            conn.close()
+            status, payload = None, b""
+        return time.perf_counter() - started, status, len(payload)
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(lambda _: one(), range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _, _ in results)
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "requests_per_second": requests / elapsed if elapsed else None,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000,
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "statuses": statuses,
+        "errors": sum(count for status, count in statuses.items() if status == "None" or int(status) >= 500),
+        "mean_response_bytes": statistics.fmean(size for _, _, size in results),
+    }
+
+
+def run(volumes, routes=None, requests=200, concurrency=8, workdir=None, seed=0):
+    rng = random.Random(seed)
+    available = scenarios(volumes, rng)
+    selected = routes or list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown routes: {', '.join(unknown)}")
+
+    workdir = workdir or tempfile.mkdtemp(prefix="bookseller-bench-")
+    db_path = os.path.join(workdir, "bench.sqlite3")
+    seed_database(db_path, seed=seed, **volumes)
+
+    app = api.create_app()
+    api.pool = ConnectionPool(lambda: SQLiteConnection(db_path), max_size=concurrency + 2)
+    api.users = UserRegistry(os.path.join(workdir, "users.log"), fsync=False)
+    api.users.add("bench", api.hasher.hash("bench-password"), "manager")
+    token = api.create_token("bench", "manager", app.config["SECRET_KEY"])
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    results = {}
+    try:
+        for name in selected:
+            results[name] = run_scenario(
+                "127.0.0.1", server.server_port, available[name], token, requests, concurrency
+            )
+    finally:
+        server.shutdown()
+        api.pool.close()
+
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "volumes": volumes,
+        "requests_per_route": requests,
+        "concurrency": concurrency,
+        "routes": results,
+    }
+
+
+# cold starts of a worker: importing api, create_app() and the first
+# request, each timed in a fresh interpreter; "process" is the whole run as
+# seen from outside, interpreter start-up and shutdown included
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+app = api.create_app()
+created = time.perf_counter()
+app.test_client().get("/")
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported, "first_request": served - created}))
+"""
+
+
+def measure_startup(runs=10):
+    samples = {"process": [], "import": [], "create_app": [], "first_request": []}
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True
+        )
+        samples["process"].append(time.perf_counter() - started)
+        for phase, seconds in json.loads(result.stdout.splitlines()[-1]).items():
+            samples[phase].append(seconds)
+
+    phases = {}
+    for phase, values in samples.items():
+        values.sort()
+        phases[phase] = {
+            "mean": statistics.fmean(values) * 1000,
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "max": values[-1] * 1000,
+        }
+
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "runs": runs,
+        "startup_ms": phases,
+    }
+
+
+def print_startup_report(report):
+    print(f"{'phase':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for phase, latency in report["startup_ms"].items():
+        print(f"{phase:<22}{latency['mean']:>10.2f}{latency['p50']:>10.2f}{latency['p95']:>10.2f}{latency['max']:>10.2f}")
+
+
+def print_report(report):
+    print(f"{'route':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, result in report["routes"].items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:<22}{result['requests_per_second']:>10.1f}{latency['p50']:>10.2f}"
+            f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{result['errors']:>8}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every API route against a seeded SQLite database.")
+    parser.add_argument("--authors", type=int, default=500)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--routes", help="comma-separated subset of routes to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--startup", type=int, metavar="RUNS", help="time RUNS cold starts instead of the routes")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        report = measure_startup(args.startup)
+        print_startup_report(report)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results saved to {args.output}")
+        return
+
+    volumes = {"authors": args.authors, "books": args.books, "customers": args.customers, "orders": args.orders}
+    routes = args.routes.split(",") if args.routes else None
+    report = run(volumes, routes, args.requests, args.concurrency, seed=args.seed)
+
+    print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import json
+
+import benchmark
+
+
+def test_benchmark_smoke(tmp_path):
+    volumes = {"authors": 5, "books": 10, "customers": 5, "orders": 20}
+    routes = ["index", "list_books", "search_books", "list_orders_page", "stream_orders", "add_order", "update_book", "delete_order"]
+    report = benchmark.run(volumes, routes, requests=6, concurrency=2, workdir=str(tmp_path))
+
+    assert list(report["routes"]) == routes
+    for result in report["routes"].values():
+        assert result["errors"] == 0
+        assert result["requests"] == 6
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+    json.dumps(report)
+
+
+def test_benchmark_unknown_route(tmp_path):
+    volumes = {"authors": 1, "books": 1, "customers": 1, "orders": 1}
+    try:
+        benchmark.run(volumes, ["nope"], requests=1, concurrency=1, workdir=str(tmp_path))
+    except ValueError as e:
+        assert "nope" in str(e)
+    else:
+        assert False, "expected ValueError"
+
+
+def test_startup_smoke():
+    report = benchmark.measure_startup(runs=2)
+
+    assert report["runs"] == 2
+    assert set(report["startup_ms"]) == {"process", "import", "create_app", "first_request"}
+    for latency in report["startup_ms"].values():
+        assert 0 < latency["p50"] <= latency["max"]
@@ -0,0 +1,337 @@
+import collections
+import logging
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class CacheError(Exception):
+    pass
+
+
+# in-process LRU cache with per-entry TTL
+#
+# Entries stored with ttl=None are pinned: they never expire and are not
+# counted against max_entries (used for the small set of tag generations).
+class MemoryBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (value, expires_at)
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._pinned:
+                return self._pinned[key]
+
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            if ttl is None:
+                self._pinned[key] = value
+                return
+
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value):
+        # set-if-absent for pinned keys
+        with self._lock:
+            return self._pinned.setdefault(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._pinned.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# minimal client for any server speaking the Redis protocol (RESP)
+#
+# One socket per thread; a broken socket is dropped and reopened on the next
+# command. Network and protocol errors surface as CacheError.
+class RedisBackend:
+    def __init__(self, url="redis://localhost:6379/0", prefix="bookseller:", timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._send(conn, "AUTH", self.password)
+            if self.db:
+                self._send(conn, "SELECT", self.db)
+        return conn
+
+    def _send(self, conn, *args):
+        sock, reader = conn
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        sock.sendall(b"".join(parts))
+        return self._read(reader)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise CacheError("Connection closed by cache server")
+
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise CacheError(payload.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read(reader) for _ in range(length)]
+        raise CacheError(f"Unexpected reply from cache server: {line!r}")
+
+    def command(self, *args):
+        try:
+            return self._send(self._connection(), *args)
+        except (OSError, CacheError) as e:
+            conn = getattr(self._local, "conn", None)
+            self._local.conn = None
+            if conn is not None:
+                conn[0].close()
+            raise CacheError(str(e)) from e
+
+    def get(self, key):
+        return self.command("GET", self.prefix + key)
+
+    def get_many(self, keys):
+        return self.command("MGET", *[self.prefix + key for key in keys])
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            self.command("SET", self.prefix + key, value)
+        else:
+            self.command("SET", self.prefix + key, value, "PX", int(ttl * 1000))
+
+    def add(self, key, value):
+        self.command("SET", self.prefix + key, value, "NX")
+        return self.get(key)
+
+    def delete(self, key):
+        self.command("DEL", self.prefix + key)
+
+    def clear(self):
+        # only removes our own keys
+        cursor = b"0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            if keys:
+                self.command("DEL", *keys)
+            if cursor == b"0":
+                break
+
+
+# tag-aware cache of serialized responses
+#
+# Every entry is stored under its key plus the current generation token of
+# each of its tags. invalidate(tag) replaces the tag's token, so every entry
+# built from that tag stops matching at once while entries for other tags
+# are untouched. A reader that raced with a write stores its result under
+# the old token, where no later reader will look for it.
+class Cache:
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _generations(self, tags):
+        keys = [f"gen:{tag}" for tag in tags]
+        tokens = self.backend.get_many(keys)
+        for i, token in enumerate(tokens):
+            if token is None:
+                tokens[i] = self.backend.add(keys[i], uuid.uuid4().hex)
+        return [token.decode() if isinstance(token, bytes) else token for token in tokens]
+
+    def versioned_key(self, key, tags):
+        # key under the current generations of tags, None if the backend is
+        # unreachable
+        try:
+            return key + "@" + ".".join(self._generations(tags))
+        except CacheError as e:
+            self.errors += 1
+            logger.warning("cache lookup failed: %s", e)
+            return None
+
+    def lookup(self, key, tags):
+        # returns (value or None, versioned key to store() the fresh value under)
+        versioned_key = self.versioned_key(key, tags)
+        if versioned_key is None:
+            return None, None
+        try:
+            value = self.backend.get(versioned_key)
+        except CacheError as e:
+            self.errors += 1
+            logger.warning("cache lookup failed: %s", e)
+            return None, None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value, versioned_key
+
+    def fetch(self, versioned_key):
+        # a value stored next to a lookup() result, e.g. its compressed body;
+        # not counted as a hit or miss
+        if versioned_key is None:
+            return None
+        try:
+            return self.backend.get(versioned_key)
+        except CacheError as e:
+            self.errors += 1
+            logger.warning("cache fetch failed: %s", e)
+            return None
+
+    def store(self, versioned_key, value):
+        if versioned_key is None:
+            return
+        try:
+            self.backend.set(versioned_key, value, self.ttl)
+        except CacheError as e:
+            self.errors += 1
+            logger.warning("cache store failed: %s", e)
+
+    def delete(self, versioned_key):
+        if versioned_key is None:
+            return
+        try:
+            self.backend.delete(versioned_key)
+        except CacheError as e:
+            self.errors += 1
+            logger.error("cache delete of %r failed: %s", versioned_key, e)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            try:
+                self.backend.set(f"gen:{tag}", uuid.uuid4().hex)
+            except CacheError as e:
+                self.errors += 1
+                logger.error("cache invalidation of %r failed: %s", tag, e)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = self.misses = self.errors = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+# per-resource cache of single items for the item endpoints
+#
+# Kept in the same kind of backend as the response cache, so with the redis
+# backend every worker process sees the others' invalidations. A write
+# deletes the item's entry; invalidate(name) without ids moves the resource
+# to a new generation (see Cache), which drops all of its items at once.
+class ItemCache:
+    def __init__(self, backends, ttl=60):
+        # backends: {resource name: backend}; resources may share one
+        self._caches = {name: Cache(backend, ttl) for name, backend in backends.items()}
+
+    def _versioned_key(self, name, item_id):
+        return self._caches[name].versioned_key(f"{name}:{item_id}", (name,))
+
+    def get(self, name, item_id):
+        value, _ = self._caches[name].lookup(f"{name}:{item_id}", (name,))
+        return value
+
+    def put(self, name, item_id, value):
+        self._caches[name].store(self._versioned_key(name, item_id), value)
+
+    def invalidate(self, name, *item_ids):
+        # no ids: every item of the resource, e.g. after nulling references
+        cache = self._caches[name]
+        if not item_ids:
+            cache.invalidate(name)
+        for item_id in item_ids:
+            cache.delete(self._versioned_key(name, item_id))
+
+    def clear(self):
+        for cache in self._caches.values():
+            cache.clear()
+
+    def stats(self):
+        caches = self._caches.values()
+        backends = {id(cache.backend): cache.backend for cache in caches}.values()
+        return {
+            "hits": sum(cache.hits for cache in caches),
+            "misses": sum(cache.misses for cache in caches),
+            "errors": sum(cache.errors for cache in caches),
+            "entries": sum(len(backend) for backend in backends if isinstance(backend, MemoryBackend)),
+        }
+
+
+def create_cache(config):
+    if config["CACHE_BACKEND"] == "redis":
+        backend = RedisBackend(config["CACHE_URL"])
+    elif config["CACHE_BACKEND"] == "memory":
+        backend = MemoryBackend(config["CACHE_MAX_ENTRIES"])
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {config['CACHE_BACKEND']}")
+    return Cache(backend, ttl=config["CACHE_TTL"])
+
+
+def create_item_cache(config, resources):
+    # one LRU per resource in memory, or one keyspace shared by all of them
+    if config["CACHE_BACKEND"] == "redis":
+        backend = RedisBackend(config["CACHE_URL"], prefix="bookseller:items:")
+        backends = {name: backend for name in resources}
+    elif config["CACHE_BACKEND"] == "memory":
+        backends = {name: MemoryBackend(config["ITEM_CACHE_SIZE"]) for name in resources}
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {config['CACHE_BACKEND']}")
+    return ItemCache(backends, ttl=config["ITEM_CACHE_TTL"])
@@ -0,0 +1,140 @@
+import socketserver
+import threading
+import time
+import pytest
+from cache import Cache, CacheError, ItemCache, MemoryBackend, RedisBackend, create_item_cache
+
+# tiny stand-in for a Redis server, enough for the commands the backend uses
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def bulk(self, value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == b"GET":
+                reply = self.bulk(data.get(args[1]))
+            elif name == b"MGET":
+                reply = b"*%d\r\n" % (len(args) - 1) + b"".join(self.bulk(data.get(key)) for key in args[1:])
+            elif name == b"SET":
+                if b"NX" in args[3:] and args[1] in data:
+                    reply = b"$-1\r\n"
+                else:
+                    data[args[1]] = args[2]
+                    reply = b"+OK\r\n"
+            elif name == b"DEL":
+                reply = b":%d\r\n" % sum(data.pop(key, None) is not None for key in args[1:])
+            elif name == b"SCAN":
+                keys = list(data)
+                reply = b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(self.bulk(key) for key in keys)
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+@pytest.fixture
+def redis_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.data = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+def test_memory_backend_lru_eviction():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', b'1', ttl=60)
+    backend.set('b', b'2', ttl=60)
+    backend.get('a')
+    backend.set('c', b'3', ttl=60)
+
+    assert backend.get('a') == b'1'
+    assert backend.get('b') is None
+
+def test_memory_backend_ttl():
+    backend = MemoryBackend()
+    backend.set('a', b'1', ttl=0.01)
+    time.sleep(0.02)
+
+    assert backend.get('a') is None
+
+def test_invalidate_only_affects_tag():
+    cache = Cache(MemoryBackend())
+    _, books_key = cache.lookup('/books', ('books',))
+    _, authors_key = cache.lookup('/authors', ('authors',))
+    cache.store(books_key, b'books')
+    cache.store(authors_key, b'authors')
+
+    cache.invalidate('books')
+
+    assert cache.lookup('/books', ('books',))[0] is None
+    assert cache.lookup('/authors', ('authors',))[0] == b'authors'
+
+def test_racing_reader_does_not_resurrect_stale_entry():
+    cache = Cache(MemoryBackend())
+    _, key = cache.lookup('/books', ('books',))
+    cache.invalidate('books')
+    cache.store(key, b'stale')
+
+    assert cache.lookup('/books', ('books',))[0] is None
+
+def test_redis_backend(redis_url):
+    cache = Cache(RedisBackend(redis_url))
+    _, key = cache.lookup('/books', ('books',))
+    cache.store(key, b'payload')
+
+    assert cache.lookup('/books', ('books',))[0] == b'payload'
+    cache.invalidate('books')
+    assert cache.lookup('/books', ('books',))[0] is None
+
+def test_redis_backend_unavailable_is_a_miss():
+    cache = Cache(RedisBackend("redis://127.0.0.1:1/0", timeout=0.1))
+
+    assert cache.lookup('/books', ('books',)) == (None, None)
+    assert cache.errors == 1
+    with pytest.raises(CacheError):
+        cache.backend.get('x')
+
+def test_item_cache_per_resource():
+    cache = ItemCache({"books": MemoryBackend(2), "authors": MemoryBackend(2)})
+    cache.put("books", 1, b"one")
+    cache.put("books", 2, b"two")
+    cache.put("books", 3, b"three")
+    cache.put("authors", 1, b"author")
+
+    assert cache.get("books", 1) is None
+    assert cache.get("books", 3) == b"three"
+    cache.invalidate("books", 3)
+    assert cache.get("books", 3) is None
+    cache.invalidate("authors")
+    assert cache.get("authors", 1) is None
+    assert cache.get("books", 2) == b"two"
+    # the old generation's author entry stays until it is evicted or expires
+    assert cache.stats() == {"hits": 2, "misses": 3, "errors": 0, "entries": 2}
+
+def test_item_cache_shared_between_workers(redis_url):
+    config = {"CACHE_BACKEND": "redis", "CACHE_URL": redis_url, "ITEM_CACHE_SIZE": 10, "ITEM_CACHE_TTL": 60}
+    worker_a = create_item_cache(config, ("books", "authors"))
+    worker_b = create_item_cache(config, ("books", "authors"))
+    worker_a.put("books", 1, b"one")
+    worker_a.put("authors", 1, b"author")
+
+    assert worker_b.get("books", 1) == b"one"
+    worker_b.invalidate("books", 1)
+    worker_b.invalidate("authors")
+    assert worker_a.get("books", 1) is None
+    assert worker_a.get("authors", 1) is None
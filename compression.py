@@ -0,0 +1,113 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional, see requirements-fast.txt
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, see requirements-fast.txt
+    zstandard = None
+
+# response compression shared by the WSGI and ASGI apps
+#
+# Buffered bodies are compressed in one go when they are at least
+# COMPRESSION_MIN_SIZE bytes; streamed bodies are compressed chunk by chunk
+# and flushed after every chunk so clients still get rows as they are read.
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/vnd.bookseller.table+json", "application/msgpack",
+    "text/plain", "text/html", "text/csv",
+)
+
+
+def available_encodings(preferred):
+    # the configured encodings this interpreter can produce, in order of preference
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in preferred if installed.get(encoding)]
+
+
+def choose_encoding(accept_encodings, encodings):
+    # accept_encodings: werkzeug's parsed Accept-Encoding (request.accept_encodings)
+    if not encodings:
+        return None
+    return accept_encodings.best_match(encodings)
+
+
+def is_compressible(response, min_size=None):
+    # with min_size, only buffered bodies qualify: a streamed body has no
+    # Content-Length and is compressed as it is generated instead
+    if response.status_code != 200 or "Content-Encoding" in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return False
+    if min_size is not None and (response.content_length is None or response.content_length < min_size):
+        return False
+    return True
+
+
+def compress(encoding, data, level):
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class StreamCompressor:
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=min(level, 11))
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk):
+        # compresses and flushes, so the chunk can be decoded on arrival
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        if self.encoding == "gzip":
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress_chunks(encoding, level, chunks):
+    compressor = StreamCompressor(encoding, level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def compress_chunks_async(encoding, level, chunks):
+    compressor = StreamCompressor(encoding, level)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def mark_encoded(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # the bytes differ per encoding, so a strong ETag would be wrong; weak
+    # ETags still match If-None-Match (see not_modified_response)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
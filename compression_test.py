@@ -0,0 +1,70 @@
+import gzip
+import zlib
+import pytest
+from flask import Response
+from werkzeug.http import parse_accept_header
+from compression import (
+    StreamCompressor, available_encodings, brotli, choose_encoding, compress, compress_chunks, is_compressible,
+    mark_encoded, zstandard,
+)
+
+def accept(header):
+    return parse_accept_header(header)
+
+def test_available_encodings_skips_missing_libraries():
+    encodings = available_encodings(("zstd", "br", "gzip"))
+
+    assert encodings[-1] == "gzip"
+    assert ("zstd" in encodings) == (zstandard is not None)
+    assert ("br" in encodings) == (brotli is not None)
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding(accept("gzip, br"), ["br", "gzip"]) == "br"
+    assert choose_encoding(accept("gzip;q=1, br;q=0.5"), ["br", "gzip"]) == "gzip"
+    assert choose_encoding(accept("*"), ["gzip"]) == "gzip"
+    assert choose_encoding(accept("gzip;q=0"), ["gzip"]) is None
+    assert choose_encoding(accept("identity"), ["gzip"]) is None
+    assert choose_encoding(accept(""), ["gzip"]) is None
+    assert choose_encoding(accept("gzip"), []) is None
+
+def test_is_compressible():
+    body = b"[" + b"1," * 600 + b"1]"
+
+    assert is_compressible(Response(body, mimetype="application/json"), 1024)
+    assert not is_compressible(Response(b"[]", mimetype="application/json"), 1024)
+    assert not is_compressible(Response(body, mimetype="image/png"), 1024)
+    assert not is_compressible(Response(body, status=404, mimetype="application/json"), 1024)
+    assert not is_compressible(Response(iter([body]), mimetype="application/json"), 1024)
+
+def test_compress_gzip_round_trip():
+    body = b'{"data":[]}' * 200
+
+    assert gzip.decompress(compress("gzip", body, 6)) == body
+
+def test_stream_chunks_decode_as_they_arrive():
+    compressor = StreamCompressor("gzip", 6)
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    # each flushed chunk decodes on its own, before the stream is finished
+    assert decoder.decompress(compressor.compress(b'{"id":1}\n')) == b'{"id":1}\n'
+    assert decoder.decompress(compressor.compress('{"id":2}\n')) == b'{"id":2}\n'
+    assert decoder.decompress(compressor.finish()) == b""
+
+def test_compress_chunks_is_valid_gzip():
+    chunks = [b"[", b'{"id":1}', b',{"id":2}', b"]"]
+
+    assert gzip.decompress(b"".join(compress_chunks("gzip", 6, iter(chunks)))) == b"".join(chunks)
+
+def test_mark_encoded_weakens_etag():
+    response = Response(b"x", mimetype="application/json")
+    response.set_etag("books-1")
+
+    mark_encoded(response, "gzip")
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == 'W/"books-1"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+def test_unknown_encoding_rejected():
+    with pytest.raises(ValueError):
+        compress("deflate", b"x", 6)
@@ -0,0 +1,98 @@
+import os
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# defaults shared by the WSGI (api.py) and ASGI (asgi.py) apps
+DEFAULT_CONFIG = {
+    "MYSQL_HOST": "localhost",
+    "MYSQL_PORT": 3306,
+    "MYSQL_USER": "root",
+    "MYSQL_PASSWORD": "root",
+    "MYSQL_DB": "booksellerdb",
+    "SECRET_KEY": "ronald",
+    "BCRYPT_LOG_ROUNDS": 12,
+    "BCRYPT_WORKERS": 2,
+    "BCRYPT_MAX_QUEUE": 32,
+    "BCRYPT_TIMEOUT": 10,
+    "MAX_PAGE_SIZE": 1000,
+    "STREAM_BATCH_SIZE": 500,
+    "MYSQL_POOL_MIN_SIZE": 1,
+    "MYSQL_POOL_MAX_SIZE": 10,
+    "MYSQL_POOL_IDLE_TIMEOUT": 300,
+    "MYSQL_POOL_CHECKOUT_TIMEOUT": 5,
+    "MYSQL_POOL_PING_INTERVAL": 30,
+    "CACHE_BACKEND": "memory",
+    "CACHE_URL": "redis://localhost:6379/0",
+    "CACHE_TTL": 60,
+    "CACHE_MAX_ENTRIES": 1024,
+    "ITEM_CACHE_SIZE": 1024,
+    "ITEM_CACHE_TTL": 60,
+    "BULK_CHUNK_SIZE": 1000,
+    "BULK_MAX_ROWS": 50000,
+    "ORDER_QUEUE_LOG": None,
+    "ORDER_QUEUE_BATCH_SIZE": 500,
+    "ORDER_QUEUE_INTERVAL": 0.05,
+    "ORDER_QUEUE_RETENTION": 3600,
+    "TOKEN_CACHE_SIZE": 10000,
+    "TOKEN_REVOCATION_LOG": os.path.join(script_dir, "revoked_tokens.log"),
+    "USERS_LOG": os.path.join(script_dir, "users.log"),
+    "USERS_LEGACY_JSON": os.path.join(script_dir, "users.json"),
+    "JSON_SERIALIZER": "auto",
+    "SLOW_QUERY_THRESHOLD_MS": None,
+    "SLOW_QUERY_LOG": None,
+    "COMPRESSION_ENCODINGS": ("zstd", "br", "gzip"),
+    "COMPRESSION_MIN_SIZE": 1024,
+    "COMPRESSION_LEVEL": 6,
+    "RATE_LIMIT_PER_SECOND": None,
+    "RATE_LIMIT_BURST": 60,
+    "RATE_LIMIT_COSTS": {"/login": 10, "/register": 10, "/metrics": 0},
+    "RATE_LIMIT_FULL_TABLE_COST": 10,
+    "RATE_LIMIT_BACKEND": "memory",
+    "RATE_LIMIT_URL": None,
+    "RATE_LIMIT_MAX_KEYS": 100000,
+    "MAX_CONCURRENT_REQUESTS": None,
+    "MAX_CONCURRENT_FULL_TABLE": None,
+}
+
+# settings whose default is None but whose value is not a string
+SETTING_TYPES = {
+    "SLOW_QUERY_THRESHOLD_MS": float,
+    "RATE_LIMIT_PER_SECOND": float,
+    "MAX_CONCURRENT_REQUESTS": int,
+    "MAX_CONCURRENT_FULL_TABLE": int,
+}
+
+
+def parse_setting(key, value, default):
+    if isinstance(default, tuple):
+        # comma-separated, e.g. COMPRESSION_ENCODINGS=br,gzip
+        return tuple(item.strip() for item in value.split(",") if item.strip())
+    if isinstance(default, dict):
+        # comma-separated key=number pairs, replacing the defaults, e.g.
+        # RATE_LIMIT_COSTS=/login=20,/metrics=0
+        pairs = (item.rsplit("=", 1) for item in value.split(",") if item.strip())
+        return {name.strip(): float(number) for name, number in pairs}
+    if default is None and value == "":
+        return None
+
+    kind = SETTING_TYPES.get(key, type(default) if default is not None else str)
+    if kind is int:
+        # integer settings also take fractions, e.g. MYSQL_POOL_IDLE_TIMEOUT=0.5
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return kind(value)
+
+
+# settings from environment variables named like the keys of defaults,
+# parsed to the type of the default; unset ones are left out
+def from_environ(defaults, environ=None):
+    environ = os.environ if environ is None else environ
+    settings = {}
+    for key, default in defaults.items():
+        if key not in environ:
+            continue
+        try:
+            settings[key] = parse_setting(key, environ[key], default)
+        except ValueError as e:
+            raise ValueError(f"Invalid value for {key}: {environ[key]!r}") from e
+    return settings
@@ -0,0 +1,41 @@
+import pytest
+from config import DEFAULT_CONFIG, from_environ
+
+def test_unset_variables_keep_defaults():
+    assert from_environ(DEFAULT_CONFIG, {}) == {}
+    assert from_environ(DEFAULT_CONFIG, {'PATH': '/usr/bin'}) == {}
+
+def test_values_take_the_type_of_the_default():
+    settings = from_environ(DEFAULT_CONFIG, {
+        'MYSQL_HOST': 'db.internal',
+        'MYSQL_PORT': '3307',
+        'MYSQL_POOL_IDLE_TIMEOUT': '0.5',
+        'ORDER_QUEUE_INTERVAL': '1',
+        'COMPRESSION_ENCODINGS': 'br, gzip',
+        'SLOW_QUERY_THRESHOLD_MS': '250',
+        'ORDER_QUEUE_LOG': '/var/lib/bookseller/orders.log',
+        'SLOW_QUERY_LOG': '',
+    })
+
+    assert settings == {
+        'MYSQL_HOST': 'db.internal',
+        'MYSQL_PORT': 3307,
+        'MYSQL_POOL_IDLE_TIMEOUT': 0.5,
+        'ORDER_QUEUE_INTERVAL': 1.0,
+        'COMPRESSION_ENCODINGS': ('br', 'gzip'),
+        'SLOW_QUERY_THRESHOLD_MS': 250.0,
+        'ORDER_QUEUE_LOG': '/var/lib/bookseller/orders.log',
+        'SLOW_QUERY_LOG': None,
+    }
+
+def test_empty_list_turns_compression_off():
+    assert from_environ(DEFAULT_CONFIG, {'COMPRESSION_ENCODINGS': ''}) == {'COMPRESSION_ENCODINGS': ()}
+
+def test_invalid_value_names_the_setting():
+    with pytest.raises(ValueError, match='MYSQL_PORT'):
+        from_environ(DEFAULT_CONFIG, {'MYSQL_PORT': 'abc'})
+
+def test_route_costs():
+    settings = from_environ(DEFAULT_CONFIG, {'RATE_LIMIT_COSTS': '/login=20, /metrics=0', 'RATE_LIMIT_PER_SECOND': '5'})
+
+    assert settings == {'RATE_LIMIT_COSTS': {'/login': 20.0, '/metrics': 0.0}, 'RATE_LIMIT_PER_SECOND': 5.0}
@@ -0,0 +1,166 @@
+import collections
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# thread-safe MySQL connection pool
+#
+# The first checkout opens min_size connections (none are opened when the
+# pool is created, so building it is cheap in a worker that has not forked
+# yet); more are created on demand up to max_size and handed out LIFO so
+# the warmest ones are reused first. A connection that sat idle for longer
+# than ping_interval is pinged before it is returned (and replaced if the
+# ping fails); connections idle for longer than idle_timeout are closed,
+# never shrinking the pool below min_size. When every connection is in use,
+# get() waits up to checkout_timeout seconds and then raises PoolTimeout.
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300.0,
+                 checkout_timeout=5.0, ping_interval=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        self._idle = collections.deque()  # (connection, last_used), newest on the right
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._filled = False
+
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.ping_failures = 0
+        self.wait_seconds = 0.0
+
+    def fill(self):
+        # opens connections until the pool holds min_size of them
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._new_connection()
+            with self._cond:
+                self._idle.appendleft((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _new_connection(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        return conn
+
+    def _close(self, conn):
+        self.closed += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        # oldest idle connections sit on the left
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._close(conn)
+
+    def get(self):
+        if not self._filled:
+            self.fill()
+            self._filled = True
+
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    self._evict_idle()
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn, last_used = None, None
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"No database connection available within {self.checkout_timeout}s")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        if conn is None:
+            conn = self._new_connection()
+        elif self.ping_interval is not None and time.monotonic() - last_used >= self.ping_interval:
+            try:
+                conn.ping()
+            except Exception:
+                with self._cond:
+                    self.ping_failures += 1
+                    self._close(conn)
+                conn = self._new_connection()
+
+        with self._cond:
+            self._in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += time.monotonic() - started
+        return conn
+
+    def put(self, conn, discard=False):
+        # discard=True drops a connection that is broken or in an unknown state
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._evict_idle()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "ping_failures": self.ping_failures,
+                "wait_seconds": self.wait_seconds,
+            }
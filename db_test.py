@@ -0,0 +1,76 @@
+import threading
+import pytest
+from db import ConnectionPool, PoolTimeout
+
+class FakeConnection:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def ping(self):
+        if not self.alive:
+            raise Exception("MySQL server has gone away")
+
+    def close(self):
+        self.closed = True
+
+def test_reuses_connections():
+    pool = ConnectionPool(FakeConnection, max_size=2)
+    conn = pool.get()
+    pool.put(conn)
+
+    assert pool.get() is conn
+    assert pool.stats()['created'] == 1
+
+def test_checkout_timeout():
+    pool = ConnectionPool(FakeConnection, max_size=1, checkout_timeout=0.05)
+    pool.get()
+
+    with pytest.raises(PoolTimeout):
+        pool.get()
+    assert pool.stats()['timeouts'] == 1
+
+def test_waiter_gets_released_connection():
+    pool = ConnectionPool(FakeConnection, max_size=1, checkout_timeout=2)
+    conn = pool.get()
+    threading.Timer(0.05, pool.put, args=(conn,)).start()
+
+    assert pool.get() is conn
+
+def test_stale_connection_is_replaced():
+    pool = ConnectionPool(lambda: FakeConnection(), max_size=1, ping_interval=0)
+    conn = pool.get()
+    conn.alive = False
+    pool.put(conn)
+
+    fresh = pool.get()
+    assert fresh is not conn
+    assert conn.closed
+    assert pool.stats()['ping_failures'] == 1
+    assert pool.stats()['size'] == 1
+
+def test_idle_connections_are_evicted_down_to_min_size():
+    pool = ConnectionPool(FakeConnection, min_size=1, max_size=3, idle_timeout=0)
+    conns = [pool.get() for _ in range(3)]
+    for conn in conns:
+        pool.put(conn)
+
+    assert pool.stats()['size'] == 1
+    assert sum(conn.closed for conn in conns) == 2
+
+def test_discard_frees_slot():
+    pool = ConnectionPool(FakeConnection, max_size=1, checkout_timeout=0.05)
+    conn = pool.get()
+    pool.put(conn, discard=True)
+
+    assert pool.get() is not conn
+
+def test_first_checkout_fills_to_min_size():
+    pool = ConnectionPool(FakeConnection, min_size=3, max_size=5)
+    assert pool.stats()['size'] == 0
+
+    conn = pool.get()
+    assert pool.stats()['size'] == 3
+    pool.put(conn)
+    pool.get()
+    assert pool.stats()['created'] == 3
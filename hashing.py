@@ -0,0 +1,137 @@
+import concurrent.futures
+import threading
+import time
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    pass
+
+
+def hash_rounds(password_hash):
+    # cost factor of a "$2b$12$..." hash
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+# bcrypt on a bounded worker pool
+#
+# At most `workers` hashes run at once and at most `max_queue` more wait for
+# a worker; anything beyond that is rejected with HasherBusy straight away,
+# so a login flood is shed instead of tying up every request thread. bcrypt
+# releases the GIL while it works, so threads give real parallelism.
+class PasswordHasher:
+    def __init__(self, rounds=12, workers=2, max_queue=32, timeout=10.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+
+    def _get_executor(self):
+        # created on first use so forked workers don't inherit a dead pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy("Too many password operations in progress")
+
+        queued_at = time.monotonic()
+        with self._lock:
+            self.queued += 1
+
+        def run():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_seconds += started - queued_at
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.hash_seconds += elapsed
+                    self.max_hash_seconds = max(self.max_hash_seconds, elapsed)
+                self._slots.release()
+
+        try:
+            return self._get_executor().submit(run)
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+
+    # futures, for callers that wait on their own (e.g. asyncio.wrap_future)
+    def submit_hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._submit(lambda: bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8"))
+
+    def submit_check(self, password_hash, password):
+        return self._submit(lambda: bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8")))
+
+    def _wait(self, future):
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise HasherBusy(f"Password operation did not finish within {self.timeout}s")
+
+    def hash(self, password):
+        return self._wait(self.submit_hash(password))
+
+    def check(self, password_hash, password):
+        return self._wait(self.submit_check(password_hash, password))
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def rehash(self, password, store):
+        # hashes with the current cost in the background and hands the result
+        # to store(); skipped when the pool is busy (the next login retries)
+        try:
+            future = self.submit_hash(password)
+        except HasherBusy:
+            return None
+
+        def done(future):
+            if future.exception() is None:
+                store(future.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds": self.wait_seconds,
+                "hash_seconds": self.hash_seconds,
+                "max_hash_seconds": self.max_hash_seconds,
+            }
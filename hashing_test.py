@@ -0,0 +1,47 @@
+import threading
+import pytest
+from hashing import HasherBusy, PasswordHasher, hash_rounds
+
+def test_hash_and_check():
+    hasher = PasswordHasher(rounds=4)
+    password_hash = hasher.hash('secret')
+
+    assert hash_rounds(password_hash) == 4
+    assert hasher.check(password_hash, 'secret')
+    assert not hasher.check(password_hash, 'wrong')
+    assert hasher.stats()['completed'] == 3
+
+def test_needs_rehash():
+    hasher = PasswordHasher(rounds=4)
+    password_hash = hasher.hash('secret')
+    hasher.rounds = 5
+
+    assert hasher.needs_rehash(password_hash)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+
+def test_rejects_when_queue_full(mocker):
+    hasher = PasswordHasher(rounds=4, workers=1, max_queue=1)
+    release = threading.Event()
+    mocker.patch('hashing.bcrypt.hashpw', side_effect=lambda *args: release.wait() and b'hash')
+
+    first = hasher.submit_hash('a')
+    second = hasher.submit_hash('b')
+    with pytest.raises(HasherBusy):
+        hasher.submit_hash('c')
+
+    assert hasher.stats()['rejected'] == 1
+    assert hasher.stats()['queue_depth'] + hasher.stats()['running'] == 2
+    release.set()
+    first.result(1)
+    second.result(1)
+    assert hasher.stats()['queue_depth'] == 0
+
+def test_rehash_stores_new_hash():
+    hasher = PasswordHasher(rounds=4)
+    stored = []
+    done = threading.Event()
+
+    hasher.rehash('secret', lambda password_hash: stored.append(password_hash) or done.set())
+
+    assert done.wait(5)
+    assert hasher.check(stored[0], 'secret')
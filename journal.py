@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks, threads are still serialized
+    fcntl = None
+
+
+# append-only JSON lines log
+#
+# Every record is written as a single line, flushed and fsynced before the
+# call returns, so a record is either fully on disk or (after a crash) a torn
+# tail that readers ignore and the next writer truncates. Several worker
+# processes can share one log: writers take an exclusive flock, readers only
+# consume complete lines and remember how far they got.
+class Journal:
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.offset = 0
+        self._inode = None
+        self._lock = threading.RLock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read_new(self):
+        # returns (records, reset); reset is True when the log was replaced
+        # (compacted) since the last read and callers must rebuild their state
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    inode = os.fstat(f.fileno()).st_ino
+                    reset = self._inode is not None and inode != self._inode
+                    if reset:
+                        self.offset = 0
+                    self._inode = inode
+                    f.seek(self.offset)
+                    chunk = f.read()
+            except FileNotFoundError:
+                return [], False
+
+            end = chunk.rfind(b"\n") + 1
+            records = []
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+            self.offset += end
+            return records, reset
+
+    @contextmanager
+    def transaction(self):
+        # exclusive section: read_new() inside it sees every committed record,
+        # so check-then-append is safe across threads and processes
+        with self._lock:
+            while True:
+                f = open(self.path, "ab")
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    current = os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    current = None
+                if current == os.fstat(f.fileno()).st_ino:
+                    break
+                # the log was compacted while we waited for the lock
+                f.close()
+
+            try:
+                yield f
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                f.close()
+
+    def append(self, f, record):
+        # must be called inside transaction() after read_new()
+        self.append_many(f, [record])
+
+    def append_many(self, f, records):
+        # one write and one fsync for all of records
+        size = f.seek(0, os.SEEK_END)
+        if size > self.offset:
+            # torn tail left behind by a crashed writer
+            f.truncate(self.offset)
+
+        data = b"".join((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8") for record in records)
+        f.write(data)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.offset += len(data)
+
+    def rewrite(self, records):
+        # compaction, must be called inside transaction(); the old file is
+        # replaced atomically so concurrent readers see one log or the other
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as tmp:
+            for record in records:
+                tmp.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self.offset = st.st_size
+        self._inode = st.st_ino
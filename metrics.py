@@ -0,0 +1,241 @@
+import bisect
+import contextlib
+import functools
+import logging
+import re
+import threading
+import time
+
+slow_query_logger = logging.getLogger("bookseller.slow_query")
+
+# seconds; roughly 1ms to 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def statement_label(query):
+    # "SELECT Books", "UPDATE Table_Versions", ... keeps the label set small
+    # however many distinct query strings there are
+    words = query.split(None, 1)
+    verb = words[0].upper() if words else "UNKNOWN"
+    match = TABLE_PATTERN.search(query)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def is_select(query):
+    return query.lstrip()[:6].upper() == "SELECT"
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}")
+        return lines
+
+
+# cumulative-bucket histogram in the Prometheus exposition format
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            return sum(series[:-1]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    labels = format_labels(self.labels + ("le",), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {format_value(series[-1])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# request, query and phase timings for one app, rendered for /metrics
+#
+# Component stats (pool, caches, hasher) are pulled from their stats()
+# methods at scrape time, so nothing on the request path has to report them.
+# Queries slower than slow_query_threshold seconds are also written to the
+# "bookseller.slow_query" logger (statement text only, never the parameters).
+class Metrics:
+    def __init__(self, prefix="bookseller", slow_query_threshold=None):
+        self.prefix = prefix
+        self.slow_query_threshold = slow_query_threshold
+
+        self.request_seconds = Histogram(
+            f"{prefix}_request_duration_seconds", "Time spent handling requests.", ("route", "method", "status"))
+        self.query_seconds = Histogram(
+            f"{prefix}_db_query_duration_seconds", "Time spent in cursor.execute.", ("statement",))
+        self.query_rows = Counter(
+            f"{prefix}_db_query_rows_total", "Rows fetched by SELECTs or affected by writes.", ("statement",))
+        self.slow_queries = Counter(
+            f"{prefix}_db_slow_queries_total", "Queries slower than the slow query threshold.", ("statement",))
+        self.phase_seconds = Histogram(
+            f"{prefix}_phase_duration_seconds", "Time spent in parts of a request (auth, bcrypt, encode).",
+            ("phase",))
+        self._collectors = []
+
+    def register(self, component, stats):
+        # stats: callable returning a dict of numbers, e.g. pool.stats
+        self._collectors.append((component, stats))
+
+    def observe_request(self, route, method, status, seconds):
+        self.request_seconds.observe(seconds, route, method, str(status))
+
+    def observe_query(self, query, seconds, rows=None):
+        label = statement_label(query)
+        self.query_seconds.observe(seconds, label)
+        if rows:
+            self.query_rows.inc(rows, label)
+
+        if self.slow_query_threshold is not None and seconds >= self.slow_query_threshold:
+            self.slow_queries.inc(1, label)
+            slow_query_logger.warning("%.1fms rows=%s %s", seconds * 1000, rows, " ".join(query.split()))
+
+    def count_rows(self, query, rows):
+        if rows:
+            self.query_rows.inc(rows, statement_label(query))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds.observe(time.perf_counter() - started, name)
+
+    def connection(self, conn):
+        return InstrumentedConnection(conn, self)
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.query_seconds, self.query_rows, self.slow_queries, self.phase_seconds):
+            lines.extend(metric.render())
+
+        for component, stats in self._collectors:
+            for key, value in stats().items():
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.prefix}_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+# DB-API connection/cursor wrappers that time every execute and count the
+# rows it touched: affected rows for writes, fetched rows for SELECTs (which
+# also covers server-side cursors, whose rowcount is not known up front)
+class InstrumentedConnection:
+    def __init__(self, conn, metrics):
+        self.raw = conn
+        self._metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.raw.cursor(*args, **kwargs), self._metrics)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        self.raw = cursor
+        self._metrics = metrics
+        self._query = None
+
+    def _timed(self, method, query, args):
+        started = time.perf_counter()
+        try:
+            return method(query, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._query = query
+            rows = None
+            if not is_select(query):
+                rowcount = getattr(self.raw, "rowcount", None)
+                rows = rowcount if isinstance(rowcount, int) and rowcount > 0 else None
+            self._metrics.observe_query(query, elapsed, rows)
+
+    def execute(self, query, *args):
+        return self._timed(self.raw.execute, query, args)
+
+    def executemany(self, query, *args):
+        return self._timed(self.raw.executemany, query, args)
+
+    def _fetched(self, rows):
+        if rows and self._query is not None and is_select(self._query):
+            self._metrics.count_rows(self._query, len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self.raw.fetchone()
+        self._fetched([row] if row is not None else None)
+        return row
+
+    def fetchmany(self, *args):
+        return self._fetched(self.raw.fetchmany(*args))
+
+    def fetchall(self):
+        return self._fetched(self.raw.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
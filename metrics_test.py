@@ -0,0 +1,89 @@
+import logging
+from metrics import Histogram, Metrics, statement_label
+
+class FakeCursor:
+    def __init__(self, rows=(), rowcount=-1):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = False
+
+    def cursor(self, *args):
+        return self._cursor
+
+    def commit(self):
+        self.committed = True
+
+def test_statement_label():
+    assert statement_label("SELECT * FROM Books WHERE book_ID > %s") == "SELECT Books"
+    assert statement_label("INSERT INTO Orders (book_ID) VALUES (%s)") == "INSERT Orders"
+    assert statement_label("UPDATE Table_Versions SET version = version + 1") == "UPDATE Table_Versions"
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/books")
+    histogram.observe(0.5, "/books")
+    histogram.observe(5, "/books")
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/books",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/books",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/books",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/books"} 3' in lines
+
+def test_instrumented_cursor_counts_rows():
+    metrics = Metrics()
+    raw = FakeCursor(rows=[(1,), (2,), (3,)])
+    conn = metrics.connection(FakeConnection(raw))
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM Books", ())
+    assert cursor.fetchmany(2) == [(1,), (2,)]
+    cursor.fetchmany(2)
+    conn.commit()
+
+    assert raw.executed == [("SELECT * FROM Books", ())]
+    assert conn.raw.committed
+    assert metrics.query_seconds.count("SELECT Books") == 1
+    assert metrics.query_rows.value("SELECT Books") == 3
+
+def test_instrumented_cursor_counts_affected_rows():
+    metrics = Metrics()
+    conn = metrics.connection(FakeConnection(FakeCursor(rowcount=2)))
+
+    conn.cursor().execute("DELETE FROM Orders WHERE book_ID = %s", (1,))
+
+    assert metrics.query_rows.value("DELETE Orders") == 2
+
+def test_slow_query_log(caplog):
+    metrics = Metrics(slow_query_threshold=0.5)
+    metrics.observe_query("SELECT * FROM Orders", 0.01)
+    with caplog.at_level(logging.WARNING, logger="bookseller.slow_query"):
+        metrics.observe_query("SELECT *\n  FROM Orders", 0.75)
+
+    assert metrics.slow_queries.value("SELECT Orders") == 1
+    assert "750.0ms" in caplog.text and "SELECT * FROM Orders" in caplog.text
+
+def test_render_includes_component_stats():
+    metrics = Metrics()
+    metrics.register("pool", lambda: {"in_use": 2, "wait_seconds": 0.25})
+    metrics.observe_request("/books", "GET", 200, 0.01)
+
+    text = metrics.render()
+    assert "bookseller_pool_in_use 2" in text
+    assert "bookseller_pool_wait_seconds 0.25" in text
+    assert 'bookseller_request_duration_seconds_count{route="/books",method="GET",status="200"} 1' in text
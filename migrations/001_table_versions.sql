@@ -0,0 +1,10 @@
+-- Per-table change counters used for ETag / Last-Modified on the list endpoints.
+-- The API bumps a table's row in the same transaction as every write to it.
+CREATE TABLE IF NOT EXISTS Table_Versions (
+    table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+);
+
+INSERT IGNORE INTO Table_Versions (table_name)
+VALUES ('Authors'), ('Books'), ('Customers'), ('Orders');
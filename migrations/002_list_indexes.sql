@@ -0,0 +1,18 @@
+-- Indexes for the filters and sort orders accepted by the list endpoints
+-- (see "filters" / "sortable" in resources.py). InnoDB secondary indexes
+-- carry the primary key, so ORDER BY column, id pages are read in index order.
+CREATE INDEX idx_authors_last_name ON Authors (author_LastName);
+
+CREATE INDEX idx_books_author ON Books (author_ID);
+CREATE INDEX idx_books_isbn ON Books (ISBN);
+CREATE INDEX idx_books_title ON Books (book_Title);
+CREATE INDEX idx_books_publication_date ON Books (publication_Date);
+
+CREATE INDEX idx_customers_email ON Customers (customer_Email);
+CREATE INDEX idx_customers_phone ON Customers (customer_Phone);
+CREATE INDEX idx_customers_name ON Customers (customer_Name);
+
+CREATE INDEX idx_orders_customer_date ON Orders (customer_ID, order_Date);
+CREATE INDEX idx_orders_book ON Orders (book_ID);
+CREATE INDEX idx_orders_date ON Orders (order_Date);
+CREATE INDEX idx_orders_value ON Orders (order_Value);
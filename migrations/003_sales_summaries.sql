@@ -0,0 +1,34 @@
+-- Sales summaries behind the /reports endpoints. The API keeps them up to
+-- date in the same transaction as every order write (see sales.py); the
+-- INSERT ... SELECT statements backfill them from the existing orders, so
+-- apply this while no orders are being written.
+CREATE TABLE Sales_By_Book (
+    book_ID INT NOT NULL PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_sales_by_book_revenue ON Sales_By_Book (revenue);
+CREATE INDEX idx_sales_by_book_orders ON Sales_By_Book (order_count);
+
+CREATE TABLE Sales_By_Customer (
+    customer_ID INT NOT NULL PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_sales_by_customer_revenue ON Sales_By_Customer (revenue);
+CREATE INDEX idx_sales_by_customer_orders ON Sales_By_Customer (order_count);
+
+CREATE TABLE Sales_By_Day (
+    order_Date DATE NOT NULL PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+);
+
+INSERT INTO Sales_By_Book (book_ID, order_count, revenue)
+SELECT book_ID, COUNT(*), COALESCE(SUM(order_Value), 0) FROM Orders WHERE book_ID IS NOT NULL GROUP BY book_ID;
+
+INSERT INTO Sales_By_Customer (customer_ID, order_count, revenue)
+SELECT customer_ID, COUNT(*), COALESCE(SUM(order_Value), 0) FROM Orders WHERE customer_ID IS NOT NULL GROUP BY customer_ID;
+
+INSERT INTO Sales_By_Day (order_Date, order_count, revenue)
+SELECT order_Date, COUNT(*), COALESCE(SUM(order_Value), 0) FROM Orders WHERE order_Date IS NOT NULL GROUP BY order_Date;
@@ -0,0 +1,7 @@
+-- Row versions for optimistic concurrency. The API bumps row_Version on
+-- every write to a row, sends it as the item's ETag and checks If-Match
+-- against it in the WHERE clause of updates and deletes.
+ALTER TABLE Authors ADD COLUMN row_Version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE Books ADD COLUMN row_Version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE Customers ADD COLUMN row_Version INT UNSIGNED NOT NULL DEFAULT 1;
+ALTER TABLE Orders ADD COLUMN row_Version INT UNSIGNED NOT NULL DEFAULT 1;
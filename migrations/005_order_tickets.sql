@@ -0,0 +1,9 @@
+-- Tickets of orders accepted through the write-behind queue (ORDER_QUEUE_LOG,
+-- see order_queue.py). Each ticket is inserted in the same transaction as its
+-- order, so a batch replayed after a crash is not inserted twice. Rows older
+-- than ORDER_QUEUE_RETENTION are no longer needed and can be deleted.
+CREATE TABLE Order_Tickets (
+    ticket CHAR(32) NOT NULL PRIMARY KEY,
+    order_ID INT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
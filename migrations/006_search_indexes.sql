@@ -0,0 +1,9 @@
+-- FULLTEXT indexes for the ?q= searches of the list endpoints (the "match"
+-- filters in resources.py). A LIKE '%...%' search cannot use the B-tree
+-- indexes of 002_list_indexes.sql; MATCH ... AGAINST uses these instead.
+-- Stopwords are kept in the index so that any title word can be searched.
+SET SESSION innodb_ft_enable_stopword = OFF;
+
+CREATE FULLTEXT INDEX ft_authors_name ON Authors (author_FirstName, author_LastName);
+CREATE FULLTEXT INDEX ft_books_title ON Books (book_Title);
+CREATE FULLTEXT INDEX ft_customers_name ON Customers (customer_Name);
@@ -0,0 +1,231 @@
+import contextlib
+import itertools
+import logging
+import threading
+import time
+import uuid
+
+from journal import Journal
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one flusher per process is enforced
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# idempotency table, see migrations/005_order_tickets.sql
+TICKET_INSERT = "INSERT INTO Order_Tickets (ticket, order_ID) VALUES (%s, %s)"
+
+
+# raised by write_batch when the database cannot take the batch right now;
+# like the retryable exceptions, it leaves the batch pending
+class RetryLater(Exception):
+    pass
+
+
+def ticket_lookup_query(count):
+    placeholders = ", ".join(["%s"] * count)
+    return f"SELECT ticket, order_ID FROM Order_Tickets WHERE ticket IN ({placeholders})"
+
+
+# write-behind queue for new orders
+#
+# enqueue() appends the order to a journal and fsyncs it before returning a
+# ticket, so an accepted order survives a crash of the process. A flusher
+# thread hands pending orders to write_batch in journal (arrival) order, up
+# to batch_size at a time in one database transaction, and records the
+# outcome per ticket in the journal:
+#
+# - write_batch stores each ticket in Order_Tickets in the same transaction
+#   as the order, so a batch replayed after a crash between the commit and
+#   the journal record is not inserted twice (exactly once).
+# - order_IDs follow arrival order. An order the database rejects is marked
+#   failed on its own (the batch is retried one order per transaction) and
+#   does not hold up the ones behind it.
+# - retryable errors (database unreachable, RetryLater) leave the batch
+#   pending; it is retried with backoff.
+#
+# Several worker processes can share one journal; a lock file makes sure only
+# one of them flushes at a time. Results are kept for retention seconds. The
+# journal is first read on first use, not when the queue is created.
+class OrderQueue:
+    def __init__(self, path, write_batch, batch_size=500, interval=0.05, retention=3600, retryable=(), fsync=True):
+        self.journal = Journal(path, fsync=fsync)
+        self.lock_path = path + ".lock"
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retention = retention
+        self.retryable = (RetryLater, *retryable)
+
+        self._pending = {}  # ticket -> order, in arrival order
+        self._results = {}  # ticket -> outcome record
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.created = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _apply(self, records, reset):
+        if reset:
+            self._pending.clear()
+            self._results.clear()
+
+        for record in records:
+            ticket = record["ticket"]
+            if record["op"] == "enqueue":
+                if ticket not in self._results:
+                    self._pending[ticket] = record["order"]
+            else:
+                self._pending.pop(ticket, None)
+                self._results[ticket] = record
+
+    def _refresh(self):
+        self._apply(*self.journal.read_new())
+
+    def enqueue(self, order):
+        # order: JSON-serializable dict; returns its ticket once it is on disk
+        ticket = uuid.uuid4().hex
+        with self._lock:
+            with self.journal.transaction() as f:
+                self._apply(*self.journal.read_new())
+                self.journal.append(f, {"op": "enqueue", "ticket": ticket, "order": order, "at": time.time()})
+            self._pending[ticket] = order
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+        return ticket
+
+    def status(self, ticket):
+        # {"ticket", "status": "queued" | "created" | "failed", ...}, or None
+        with self._lock:
+            self._refresh()
+            if ticket in self._pending:
+                return {"ticket": ticket, "status": "queued"}
+            record = self._results.get(ticket)
+            if record is None:
+                return None
+            status = {"ticket": ticket, "status": record["op"]}
+            for key in ("order_ID", "error"):
+                if key in record:
+                    status[key] = record[key]
+            return status
+
+    @contextlib.contextmanager
+    def _flushing(self):
+        # yields False if another thread or process is already flushing
+        if not self._flush_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        yield False
+                        return
+                yield True
+        finally:
+            self._flush_lock.release()
+
+    def flush(self):
+        # writes everything pending; returns the number of orders handled
+        handled = 0
+        with self._flushing() as flushing:
+            if not flushing:
+                return 0
+            while True:
+                with self._lock:
+                    self._refresh()
+                    batch = list(itertools.islice(self._pending.items(), self.batch_size))
+                if not batch:
+                    return handled
+                self._record(self._write(batch))
+                handled += len(batch)
+
+    def _write(self, batch):
+        # outcome records for batch; retryable errors propagate
+        try:
+            ids = self.write_batch(batch)
+        except self.retryable:
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                logger.warning("queued order %s failed: %s", batch[0][0], e)
+                return [{"op": "failed", "ticket": batch[0][0], "error": str(e), "at": time.time()}]
+            # find the order(s) at fault, one transaction each
+            return [record for item in batch for record in self._write([item])]
+
+        now = time.time()
+        return [{"op": "created", "ticket": ticket, "order_ID": ids[ticket], "at": now} for ticket, _ in batch]
+
+    def _record(self, records):
+        with self._lock:
+            with self.journal.transaction() as f:
+                self._apply(*self.journal.read_new())
+                self.journal.append_many(f, records)
+                self._apply(records, False)
+                self._compact()
+
+        for record in records:
+            if record["op"] == "created":
+                self.created += 1
+            else:
+                self.failed += 1
+
+    def _compact(self):
+        # inside journal.transaction(): drops results older than retention
+        # once there are at least batch_size of them
+        cutoff = time.time() - self.retention
+        expired = [ticket for ticket, record in self._results.items() if record["at"] < cutoff]
+        if len(expired) < self.batch_size:
+            return
+        for ticket in expired:
+            del self._results[ticket]
+        records = [{"op": "enqueue", "ticket": ticket, "order": order, "at": 0} for ticket, order in self._pending.items()]
+        self.journal.rewrite(records + list(self._results.values()))
+
+    # background flusher
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="order-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        delay = self.interval
+        while not self._stopped.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                self.flush()
+                delay = self.interval
+            except Exception as e:
+                self.retries += 1
+                delay = min(max(delay * 2, 0.1), 5.0)
+                logger.warning("flushing queued orders failed, retrying in %.1fs: %s", delay, e)
+
+        # on shutdown; whatever is left stays in the journal for the next start
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning("flushing queued orders on shutdown failed: %s", e)
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            pending = len(self._pending)
+        return {"pending": pending, "created": self.created, "failed": self.failed, "retries": self.retries}
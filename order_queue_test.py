@@ -0,0 +1,148 @@
+import threading
+import pytest
+from order_queue import OrderQueue, RetryLater
+
+class Unavailable(Exception):
+    pass
+
+class FakeOrders:
+    # stands in for the Orders and Order_Tickets tables
+    def __init__(self):
+        self.rows = {}
+        self.tickets = {}
+        self.batches = []
+        self.reject = set()
+        self.down = False
+
+    def write_batch(self, batch):
+        if self.down:
+            raise Unavailable("database unreachable")
+        if any(order["book_ID"] in self.reject for _, order in batch):
+            raise ValueError("foreign key constraint fails")
+        self.batches.append(len(batch))
+        for ticket, order in batch:
+            if ticket not in self.tickets:
+                order_id = len(self.rows) + 1
+                self.rows[order_id] = order
+                self.tickets[ticket] = order_id
+        return {ticket: self.tickets[ticket] for ticket, _ in batch}
+
+def make_queue(tmp_path, orders, **kwargs):
+    kwargs.setdefault("batch_size", 3)
+    return OrderQueue(str(tmp_path / "orders.log"), orders.write_batch, retryable=(Unavailable,), fsync=False, **kwargs)
+
+def order(book_id):
+    return {"order_Date": "2024-01-01", "order_Value": 9.5, "customer_ID": 1, "book_ID": book_id}
+
+def test_flush_writes_in_arrival_order_and_batches(tmp_path):
+    orders = FakeOrders()
+    queue = make_queue(tmp_path, orders)
+    tickets = [queue.enqueue(order(book_id)) for book_id in range(7)]
+
+    assert queue.status(tickets[0]) == {"ticket": tickets[0], "status": "queued"}
+    assert queue.flush() == 7
+
+    assert orders.batches == [3, 3, 1]
+    assert [orders.rows[queue.status(ticket)["order_ID"]]["book_ID"] for ticket in tickets] == list(range(7))
+    assert queue.stats() == {"pending": 0, "created": 7, "failed": 0, "retries": 0}
+    assert queue.status("unknown") is None
+
+def test_rejected_order_fails_alone(tmp_path):
+    orders = FakeOrders()
+    orders.reject.add(2)
+    queue = make_queue(tmp_path, orders)
+    tickets = [queue.enqueue(order(book_id)) for book_id in range(1, 4)]
+    queue.flush()
+
+    assert [queue.status(ticket)["status"] for ticket in tickets] == ["created", "failed", "created"]
+    assert "foreign key" in queue.status(tickets[1])["error"]
+    assert len(orders.rows) == 2
+
+def test_retryable_error_keeps_orders_pending(tmp_path):
+    orders = FakeOrders()
+    orders.down = True
+    queue = make_queue(tmp_path, orders)
+    ticket = queue.enqueue(order(1))
+
+    with pytest.raises(Unavailable):
+        queue.flush()
+    assert queue.status(ticket)["status"] == "queued"
+
+    orders.down = False
+    assert queue.flush() == 1
+    assert queue.status(ticket)["status"] == "created"
+
+def test_retry_later_keeps_orders_pending(tmp_path):
+    def write_batch(batch):
+        raise RetryLater("server has gone away")
+
+    queue = OrderQueue(str(tmp_path / "orders.log"), write_batch, fsync=False)
+    ticket = queue.enqueue(order(1))
+
+    with pytest.raises(RetryLater):
+        queue.flush()
+    assert queue.status(ticket)["status"] == "queued"
+
+def test_pending_orders_survive_restart(tmp_path):
+    orders = FakeOrders()
+    ticket = make_queue(tmp_path, orders).enqueue(order(1))
+
+    queue = make_queue(tmp_path, orders)
+    assert queue.stats()["pending"] == 1 and queue.status(ticket)["status"] == "queued"
+    queue.flush()
+    assert make_queue(tmp_path, orders).status(ticket)["order_ID"] == 1
+
+def test_replayed_batch_is_written_once(tmp_path):
+    orders = FakeOrders()
+    queue = make_queue(tmp_path, orders)
+    tickets = [queue.enqueue(order(book_id)) for book_id in range(2)]
+
+    # crash after the commit, before the outcome reaches the journal
+    orders.write_batch([(ticket, order(book_id)) for book_id, ticket in enumerate(tickets)])
+
+    restarted = make_queue(tmp_path, orders)
+    restarted.flush()
+
+    assert len(orders.rows) == 2
+    assert [restarted.status(ticket)["order_ID"] for ticket in tickets] == [1, 2]
+
+def test_workers_share_the_journal(tmp_path):
+    orders = FakeOrders()
+    worker_a = make_queue(tmp_path, orders)
+    worker_b = make_queue(tmp_path, orders)
+    ticket = worker_a.enqueue(order(1))
+
+    assert worker_b.flush() == 1
+    assert worker_a.status(ticket)["status"] == "created"
+    assert worker_a.flush() == 0
+
+def test_expired_results_are_compacted(tmp_path):
+    orders = FakeOrders()
+    queue = make_queue(tmp_path, orders, batch_size=2, retention=-1)
+    tickets = [queue.enqueue(order(book_id)) for book_id in range(2)]
+    queue.flush()
+    pending = queue.enqueue(order(3))
+    queue.enqueue(order(4))
+    queue.flush()
+
+    assert queue.status(tickets[0]) is None
+    assert (tmp_path / "orders.log").read_text() == ""
+    assert make_queue(tmp_path, orders).status(pending) is None
+
+def test_background_flusher(tmp_path):
+    orders = FakeOrders()
+    done = threading.Event()
+    write_batch = orders.write_batch
+
+    def write_and_signal(batch):
+        ids = write_batch(batch)
+        done.set()
+        return ids
+
+    queue = OrderQueue(str(tmp_path / "orders.log"), write_and_signal, interval=0.01, fsync=False)
+    queue.start()
+    ticket = queue.enqueue(order(1))
+    assert done.wait(5)
+    queue.stop(5)
+
+    assert queue.status(ticket)["status"] == "created"
@@ -0,0 +1,157 @@
+import collections
+import logging
+import threading
+import time
+
+from cache import CacheError, RedisBackend
+
+logger = logging.getLogger(__name__)
+
+
+# token buckets held in this process
+#
+# take() refills the key's bucket at `rate` tokens per second up to `burst`
+# and takes `cost` tokens from it if it holds that many. At most max_keys
+# buckets are kept; the least recently used ones are dropped, which only
+# ever lets a client through early (a missing bucket is a full one).
+class MemoryBuckets:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, burst):
+        # returns 0 if the tokens were taken, else seconds until they are there
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# same buckets, shared by every worker through a server speaking the Redis
+# protocol; refill and take run as one script, on the server's clock
+TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    def __init__(self, url="redis://localhost:6379/0", prefix="bookseller:ratelimit:"):
+        self.backend = RedisBackend(url, prefix=prefix)
+
+    def take(self, key, cost, rate, burst):
+        reply = self.backend.command("EVAL", TAKE_SCRIPT, 1, self.backend.prefix + key, rate, burst, cost)
+        return float(reply)
+
+
+# per-client request budgets
+#
+# Every client (a token's user or an IP address) gets a bucket of `burst`
+# tokens refilled at `rate` per second, and each request takes its cost in
+# tokens. acquire() returns 0 when the request may proceed, otherwise the
+# seconds until it would; requests that cost more than burst cost burst. If
+# the shared backend is unreachable requests are let through (fail open).
+class RateLimiter:
+    def __init__(self, buckets, rate, burst):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("rate and burst must be positive")
+        self.buckets = buckets
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+
+        self.admitted = 0
+        self.limited = 0
+        self.errors = 0
+
+    def acquire(self, key, cost=1):
+        try:
+            wait = self.buckets.take(key, min(cost, self.burst), self.rate, self.burst)
+        except CacheError as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning("rate limit check failed, letting the request through: %s", e)
+            return 0.0
+
+        with self._lock:
+            if wait:
+                self.limited += 1
+            else:
+                self.admitted += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "admitted": self.admitted,
+                "limited": self.limited,
+                "errors": self.errors,
+            }
+
+
+# at most `limit` requests of one kind in flight in this process; the rest
+# are turned away instead of queueing for a worker or a connection
+class ConcurrencyLimiter:
+    def __init__(self, limit):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "active": self.active, "rejected": self.rejected}
+
+
+def create_rate_limiter(config):
+    # None when RATE_LIMIT_PER_SECOND is unset
+    if config["RATE_LIMIT_PER_SECOND"] is None:
+        return None
+    if config["RATE_LIMIT_BACKEND"] == "redis":
+        buckets = RedisBuckets(config["RATE_LIMIT_URL"] or config["CACHE_URL"])
+    elif config["RATE_LIMIT_BACKEND"] == "memory":
+        buckets = MemoryBuckets(config["RATE_LIMIT_MAX_KEYS"])
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {config['RATE_LIMIT_BACKEND']}")
+    return RateLimiter(buckets, config["RATE_LIMIT_PER_SECOND"], config["RATE_LIMIT_BURST"])
@@ -0,0 +1,60 @@
+import time
+import pytest
+from ratelimit import ConcurrencyLimiter, MemoryBuckets, RateLimiter, RedisBuckets
+
+def test_burst_then_limited():
+    limiter = RateLimiter(MemoryBuckets(), rate=0.5, burst=2)
+
+    assert limiter.acquire('user:alice') == 0
+    assert limiter.acquire('user:alice') == 0
+    assert 1.9 < limiter.acquire('user:alice') <= 2
+    # other clients have their own bucket
+    assert limiter.acquire('ip:10.0.0.1') == 0
+    assert limiter.stats()['limited'] == 1
+
+def test_bucket_refills():
+    limiter = RateLimiter(MemoryBuckets(), rate=100, burst=1)
+
+    assert limiter.acquire('a') == 0
+    assert limiter.acquire('a') > 0
+    time.sleep(0.02)
+    assert limiter.acquire('a') == 0
+
+def test_cost():
+    limiter = RateLimiter(MemoryBuckets(), rate=1, burst=10)
+
+    assert limiter.acquire('a', cost=8) == 0
+    assert limiter.acquire('a', cost=5) > 2.9
+    # a request dearer than the whole bucket costs the whole bucket
+    assert limiter.acquire('b', cost=50) == 0
+    assert limiter.acquire('b') > 0
+
+def test_buckets_are_bounded():
+    buckets = MemoryBuckets(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        buckets.take(key, 1, 1, 1)
+
+    assert list(buckets._buckets) == ['b', 'c']
+
+def test_unreachable_backend_lets_requests_through():
+    buckets = RedisBuckets("redis://127.0.0.1:1/0")
+    buckets.backend.timeout = 0.1
+    limiter = RateLimiter(buckets, rate=1, burst=1)
+
+    assert limiter.acquire('a') == 0
+    assert limiter.stats()['errors'] == 1
+
+def test_concurrency_limiter():
+    slots = ConcurrencyLimiter(2)
+
+    assert slots.try_acquire() and slots.try_acquire()
+    assert not slots.try_acquire()
+    slots.release()
+    assert slots.try_acquire()
+    assert slots.stats() == {'limit': 2, 'active': 2, 'rejected': 1}
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        RateLimiter(MemoryBuckets(), rate=0, burst=1)
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(0)
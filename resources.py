@@ -0,0 +1,612 @@
+import base64
+import binascii
+import datetime
+import decimal
+import functools
+import json
+import math
+import re
+from operator import itemgetter
+
+
+# filter value converters; raise ValueError on bad input
+def parse_date(value):
+    # validated "YYYY-MM-DD" (or a full timestamp), passed on as a string
+    datetime.datetime.fromisoformat(value)
+    return value
+
+
+# FULLTEXT boolean-mode query for ?q=: every word must start a word of the
+# text. Characters that are operators in boolean mode separate words
+FULLTEXT_OPERATORS = re.compile(r'[-+<>()~*"@]+')
+
+
+def parse_search(value):
+    words = FULLTEXT_OPERATORS.sub(" ", value).split()
+    if not words:
+        raise ValueError(value)
+    return " ".join(f"+{word}*" for word in words)
+
+
+def parse_number(value):
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+# per-row change counter, see migrations/004_row_versions.sql
+ROW_VERSION = "row_Version"
+
+
+# table metadata shared by the request handlers
+#
+# "columns" is the physical column order of the table, "fields" are the
+# columns exposed in list responses (and selectable with ?fields=),
+# "writable" the columns a client may set and "required" the ones an insert
+# must provide.
+# "references" lists (table, column) pairs pointing at this table; they are
+# set to NULL before a row is deleted.
+# "filters" maps list query parameters to (column, operator, converter);
+# "prefix" compiles to LIKE, "match" to MATCH ... AGAINST on the FULLTEXT
+# indexes of migrations/006, anything else is a comparison.
+# "sortable" are the columns ?sort= accepts. migrations/002 indexes them.
+# "expansions" maps ?expand= names to (resource, foreign key column); the
+# related row's fields are embedded under that name.
+RESOURCES = {
+    "authors": {
+        "table": "Authors",
+        "id": "author_ID",
+        "columns": ("author_ID", "author_FirstName", "author_LastName"),
+        "fields": ("author_FirstName", "author_LastName"),
+        "writable": ("author_FirstName", "author_LastName"),
+        "required": ("author_FirstName", "author_LastName"),
+        "missing_message": "Missing required fields: author_FirstName and author_LastName are mandatory",
+        "update_message": "At least one of 'author_FirstName' or 'author_LastName' must be provided",
+        "references": (("Books", "author_ID"),),
+        "label": "Author",
+        "expansions": {},
+        "filters": {
+            "author_LastName": ("author_LastName", "=", str),
+            "q": (("author_FirstName", "author_LastName"), "match", parse_search),
+        },
+        "sortable": ("author_ID", "author_LastName"),
+    },
+    "books": {
+        "table": "Books",
+        "id": "book_ID",
+        "columns": ("book_ID", "book_Title", "author_ID", "ISBN", "publication_Date"),
+        "fields": ("book_Title", "ISBN", "publication_Date"),
+        "writable": ("book_Title", "author_ID", "ISBN", "publication_Date"),
+        "required": ("book_Title", "ISBN"),
+        "missing_message": "Missing required fields: book_Title and ISBN are mandatory",
+        "update_message": "At least one of 'book_Title', 'ISBN', 'author_ID', or 'publication_Date' must be provided",
+        "references": (("Orders", "book_ID"),),
+        "label": "Book",
+        "expansions": {"author": ("authors", "author_ID")},
+        "filters": {
+            "author_ID": ("author_ID", "=", int),
+            "ISBN": ("ISBN", "=", str),
+            "ISBN_prefix": ("ISBN", "prefix", str),
+            "publication_Date_from": ("publication_Date", ">=", parse_date),
+            "publication_Date_to": ("publication_Date", "<=", parse_date),
+            "q": ("book_Title", "match", parse_search),
+        },
+        "sortable": ("book_ID", "book_Title", "publication_Date"),
+    },
+    "customers": {
+        "table": "Customers",
+        "id": "customer_ID",
+        "columns": ("customer_ID", "customer_Name", "customer_Phone", "customer_Email"),
+        "fields": ("customer_ID", "customer_Name", "customer_Phone", "customer_Email"),
+        "writable": ("customer_Name", "customer_Phone", "customer_Email"),
+        "required": ("customer_Name", "customer_Phone"),
+        "missing_message": "Missing required fields: customer_Name and customer_Phone are mandatory",
+        "update_message": "At least one of 'customer_Name', 'customer_Phone', or 'customer_Email' must be provided",
+        "references": (("Orders", "customer_ID"),),
+        "label": "Customer",
+        "expansions": {},
+        "filters": {
+            "customer_Email": ("customer_Email", "=", str),
+            "customer_Phone": ("customer_Phone", "=", str),
+            "q": ("customer_Name", "match", parse_search),
+        },
+        "sortable": ("customer_ID", "customer_Name"),
+    },
+    "orders": {
+        "table": "Orders",
+        "id": "order_ID",
+        "columns": ("order_ID", "order_Date", "order_Value", "customer_ID", "book_ID"),
+        "fields": ("order_ID", "order_Date", "order_Value", "customer_ID", "book_ID"),
+        "writable": ("order_Date", "order_Value", "customer_ID", "book_ID"),
+        "required": ("order_Date", "order_Value", "customer_ID", "book_ID"),
+        "missing_message": "Missing required fields: order_Date, order_Value, customer_ID, and book_ID are mandatory",
+        "update_message": "At least one of 'order_Date', 'order_Value', 'customer_ID', or 'book_ID' must be provided",
+        "references": (),
+        "label": "Order",
+        "expansions": {"customer": ("customers", "customer_ID"), "book": ("books", "book_ID")},
+        "filters": {
+            "customer_ID": ("customer_ID", "=", int),
+            "book_ID": ("book_ID", "=", int),
+            "order_Date_from": ("order_Date", ">=", parse_date),
+            "order_Date_to": ("order_Date", "<=", parse_date),
+            "order_Value_min": ("order_Value", ">=", parse_number),
+            "order_Value_max": ("order_Value", "<=", parse_number),
+        },
+        "sortable": ("order_ID", "order_Date", "order_Value"),
+    },
+}
+
+TABLE_RESOURCES = {resource["table"]: name for name, resource in RESOURCES.items()}
+
+for _name, _resource in RESOURCES.items():
+    _resource["name"] = _name
+
+
+# column projection: list queries name the columns they need instead of
+# SELECT *. The id always comes back first and the sort column (if any)
+# second, since next_cursor() reads them from the last row; then the
+# requested fields, then for each expansion the joined table's id and
+# fields. The layout maps every output field to its position in the row.
+@functools.lru_cache(maxsize=1024)
+def _projection(name, fields, sort_column, expand):
+    resource = RESOURCES[name]
+    fields = fields or resource["fields"]
+    qualify = (lambda table, column: f"{table}.{column}") if expand else (lambda table, column: column)
+
+    names = [resource["id"]]
+    if sort_column and sort_column != resource["id"]:
+        names.append(sort_column)
+    names += [field for field in fields if field not in names]
+    columns = [qualify(resource["table"], column) for column in names]
+    field_index = tuple((field, names.index(field)) for field in fields)
+
+    embeds = []
+    for embed in expand or ():
+        joined = RESOURCES[resource["expansions"][embed][0]]
+        embed_names = [joined["id"]] + [field for field in joined["fields"] if field != joined["id"]]
+        start = len(columns)
+        columns += [qualify(joined["table"], column) for column in embed_names]
+        embeds.append((embed, start, tuple((field, start + embed_names.index(field)) for field in joined["fields"])))
+
+    return tuple(columns), (field_index, tuple(embeds))
+
+
+def projection(resource, page):
+    # returns (columns to select, layout for row_to_dict)
+    return _projection(resource["name"], page["fields"], page["sort"][0] if page["sort"] else None, page["expand"])
+
+
+def row_to_dict(layout, row):
+    field_index, embeds = layout
+    item = {field: row[index] for field, index in field_index}
+    for name, id_index, embed_index in embeds:
+        # LEFT JOIN: no related row (e.g. its author was deleted) -> null
+        item[name] = None if row[id_index] is None else {field: row[index] for field, index in embed_index}
+    return item
+
+
+# flat view of a layout for the tabular formats (see tabular.py): embedded
+# fields become "customer.customer_Name" columns
+def layout_columns(layout):
+    field_index, embeds = layout
+    names = [field for field, _ in field_index]
+    for name, _, embed_index in embeds:
+        names += [f"{name}.{field}" for field, _ in embed_index]
+    return names
+
+
+def values_getter(layout):
+    # row -> tuple of the layout's values, in layout_columns() order
+    field_index, embeds = layout
+    indexes = [index for _, index in field_index]
+    for _, _, embed_index in embeds:
+        indexes += [index for _, index in embed_index]
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indexes)
+
+
+def parse_expand(resource, value):
+    # "?expand=customer,book" -> (("customer", "book"), error message)
+    if value is None:
+        return None, None
+
+    expand = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in expand if name not in resource["expansions"]]
+    if not expand or unknown:
+        available = ", ".join(resource["expansions"]) or "none"
+        return None, f"'expand' must name related resources of {resource['name']} (available: {available})"
+    return expand, None
+
+
+def item_query(resource):
+    # primary key lookup for the item endpoints: (query, layout), with the
+    # row version selected after the list response's columns
+    columns, layout = _projection(resource["name"], None, None, None)
+    return f"SELECT {', '.join(columns + (ROW_VERSION,))} FROM {resource['table']} WHERE {resource['id']} = %s", layout
+
+
+def page_tables(resource, page):
+    # tables a list response is built from, for validators and cache tags
+    return (resource["table"],) + tuple(
+        RESOURCES[resource["expansions"][embed][0]]["table"] for embed in page["expand"] or ()
+    )
+
+
+def parse_fields(resource, value):
+    # "?fields=a,b" -> (("a", "b"), error message); None selects the defaults
+    if value is None:
+        return None, None
+
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    if not fields:
+        return None, "'fields' must name at least one field"
+
+    unknown = [field for field in fields if field not in resource["fields"]]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(resource['fields'])}"
+    return fields, None
+
+
+def parse_filters(resource, args):
+    # returns ([(column(s), operator, value), ...], error message)
+    filters = []
+    for param, (column, operator, convert) in resource["filters"].items():
+        value = args.get(param)
+        if value is None:
+            continue
+        try:
+            filters.append((column, operator, convert(value)))
+        except ValueError:
+            return None, f"Invalid value for '{param}': {value!r}"
+    return filters, None
+
+
+def parse_ids(value, max_count):
+    # "?ids=1,2,3" -> ((1, 2, 3), error message)
+    if value is None:
+        return None, None
+    try:
+        ids = tuple(dict.fromkeys(int(item_id) for item_id in value.split(",") if item_id.strip()))
+    except ValueError:
+        return None, "'ids' must be a comma-separated list of integers"
+    if not 1 <= len(ids) <= max_count:
+        return None, f"'ids' must list between 1 and {max_count} ids"
+    return ids, None
+
+
+def parse_sort(resource, value):
+    # "?sort=order_Date" or "?sort=-order_Date" -> ((column, descending), error message)
+    if value is None:
+        return None, None
+
+    column = value[1:] if value.startswith("-") else value
+    if column not in resource["sortable"]:
+        return None, f"'sort' must be one of: {', '.join(resource['sortable'])} (prefix with '-' for descending)"
+    return (column, value.startswith("-")), None
+
+
+# opaque cursor for sorted pages: the last row's (sort value, id)
+def encode_cursor(value, item_id):
+    data = json.dumps([value, item_id], default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        value, item_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("invalid cursor")
+    if not isinstance(item_id, int) or isinstance(value, (list, dict)):
+        raise ValueError("invalid cursor")
+    return value, item_id
+
+
+# ?stream= values: JSON objects one per line or in one array, or the table
+# and csv formats of tabular.py
+STREAM_FORMATS = ("ndjson", "json", "table", "csv")
+
+
+# query string parsing for the list endpoints; args is any mapping with .get()
+def parse_page_args(args, max_page_size, resource):
+    # returns (page, error message)
+    limit = args.get("limit")
+    after_id = args.get("after_id")
+    after = args.get("after")
+    stream = args.get("stream")
+
+    fields, error_msg = parse_fields(resource, args.get("fields"))
+    if error_msg:
+        return None, error_msg
+
+    filters, error_msg = parse_filters(resource, args)
+    if error_msg:
+        return None, error_msg
+
+    # batch lookup: one IN condition on the primary key
+    ids, error_msg = parse_ids(args.get("ids"), max_page_size)
+    if error_msg:
+        return None, error_msg
+    if ids:
+        filters.append((resource["id"], "in", ids))
+
+    sort, error_msg = parse_sort(resource, args.get("sort"))
+    if error_msg:
+        return None, error_msg
+
+    expand, error_msg = parse_expand(resource, args.get("expand"))
+    if error_msg:
+        return None, error_msg
+
+    try:
+        limit = int(limit) if limit is not None else None
+        after_id = int(after_id) if after_id is not None else None
+    except ValueError:
+        return None, "'limit' and 'after_id' must be integers"
+
+    if limit is not None and not 1 <= limit <= max_page_size:
+        return None, f"'limit' must be between 1 and {max_page_size}"
+
+    if stream is not None and stream not in STREAM_FORMATS:
+        return None, f"'stream' must be one of: {', '.join(STREAM_FORMATS)}"
+
+    if sort and after_id is not None:
+        return None, "Use 'after' (the previous page's next_cursor) instead of 'after_id' with 'sort'"
+    if after is not None:
+        if not sort:
+            return None, "'after' is only valid together with 'sort'"
+        try:
+            after = decode_cursor(after)
+        except ValueError:
+            return None, "'after' is not a valid cursor"
+
+    # everything but the cursor, for building the next page's link
+    query_args = {
+        param: args.get(param) for param in ("fields", "sort", "expand", "ids", "format", *resource["filters"])
+        if args.get(param) is not None
+    }
+
+    return {
+        "limit": limit, "after_id": after_id, "after": after, "stream": stream, "fields": fields,
+        "filters": filters, "sort": sort, "sort_position": 0 if not sort or sort[0] == resource["id"] else 1, "expand": expand,
+        "query_args": query_args,
+    }, None
+
+
+def is_paginated(page):
+    return page["limit"] is not None or page["after_id"] is not None or page["after"] is not None
+
+
+def next_cursor(page, rows):
+    # for a full page: the last row's id, or an opaque cursor when sorted;
+    # None on the last page
+    if not rows or page["limit"] is None or len(rows) < page["limit"]:
+        return None
+    last = rows[-1]
+    if page["sort"]:
+        # the sort column is selected right after the id (see _projection)
+        return encode_cursor(last[page["sort_position"]], last[0])
+    return last[0]
+
+
+def next_page_args(page, cursor):
+    # query args for the "next" link; keeps the projection, filters and sort
+    args = dict(page["query_args"], limit=page["limit"])
+    args["after" if page["sort"] else "after_id"] = cursor
+    return args
+
+
+def escape_like(value):
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def column_name(resource, page, column):
+    # joined queries qualify every column with its table
+    return f"{resource['table']}.{column}" if page["expand"] else column
+
+
+def where_clause(resource, page):
+    # filters and the keyset condition as " WHERE ..." plus its parameters
+    conditions = []
+    params = []
+
+    for column, operator, value in page["filters"]:
+        if operator == "prefix":
+            conditions.append(f"{column_name(resource, page, column)} LIKE %s ESCAPE '!'")
+            params.append(escape_like(value) + "%")
+        elif operator == "match":
+            # column may be a tuple: the columns of one FULLTEXT index
+            columns = [column_name(resource, page, c) for c in (column if isinstance(column, tuple) else (column,))]
+            conditions.append(f"MATCH ({', '.join(columns)}) AGAINST (%s IN BOOLEAN MODE)")
+            params.append(value)
+        elif operator == "in":
+            conditions.append(f"{column_name(resource, page, column)} IN ({', '.join(['%s'] * len(value))})")
+            params.extend(value)
+        else:
+            conditions.append(f"{column_name(resource, page, column)} {operator} %s")
+            params.append(value)
+
+    id_column = column_name(resource, page, resource["id"])
+    if page["after_id"] is not None:
+        conditions.append(f"{id_column} > %s")
+        params.append(page["after_id"])
+
+    if page["after"] is not None:
+        # rows after (value, id) in ORDER BY column, id; NULLs sort first
+        # ascending and last descending, as in MySQL
+        column, descending = page["sort"]
+        column = column_name(resource, page, column)
+        value, item_id = page["after"]
+        op = "<" if descending else ">"
+        if value is None and not descending:
+            conditions.append(f"(({column} IS NULL AND {id_column} > %s) OR {column} IS NOT NULL)")
+            params.append(item_id)
+        elif value is None:
+            conditions.append(f"({column} IS NULL AND {id_column} < %s)")
+            params.append(item_id)
+        else:
+            null_rows = f" OR {column} IS NULL" if descending else ""
+            conditions.append(f"({column} {op} %s OR ({column} = %s AND {id_column} {op} %s){null_rows})")
+            params.extend([value, value, item_id])
+
+    if not conditions:
+        return "", []
+    return " WHERE " + " AND ".join(conditions), params
+
+
+# keyset pagination: WHERE id > after_id ORDER BY id LIMIT n, or with sort,
+# WHERE (column, id) after the cursor ORDER BY column, id LIMIT n.
+# Expansions are LEFT JOINs on the foreign key, so the related rows come
+# back in the same query and rows without one are kept.
+def select_query(resource, page):
+    columns, _ = projection(resource, page)
+    where, params = where_clause(resource, page)
+    id_column = column_name(resource, page, resource["id"])
+
+    query = f"SELECT {', '.join(columns)} FROM {resource['table']}"
+    for embed in page["expand"] or ():
+        joined_name, foreign_key = resource["expansions"][embed]
+        joined = RESOURCES[joined_name]
+        query += f" LEFT JOIN {joined['table']} ON {joined['table']}.{joined['id']} = {resource['table']}.{foreign_key}"
+    query += where
+
+    if page["sort"]:
+        column, descending = page["sort"]
+        direction = " DESC" if descending else ""
+        query += f" ORDER BY {column_name(resource, page, column)}{direction}"
+        if column != resource["id"]:
+            query += f", {id_column}{direction}"
+    elif is_paginated(page):
+        query += f" ORDER BY {id_column}"
+
+    if page["limit"] is not None:
+        query += " LIMIT %s"
+        params.append(page["limit"])
+
+    return query, tuple(params)
+
+
+def validate_insert(resource, data):
+    # returns an error message, or None if the row can be inserted
+    if not isinstance(data, dict) or any(not data.get(field) for field in resource["required"]):
+        return resource["missing_message"]
+    return None
+
+
+# queued orders (ORDER_QUEUE_LOG) are accepted before MySQL sees them, so
+# values it would reject are caught here instead
+def validate_order_values(data):
+    # returns an error message, or None; call after validate_insert()
+    try:
+        parse_date(data["order_Date"])
+        if isinstance(data["order_Value"], bool) or not decimal.Decimal(str(data["order_Value"])).is_finite():
+            raise ValueError(data["order_Value"])
+        for field in ("customer_ID", "book_ID"):
+            if isinstance(data[field], bool):
+                raise ValueError(data[field])
+            int(str(data[field]))
+    except (TypeError, ValueError, decimal.InvalidOperation):
+        return "order_Date must be a date (YYYY-MM-DD), order_Value a number and customer_ID and book_ID integers"
+    return None
+
+
+def insert_query(resource):
+    columns = resource["writable"]
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"INSERT INTO {resource['table']} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+def insert_values(resource, data):
+    return tuple(data.get(field) for field in resource["writable"])
+
+
+# partial updates: only the supplied fields are written, and of those only
+# the ones whose value differs from the row as it is
+def validate_update(resource, data):
+    if not isinstance(data, dict) or not any(field in data for field in resource["writable"]):
+        return resource["update_message"]
+    empty = [field for field in resource["required"] if field in data and data[field] in (None, "")]
+    if empty:
+        return f"{' and '.join(empty)} cannot be empty"
+    return None
+
+
+def update_fields(resource, data):
+    # {field: value} for the writable fields present in data, in column order
+    return {field: data[field] for field in resource["writable"] if field in data}
+
+
+def row_snapshot_query(resource, columns, lock=True):
+    # the current values of columns followed by the row version; locked until
+    # commit unless the write is checked against an If-Match version instead
+    query = f"SELECT {', '.join(tuple(columns) + (ROW_VERSION,))} FROM {resource['table']} WHERE {resource['id']} = %s"
+    return query + " FOR UPDATE" if lock else query
+
+
+def same_value(current, value):
+    # current as read from the database, value as sent by the client
+    if current is None or value is None:
+        return current is None and value is None
+    if isinstance(current, (int, float, decimal.Decimal)) and not isinstance(current, bool):
+        try:
+            return decimal.Decimal(str(current)) == decimal.Decimal(str(value))
+        except decimal.InvalidOperation:
+            return False
+    return str(current) == str(value)
+
+
+def changed_fields(current, fields):
+    # the subset of fields that would change the row; current maps field -> value
+    return {field: value for field, value in fields.items() if not same_value(current[field], value)}
+
+
+def update_query(resource, fields):
+    # only applies to the row version read with the snapshot, and bumps it
+    assignments = ", ".join([f"{field} = %s" for field in fields] + [f"{ROW_VERSION} = {ROW_VERSION} + 1"])
+    return f"UPDATE {resource['table']} SET {assignments} WHERE {resource['id']} = %s AND {ROW_VERSION} = %s"
+
+
+def update_values(fields, item_id, version):
+    return tuple(fields.values()) + (item_id, version)
+
+
+# item ETags carry the row version (migrations/004_row_versions.sql)
+def item_etag(resource, item_id, version):
+    return f"{resource['table'].lower()}-{item_id}-v{version}"
+
+
+def etag_version(resource, item_id, etag):
+    # the row version in an item_etag() of this item, or None
+    prefix = f"{resource['table'].lower()}-{item_id}-v"
+    version = etag[len(prefix):] if etag.startswith(prefix) else ""
+    return int(version) if version.isdigit() else None
+
+
+def id_condition(column, count):
+    return f"{column} = %s" if count == 1 else f"{column} IN ({', '.join(['%s'] * count)})"
+
+
+def delete_queries(resource, count=1, versioned=False):
+    # statements (in order) that remove count rows by id, run in one
+    # transaction: references to the rows are set to NULL first. versioned:
+    # the DELETE also takes the expected row version (If-Match)
+    queries = [
+        f"UPDATE {table} SET {column} = NULL, {ROW_VERSION} = {ROW_VERSION} + 1 WHERE {id_condition(column, count)}"
+        for table, column in resource["references"]
+    ]
+    condition = id_condition(resource["id"], count) + (f" AND {ROW_VERSION} = %s" if versioned else "")
+    queries.append(f"DELETE FROM {resource['table']} WHERE {condition}")
+    return queries
+
+
+def lock_ids_query(resource, count):
+    # the ids among count that exist, locked until commit
+    return f"SELECT {resource['id']} FROM {resource['table']} WHERE {id_condition(resource['id'], count)} FOR UPDATE"
+
+
+def bump_versions_query(tables):
+    # see migrations/001_table_versions.sql
+    placeholders = ", ".join(["%s"] * len(tables))
+    return f"UPDATE Table_Versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP(6) WHERE table_name IN ({placeholders})"
@@ -0,0 +1,134 @@
+import datetime
+import decimal
+import sqlite3
+import pytest
+from resources import (
+    RESOURCES, changed_fields, decode_cursor, encode_cursor, next_cursor, page_tables, parse_page_args, parse_search,
+    projection, row_to_dict, select_query, update_fields, update_query,
+)
+
+ORDERS = RESOURCES["orders"]
+BOOKS = RESOURCES["books"]
+
+@pytest.fixture
+def orders_db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE Orders (order_ID INTEGER PRIMARY KEY, order_Date TEXT, order_Value REAL, customer_ID INTEGER, book_ID INTEGER)"
+    )
+    values = [10.0, None, 25.5, 10.0, None, 3.0, 25.5, 99.0, 10.0]
+    conn.executemany(
+        "INSERT INTO Orders VALUES (?, ?, ?, ?, ?)",
+        [(i + 1, f"2024-01-{i + 1:02d}", value, i % 3 + 1, 1) for i, value in enumerate(values)],
+    )
+    yield conn
+    conn.close()
+
+def run(conn, resource, args):
+    page, error_msg = parse_page_args(args, 1000, resource)
+    assert error_msg is None
+    query, params = select_query(resource, page)
+    return page, conn.execute(query.replace("%s", "?"), params).fetchall()
+
+def walk(conn, args):
+    # follows next_cursor until the last page, returning the order ids seen
+    seen = []
+    args = dict(args)
+    while True:
+        page, rows = run(conn, ORDERS, args)
+        seen.extend(row[0] for row in rows)
+        cursor = next_cursor(page, rows)
+        if cursor is None:
+            return seen
+        args["after"] = cursor
+
+@pytest.mark.parametrize("sort", ["order_Value", "-order_Value", "order_Date", "-order_ID"])
+def test_sorted_pages_cover_every_row_once(orders_db, sort):
+    _, everything = run(orders_db, ORDERS, {"sort": sort})
+    assert walk(orders_db, {"sort": sort, "limit": "2"}) == [row[0] for row in everything]
+    assert sorted(row[0] for row in everything) == list(range(1, 10))
+
+def test_filters_compile_to_parameters(orders_db):
+    args = {"customer_ID": "1", "order_Value_min": "5", "order_Date_to": "2024-01-08"}
+    page, rows = run(orders_db, ORDERS, args)
+
+    query, params = select_query(ORDERS, page)
+    assert "customer_ID = %s" in query and "order_Value >= %s" in query and "order_Date <= %s" in query
+    assert params == (1, "2024-01-08", 5.0)
+    assert [row[0] for row in rows] == [1, 4, 7]
+
+def test_like_filters_escape_wildcards():
+    page, _ = parse_page_args({"ISBN_prefix": "97_8%", "q": "50%"}, 1000, BOOKS)
+    query, params = select_query(BOOKS, page)
+
+    assert "ISBN LIKE %s ESCAPE '!'" in query
+    assert "MATCH (book_Title) AGAINST (%s IN BOOLEAN MODE)" in query
+    assert params == ("97!_8!%%", "+50%*")
+
+def test_search_terms():
+    assert parse_search('dune -messiah (1965)') == "+dune* +messiah* +1965*"
+    with pytest.raises(ValueError):
+        parse_search(' +* ')
+
+@pytest.mark.parametrize("args, message", [
+    ({"customer_ID": "abc"}, "Invalid value for 'customer_ID'"),
+    ({"order_Date_from": "yesterday"}, "Invalid value for 'order_Date_from'"),
+    ({"order_Value_max": "nan"}, "Invalid value for 'order_Value_max'"),
+    ({"sort": "customer_Email"}, "'sort' must be one of"),
+    ({"sort": "order_Value", "after_id": "3"}, "instead of 'after_id'"),
+    ({"after": encode_cursor(1, 2)}, "only valid together with 'sort'"),
+    ({"sort": "order_Value", "after": "garbage"}, "not a valid cursor"),
+])
+def test_invalid_list_args(args, message):
+    page, error_msg = parse_page_args(args, 1000, ORDERS)
+    assert page is None
+    assert message in error_msg
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("2024-01-01", 7)) == ("2024-01-01", 7)
+    assert decode_cursor(encode_cursor(None, 3)) == (None, 3)
+
+def test_expand_joins_related_rows(orders_db):
+    orders_db.execute("CREATE TABLE Customers (customer_ID INTEGER PRIMARY KEY, customer_Name TEXT, customer_Phone TEXT, customer_Email TEXT)")
+    orders_db.execute("CREATE TABLE Books (book_ID INTEGER PRIMARY KEY, book_Title TEXT, author_ID INTEGER, ISBN TEXT, publication_Date TEXT)")
+    orders_db.executemany("INSERT INTO Customers VALUES (?, ?, ?, ?)", [(1, "Ann", "555", None), (2, "Bob", "556", None)])
+    orders_db.execute("INSERT INTO Books VALUES (1, 'Dune', 3, '978', '1965-08-01')")
+
+    page, error_msg = parse_page_args({"expand": "customer,book", "limit": "3", "sort": "-order_Value"}, 1000, ORDERS)
+    assert error_msg is None
+    query, params = select_query(ORDERS, page)
+    rows = orders_db.execute(query.replace("%s", "?"), params).fetchall()
+    items = [row_to_dict(projection(ORDERS, page)[1], row) for row in rows]
+
+    assert "LEFT JOIN Customers ON Customers.customer_ID = Orders.customer_ID" in query
+    assert "ORDER BY Orders.order_Value DESC, Orders.order_ID DESC" in query
+    assert items[0]["order_ID"] == 8 and items[0]["customer_ID"] == 2
+    assert items[0]["customer"] == {"customer_ID": 2, "customer_Name": "Bob", "customer_Phone": "556", "customer_Email": None}
+    assert items[0]["book"] == {"book_Title": "Dune", "ISBN": "978", "publication_Date": "1965-08-01"}
+    # customer 3 does not exist
+    assert [item["customer"] for item in items if item["customer_ID"] == 3] == [None]
+    assert page_tables(ORDERS, page) == ("Orders", "Customers", "Books")
+
+def test_expand_unknown():
+    page, error_msg = parse_page_args({"expand": "author"}, 1000, ORDERS)
+    assert page is None
+    assert "available: customer, book" in error_msg
+
+def test_changed_fields_compares_database_values():
+    current = {"order_Date": datetime.date(2024, 1, 1), "order_Value": decimal.Decimal("10.00"), "customer_ID": 1, "book_ID": None}
+    fields = update_fields(ORDERS, {"order_Date": "2024-01-01", "order_Value": 10, "customer_ID": "1", "book_ID": 4, "x": 1})
+
+    assert list(fields) == ["order_Date", "order_Value", "customer_ID", "book_ID"]
+    assert changed_fields(current, fields) == {"book_ID": 4}
+    assert changed_fields(current, {"order_Value": "10.5", "book_ID": None}) == {"order_Value": "10.5"}
+    assert update_query(ORDERS, {"book_ID": 4}) == (
+        "UPDATE Orders SET book_ID = %s, row_Version = row_Version + 1 WHERE order_ID = %s AND row_Version = %s"
+    )
+
+def test_ids_batch_lookup(orders_db):
+    page, rows = run(orders_db, ORDERS, {"ids": "8,2,99", "sort": "-order_Value", "limit": "1"})
+
+    assert [row[0] for row in rows] == [8]
+    assert page["query_args"]["ids"] == "8,2,99"
+    assert parse_page_args({"ids": ""}, 1000, ORDERS)[0] is None
+    assert parse_page_args({"ids": ",".join(map(str, range(20)))}, 10, ORDERS)[0] is None
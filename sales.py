@@ -0,0 +1,142 @@
+import decimal
+
+from resources import id_condition
+
+# sales summaries kept next to Orders (see migrations/003_sales_summaries.sql)
+#
+# Every order write adds or subtracts its count and value in the same
+# transaction, so the report queries read a handful of summary rows instead
+# of scanning Orders. Orders without a book, customer or date are left out
+# of that summary.
+SUMMARIES = (
+    ("Sales_By_Book", "book_ID"),
+    ("Sales_By_Customer", "customer_ID"),
+    ("Sales_By_Day", "order_Date"),
+)
+
+# same order as RESOURCES["orders"]["writable"]
+ORDER_COLUMNS = ("order_Date", "order_Value", "customer_ID", "book_ID")
+
+PERIODS = ("day", "month", "year")
+REPORT_ORDERINGS = {"revenue": "revenue", "orders": "order_count"}
+
+
+def orders_snapshot_query(count):
+    # the orders as they are before a bulk delete, order_ID first; locked
+    # until commit so a concurrent write can't change them in between
+    return f"SELECT order_ID, {', '.join(ORDER_COLUMNS)} FROM Orders WHERE {id_condition('order_ID', count)} FOR UPDATE"
+
+
+def order_from_row(row):
+    return dict(zip(ORDER_COLUMNS, row)) if row else None
+
+
+def order_from_values(values):
+    # values as passed to insert_query
+    return dict(zip(ORDER_COLUMNS, values))
+
+
+def to_decimal(value):
+    if value in (None, ""):
+        return decimal.Decimal(0)
+    try:
+        return decimal.Decimal(str(value))
+    except decimal.InvalidOperation:
+        return decimal.Decimal(0)
+
+
+def summary_deltas(old_orders=(), new_orders=()):
+    # {(table, column, key): [order count change, revenue change]}
+    deltas = {}
+    for sign, orders in ((-1, old_orders), (1, new_orders)):
+        for order in orders:
+            value = to_decimal(order["order_Value"])
+            for table, column in SUMMARIES:
+                key = order[column]
+                if key in (None, ""):
+                    continue
+                delta = deltas.setdefault((table, column, key), [0, decimal.Decimal(0)])
+                delta[0] += sign
+                delta[1] += sign * value
+    return deltas
+
+
+def upsert_query(table, column):
+    return (
+        f"INSERT INTO {table} ({column}, order_count, revenue) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE order_count = order_count + VALUES(order_count), revenue = revenue + VALUES(revenue)"
+    )
+
+
+def summary_statements(old_orders=(), new_orders=()):
+    # [(query, [params, ...])] for executemany, one statement per summary table
+    statements = {}
+    for (table, column, key), (count, revenue) in summary_deltas(old_orders, new_orders).items():
+        if count or revenue:
+            statements.setdefault(table, (upsert_query(table, column), []))[1].append((key, count, revenue))
+    return list(statements.values())
+
+
+def forget_statements(resource, *item_ids):
+    # deleted books or customers: their orders lose the reference, so their
+    # summary rows go too
+    return [
+        (f"DELETE FROM {table} WHERE {id_condition(column, len(item_ids))}", item_ids)
+        for table, column in SUMMARIES
+        if column == resource["id"]
+    ]
+
+
+# report queries: top-N reads walk the (revenue) / (order_count) indexes
+def top_books_query(by="revenue"):
+    order = REPORT_ORDERINGS[by]
+    return (
+        "SELECT s.book_ID, b.book_Title, s.order_count, s.revenue FROM Sales_By_Book s "
+        "LEFT JOIN Books b ON b.book_ID = s.book_ID "
+        f"WHERE s.order_count > 0 ORDER BY s.{order} DESC, s.book_ID DESC LIMIT %s"
+    )
+
+
+def top_customers_query(by="revenue"):
+    order = REPORT_ORDERINGS[by]
+    return (
+        "SELECT s.customer_ID, c.customer_Name, s.order_count, s.revenue FROM Sales_By_Customer s "
+        "LEFT JOIN Customers c ON c.customer_ID = s.customer_ID "
+        f"WHERE s.order_count > 0 ORDER BY s.{order} DESC, s.customer_ID DESC LIMIT %s"
+    )
+
+
+def customer_value_query():
+    return (
+        "SELECT s.customer_ID, c.customer_Name, s.order_count, s.revenue FROM Sales_By_Customer s "
+        "LEFT JOIN Customers c ON c.customer_ID = s.customer_ID WHERE s.customer_ID = %s"
+    )
+
+
+def daily_revenue_query(date_from=None, date_to=None):
+    query = "SELECT order_Date, order_count, revenue FROM Sales_By_Day WHERE order_count > 0"
+    params = []
+    if date_from is not None:
+        query += " AND order_Date >= %s"
+        params.append(date_from)
+    if date_to is not None:
+        query += " AND order_Date <= %s"
+        params.append(date_to)
+    return query + " ORDER BY order_Date", tuple(params)
+
+
+def revenue_by_period(rows, period):
+    # rolls (day, count, revenue) rows up into months or years
+    length = {"day": 10, "month": 7, "year": 4}[period]
+    buckets = {}
+    for day, count, revenue in rows:
+        key = str(day)[:length]
+        bucket = buckets.setdefault(key, [0, decimal.Decimal(0)])
+        bucket[0] += count
+        bucket[1] += to_decimal(revenue)
+    return [{"period": key, "order_count": count, "revenue": revenue} for key, (count, revenue) in buckets.items()]
+
+
+def summary_row_to_dict(id_field, name_field, row):
+    item_id, name, count, revenue = row
+    return {id_field: item_id, name_field: name, "order_count": count, "revenue": revenue}
@@ -0,0 +1,156 @@
+import datetime
+import decimal
+import jwt
+import pytest
+import api
+import benchmark
+from db import ConnectionPool
+from order_queue import OrderQueue, RetryLater
+from sales import revenue_by_period, summary_deltas, summary_statements
+
+app = api.create_app()
+
+def token(role='manager'):
+    payload = {'user_id': 'tester', 'role': role, 'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)}
+    return {'x-access-token': jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')}
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "sales.sqlite3")
+    benchmark.seed_database(path, authors=3, books=5, customers=4, orders=40, seed=1)
+    monkeypatch.setattr(api, "pool", ConnectionPool(lambda: benchmark.SQLiteConnection(path)))
+    api.catalog_cache.clear()
+    yield path
+    api.pool.close()
+
+def summaries_match_orders(path):
+    conn = benchmark.SQLiteConnection(path)
+    cursor = conn.cursor()
+    for table, column in (("Sales_By_Book", "book_ID"), ("Sales_By_Customer", "customer_ID"), ("Sales_By_Day", "order_Date")):
+        cursor.execute(f"SELECT {column}, order_count, ROUND(revenue, 2) FROM {table} WHERE order_count > 0 ORDER BY {column}")
+        summary = cursor.fetchall()
+        cursor.execute(
+            f"SELECT {column}, COUNT(*), ROUND(SUM(order_Value), 2) FROM Orders WHERE {column} IS NOT NULL"
+            f" GROUP BY {column} ORDER BY {column}"
+        )
+        assert summary == cursor.fetchall(), table
+    conn.close()
+
+def test_summary_deltas_move_an_order():
+    old = {'order_Date': '2024-01-01', 'order_Value': '10.00', 'customer_ID': 1, 'book_ID': 2}
+    new = dict(old, order_Value=12.5, book_ID=3)
+    deltas = summary_deltas([old], [new])
+
+    assert deltas[('Sales_By_Book', 'book_ID', 2)] == [-1, decimal.Decimal('-10.00')]
+    assert deltas[('Sales_By_Book', 'book_ID', 3)] == [1, decimal.Decimal('12.5')]
+    assert deltas[('Sales_By_Customer', 'customer_ID', 1)] == [0, decimal.Decimal('2.50')]
+    statements = dict(summary_statements([old], [new]))
+    assert len(statements) == 3
+
+def test_unchanged_order_writes_nothing():
+    order = {'order_Date': '2024-01-01', 'order_Value': 5, 'customer_ID': 1, 'book_ID': None}
+    assert summary_statements([order], [order]) == []
+
+def test_revenue_by_period():
+    rows = [(datetime.date(2024, 1, 2), 1, decimal.Decimal('5')), (datetime.date(2024, 1, 9), 2, decimal.Decimal('7.5'))]
+    assert revenue_by_period(rows, 'month') == [{'period': '2024-01', 'order_count': 3, 'revenue': decimal.Decimal('12.5')}]
+
+def test_summaries_follow_order_writes(sqlite_db):
+    client = app.test_client()
+    summaries_match_orders(sqlite_db)
+
+    order = {'order_Date': '2024-02-03', 'order_Value': 19.99, 'customer_ID': 2, 'book_ID': 4}
+    assert client.post('/orders', json=order, headers=token()).status_code == 201
+    assert client.post('/orders/bulk', json=[order, dict(order, book_ID=1)], headers=token()).status_code == 201
+    assert client.put('/orders/3', json=dict(order, order_Value=1.5, customer_ID=3), headers=token()).status_code == 200
+    assert client.patch('/orders/4', json={'order_Value': 3.25}, headers=token()).json['changed'] == ['order_Value']
+    assert client.delete('/orders/5', headers=token()).status_code == 200
+    assert client.delete('/books/2', headers=token()).status_code == 200
+    summaries_match_orders(sqlite_db)
+
+    response = client.delete('/orders/bulk', json=[1, 2, 5, 999], headers=token())
+    assert response.json['deleted'] == [1, 2] and response.json['not_found'] == [5, 999]
+    assert client.delete('/customers/bulk', json=[1, 3], headers=token()).status_code == 200
+    summaries_match_orders(sqlite_db)
+
+    top = client.get('/reports/top-books?limit=2', headers=token()).json
+    assert len(top) == 2 and top[0]['revenue'] >= top[1]['revenue']
+    value = client.get('/reports/customers/2', headers=token()).json
+    assert value['customer_ID'] == 2 and value['order_count'] > 0
+    unknown = client.get('/reports/customers/999', headers=token()).json
+    assert unknown == {'customer_ID': 999, 'order_count': 0, 'revenue': '0.00'}
+    months = client.get('/reports/revenue?period=month&from=2024-02-01&to=2024-02-29', headers=token()).json
+    assert [month['period'] for month in months] == ['2024-02']
+
+def test_reports_require_role(sqlite_db):
+    client = app.test_client()
+    assert client.get('/reports/top-books').status_code == 401
+    assert client.get('/reports/revenue', headers=token('customer')).status_code == 403
+    assert client.get('/reports/revenue?period=week', headers=token()).status_code == 400
+
+def test_queued_orders(sqlite_db, tmp_path, monkeypatch):
+    queue = OrderQueue(str(tmp_path / "orders.log"), lambda batch: api.write_queued_orders(app, batch), fsync=False)
+    monkeypatch.setattr(api, "order_queue", queue)
+    client = app.test_client()
+    order = {'order_Date': '2024-02-03', 'order_Value': 19.99, 'customer_ID': 2, 'book_ID': 4}
+    # SQLite stand-in for the MySQL foreign key on book_ID
+    conn = benchmark.SQLiteConnection(sqlite_db)
+    conn.cursor().execute(
+        "CREATE TRIGGER missing_book BEFORE INSERT ON Orders WHEN NEW.book_ID = 999"
+        " BEGIN SELECT RAISE(ABORT, 'foreign key constraint fails'); END"
+    )
+    conn.commit()
+    conn.close()
+
+    assert client.post('/orders', json={'order_Value': 1}, headers=token()).status_code == 400
+    responses = [client.post('/orders', json=dict(order, book_ID=book_id), headers=token()) for book_id in (4, 999, 1)]
+    assert [response.status_code for response in responses] == [202, 202, 202]
+    location = responses[0].headers['Location']
+    assert client.get(location, headers=token()).json['status'] == 'queued'
+
+    assert queue.flush() == 3
+    statuses = [client.get(response.headers['Location'], headers=token()) for response in responses]
+    assert [status.json['status'] for status in statuses] == ['created', 'failed', 'created']
+    assert statuses[0].json['order_ID'] < statuses[2].json['order_ID']
+    assert client.get(statuses[0].json['order'], headers=token()).json['book_ID'] == 4
+    assert client.get('/orders/tickets/unknown', headers=token()).status_code == 404
+    summaries_match_orders(sqlite_db)
+
+    # a replayed batch is not inserted again
+    ticket = responses[0].json['ticket']
+    assert api.write_queued_orders(app, [(ticket, order)]) == {ticket: statuses[0].json['order_ID']}
+    summaries_match_orders(sqlite_db)
+
+def test_queued_order_data_errors(sqlite_db, tmp_path, monkeypatch):
+    MySQLdb = pytest.importorskip("MySQLdb")
+    queue = OrderQueue(str(tmp_path / "orders.log"), lambda batch: api.write_queued_orders(app, batch), fsync=False)
+    monkeypatch.setattr(api, "order_queue", queue)
+    client = app.test_client()
+    order = {'order_Date': '2024-02-03', 'order_Value': 19.99, 'customer_ID': 2, 'book_ID': 4}
+
+    for bad in ({'order_Date': '2024-02-30'}, {'order_Value': 'abc'}, {'book_ID': 'x'}):
+        assert client.post('/orders', json=dict(order, **bad), headers=token()).status_code == 400
+
+    # MySQL reports some bad values as OperationalError; that fails the
+    # order alone, while a lost connection keeps the batch queued
+    insert_queued_orders = api.insert_queued_orders
+    errors = []
+
+    def insert_or_fail(app, batch):
+        if errors:
+            raise errors.pop()
+        if any(order['order_Value'] == 0.5 for _, order in batch):
+            raise MySQLdb.OperationalError(1366, "Incorrect decimal value")
+        return insert_queued_orders(app, batch)
+
+    monkeypatch.setattr(api, "insert_queued_orders", insert_or_fail)
+    responses = [client.post('/orders', json=dict(order, order_Value=value), headers=token()) for value in (0.5, 3, 4)]
+    errors.append(MySQLdb.OperationalError(2006, "MySQL server has gone away"))
+
+    with pytest.raises(RetryLater):
+        queue.flush()
+    assert queue.flush() == 3
+    statuses = [client.get(response.headers['Location'], headers=token()).json for response in responses]
+    assert [status['status'] for status in statuses] == ['failed', 'created', 'created']
+    assert 'Incorrect decimal value' in statuses[0]['error']
+    summaries_match_orders(sqlite_db)
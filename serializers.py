@@ -0,0 +1,199 @@
+import datetime
+import decimal
+import functools
+import json
+import operator
+import uuid
+from json.encoder import encode_basestring_ascii
+
+from werkzeug.http import http_date
+
+from resources import values_getter
+
+try:
+    import orjson
+except ImportError:  # optional, see requirements-fast.txt
+    orjson = None
+
+
+# JSON encoding for list responses
+#
+# Rows are encoded straight from cursor tuples using the row layout from
+# resources.projection(), without building a dict per row first (the stdlib
+# path) or with C-level dict(zip()) rows handed to orjson. Values come out
+# the way Flask's jsonify writes them, so switching encoders never changes a
+# document: dates and datetimes as HTTP dates, Decimal and UUID as strings.
+# Keys keep the resource's field order instead of being sorted.
+
+
+@functools.lru_cache(maxsize=4096)
+def format_date(value):
+    # http_date() is the expensive part of encoding a row; the same few
+    # hundred order dates repeat across a large response
+    return http_date(value)
+
+
+def default(value):
+    if isinstance(value, datetime.date):
+        return format_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode_float(value):
+    return json.dumps(value)
+
+
+def _encode_date(value):
+    return '"' + format_date(value) + '"'
+
+
+def _encode_string_value(value):
+    return '"' + str(value) + '"'
+
+
+def _encode_other(value):
+    return json.dumps(value, default=default, separators=(",", ":"))
+
+
+# exact type -> text encoder; anything else goes through _encode_other
+VALUE_ENCODERS = {
+    int: str,
+    str: encode_basestring_ascii,
+    type(None): lambda value: "null",
+    bool: lambda value: "true" if value else "false",
+    float: _encode_float,
+    decimal.Decimal: _encode_string_value,
+    uuid.UUID: _encode_string_value,
+    datetime.date: _encode_date,
+    datetime.datetime: _encode_date,
+}
+
+
+def encode_value(value):
+    return VALUE_ENCODERS.get(type(value), _encode_other)(value)
+
+
+class StdlibSerializer:
+    name = "stdlib"
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=default, separators=(",", ":")).encode("utf-8")
+
+    @functools.lru_cache(maxsize=256)
+    def _template(self, layout):
+        # [(prefix, index)] per field, e.g. ('{"order_ID":', 0), (',"order_Date":', 1)
+        field_index, embeds = layout
+        keys = [field for field, _ in field_index] + [name for name, _, _ in embeds]
+        prefixes = [("{" if i == 0 else ",") + encode_basestring_ascii(key) + ":" for i, key in enumerate(keys)]
+        fields = tuple(zip(prefixes, [index for _, index in field_index]))
+        nested = tuple(
+            (prefix, id_index, self._template((embed_index, ())))
+            for prefix, (_, id_index, embed_index) in zip(prefixes[len(field_index):], embeds)
+        )
+        return fields, nested
+
+    def _encode(self, template, row):
+        fields, nested = template
+        encoders = VALUE_ENCODERS
+        parts = [prefix + encoders.get(type(row[index]), _encode_other)(row[index]) for prefix, index in fields]
+        for prefix, id_index, embed in nested:
+            parts.append(prefix + ("null" if row[id_index] is None else self._encode(embed, row)))
+        return "".join(parts) + "}" if parts else "{}"
+
+    def row(self, layout):
+        # returns a function encoding one row as a JSON object (bytes)
+        template = self._template(layout)
+        return lambda row: self._encode(template, row).encode("utf-8")
+
+    def rows(self, layout, rows):
+        template = self._template(layout)
+        return ("[" + ",".join([self._encode(template, row) for row in rows]) + "]").encode("utf-8")
+
+    # rows as arrays of values, for the table format (see tabular.py)
+    def _encode_values(self, values):
+        encoders = VALUE_ENCODERS
+        return "[" + ",".join([encoders.get(type(value), _encode_other)(value) for value in values]) + "]"
+
+    def array(self, layout):
+        get_values = values_getter(layout)
+        return lambda row: self._encode_values(get_values(row)).encode("utf-8")
+
+    def arrays(self, layout, rows):
+        get_values = values_getter(layout)
+        return ("[" + ",".join([self._encode_values(get_values(row)) for row in rows]) + "]").encode("utf-8")
+
+
+class OrjsonSerializer:
+    name = "orjson"
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=default, option=self.options)
+
+    @functools.lru_cache(maxsize=256)
+    def _builder(self, layout):
+        # row -> dict, built with itemgetter and dict(zip()) in C when the
+        # layout has no embedded objects
+        field_index, embeds = layout
+        keys = tuple(field for field, _ in field_index)
+        getter = operator.itemgetter(*[index for _, index in field_index]) if keys else None
+
+        if len(keys) == 1:
+            flat = lambda row: {keys[0]: getter(row)}
+        elif keys:
+            flat = lambda row: dict(zip(keys, getter(row)))
+        else:
+            flat = lambda row: {}
+
+        if not embeds:
+            return flat
+
+        nested = tuple((name, id_index, self._builder((embed_index, ()))) for name, id_index, embed_index in embeds)
+
+        def build(row):
+            item = flat(row)
+            for name, id_index, embed in nested:
+                item[name] = None if row[id_index] is None else embed(row)
+            return item
+        return build
+
+    def row(self, layout):
+        build = self._builder(layout)
+        return lambda row: orjson.dumps(build(row), default=default, option=self.options)
+
+    def rows(self, layout, rows):
+        build = self._builder(layout)
+        return orjson.dumps([build(row) for row in rows], default=default, option=self.options)
+
+    def array(self, layout):
+        get_values = values_getter(layout)
+        return lambda row: orjson.dumps(get_values(row), default=default, option=self.options)
+
+    def arrays(self, layout, rows):
+        get_values = values_getter(layout)
+        return orjson.dumps([get_values(row) for row in rows], default=default, option=self.options)
+
+
+SERIALIZERS = {"stdlib": StdlibSerializer, "orjson": OrjsonSerializer}
+
+
+def create_serializer(name="auto"):
+    # "auto" picks orjson when it is installed
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown JSON_SERIALIZER: {name}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON_SERIALIZER is 'orjson' but orjson is not installed")
+    return SERIALIZERS[name]()
+
+
+def list_envelope(serializer, data, next_cursor, next_url):
+    # {"data": [...], "next_cursor": ..., "next": ...} around already encoded rows
+    return (
+        b'{"data":' + data
+        + b',"next_cursor":' + serializer.dumps(next_cursor)
+        + b',"next":' + serializer.dumps(next_url) + b"}"
+    )
@@ -0,0 +1,76 @@
+import datetime
+import decimal
+import json
+import pytest
+from flask import Flask
+from resources import RESOURCES, parse_page_args, projection, row_to_dict
+from serializers import StdlibSerializer, create_serializer, list_envelope, orjson
+
+flask_app = Flask(__name__)
+
+SERIALIZERS = [StdlibSerializer()]
+if orjson is not None:
+    SERIALIZERS.append(create_serializer("orjson"))
+
+ORDERS = [
+    (1, datetime.date(2024, 1, 5), decimal.Decimal("12.50"), 3, None),
+    (2, datetime.datetime(2024, 2, 1, 8, 30), decimal.Decimal("0.10"), None, 7),
+]
+
+def layout_for(name, args):
+    page, error_msg = parse_page_args(args, 1000, RESOURCES[name])
+    assert error_msg is None
+    return projection(RESOURCES[name], page)[1]
+
+def flask_encoding(layout, rows):
+    # what jsonify() produced for the same rows
+    with flask_app.app_context():
+        return json.loads(flask_app.json.dumps([row_to_dict(layout, row) for row in rows]))
+
+@pytest.mark.parametrize("serializer", SERIALIZERS, ids=lambda s: s.name)
+def test_rows_match_flask_encoding(serializer):
+    layout = layout_for("orders", {})
+    encoded = json.loads(serializer.rows(layout, ORDERS))
+
+    assert encoded == flask_encoding(layout, ORDERS)
+    assert encoded[0]["order_Date"] == "Fri, 05 Jan 2024 00:00:00 GMT"
+    assert encoded[0]["order_Value"] == "12.50"
+
+@pytest.mark.parametrize("serializer", SERIALIZERS, ids=lambda s: s.name)
+def test_embedded_rows_and_projection(serializer):
+    layout = layout_for("books", {"expand": "author", "fields": "book_Title", "sort": "publication_Date"})
+    rows = [
+        (1, datetime.date(1965, 8, 1), "Dün\"e", 3, "Frank", "Herbert"),
+        (2, None, "Orphan", None, None, None),
+    ]
+
+    assert json.loads(serializer.rows(layout, rows)) == flask_encoding(layout, rows)
+    assert json.loads(serializer.row(layout)(rows[1])) == {"book_Title": "Orphan", "author": None}
+
+@pytest.mark.parametrize("serializer", SERIALIZERS, ids=lambda s: s.name)
+def test_list_envelope(serializer):
+    layout = layout_for("orders", {"fields": "order_ID"})
+    body = list_envelope(serializer, serializer.rows(layout, ORDERS), 2, "/orders?after_id=2")
+
+    assert json.loads(body) == {"data": [{"order_ID": 1}, {"order_ID": 2}], "next_cursor": 2, "next": "/orders?after_id=2"}
+
+@pytest.mark.parametrize("serializer", SERIALIZERS, ids=lambda s: s.name)
+def test_arrays(serializer):
+    layout = layout_for("books", {"expand": "author", "fields": "book_Title", "sort": "publication_Date"})
+    rows = [
+        (1, datetime.date(1965, 8, 1), "Dün\"e", 3, "Frank", "Herbert"),
+        (2, None, "Orphan", None, None, None),
+    ]
+    expected = [["Dün\"e", "Frank", "Herbert"], ["Orphan", None, None]]
+
+    assert json.loads(serializer.arrays(layout, rows)) == expected
+    assert json.loads(serializer.array(layout)(rows[0])) == expected[0]
+    assert json.loads(serializer.arrays(layout_for("orders", {}), ORDERS[:1])) == [
+        [1, "Fri, 05 Jan 2024 00:00:00 GMT", "12.50", 3, None]
+    ]
+
+def test_create_serializer():
+    assert create_serializer("stdlib").name == "stdlib"
+    assert create_serializer("auto").name == ("orjson" if orjson is not None else "stdlib")
+    with pytest.raises(ValueError):
+        create_serializer("yaml")
@@ -0,0 +1,80 @@
+import csv
+import io
+
+from resources import layout_columns, values_getter
+from serializers import default
+
+try:
+    import msgpack
+except ImportError:  # optional, see requirements-fast.txt
+    msgpack = None
+
+
+# compact list formats for machine clients
+#
+# Every format sends the column names once and then one array of values per
+# row, taken straight from the cursor tuples (resources.values_getter()).
+# Embedded objects (?expand=) are flattened into "customer.customer_Name"
+# style columns, null when there is no related row. Values are the ones the
+# JSON responses carry: dates as HTTP dates, Decimal and UUID as strings.
+#
+# - table: {"columns": [...], "rows": [[...], ...]} (+ next_cursor / next)
+# - csv: a header line, then one line per row; null is an empty field
+# - msgpack: the table document as MessagePack, if msgpack is installed
+MEDIA_TYPES = {
+    "json": "application/json",
+    "table": "application/vnd.bookseller.table+json",
+    "csv": "text/csv",
+    "msgpack": "application/msgpack",
+}
+
+# formats this process can produce, the default first
+FORMATS = tuple(name for name in MEDIA_TYPES if name != "msgpack" or msgpack is not None)
+
+
+def choose_format(accept, formats=FORMATS):
+    # accept: werkzeug MIMEAccept (request.accept_mimetypes); JSON unless the
+    # client prefers another format
+    media_type = accept.best_match([MEDIA_TYPES[name] for name in formats])
+    for name in formats:
+        if MEDIA_TYPES[name] == media_type:
+            return name
+    return "json"
+
+
+def table_envelope(serializer, layout, data, page_links=None):
+    # data: already encoded rows as a JSON array; page_links: (next_cursor,
+    # next_url) for paginated responses
+    body = b'{"columns":' + serializer.dumps(layout_columns(layout)) + b',"rows":' + data
+    if page_links is not None:
+        next_cursor, next_url = page_links
+        body += b',"next_cursor":' + serializer.dumps(next_cursor) + b',"next":' + serializer.dumps(next_url)
+    return body + b"}"
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, str)):
+        return value
+    return default(value)
+
+
+def csv_rows(layout, rows, header=False):
+    get_values = values_getter(layout)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(layout_columns(layout))
+    writer.writerows([csv_value(value) for value in get_values(row)] for row in rows)
+    return out.getvalue().encode("utf-8")
+
+
+def msgpack_document(layout, rows, page_links=None):
+    get_values = values_getter(layout)
+    document = {"columns": layout_columns(layout), "rows": [get_values(row) for row in rows]}
+    if page_links is not None:
+        document["next_cursor"], document["next"] = page_links
+    return msgpack.packb(document, default=default)
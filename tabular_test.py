@@ -0,0 +1,73 @@
+import csv
+import datetime
+import decimal
+import io
+import json
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from resources import RESOURCES, layout_columns, parse_page_args, projection
+from serializers import StdlibSerializer
+from tabular import FORMATS, choose_format, csv_rows, msgpack, msgpack_document, table_envelope
+
+ORDERS = [
+    (1, datetime.date(2024, 1, 5), decimal.Decimal("12.50"), 3, None),
+    (2, datetime.date(2024, 2, 1), decimal.Decimal("0.10"), None, 7),
+]
+
+def layout_for(name, args):
+    page, error_msg = parse_page_args(args, 1000, RESOURCES[name])
+    assert error_msg is None
+    return projection(RESOURCES[name], page)[1]
+
+def accept(header):
+    return parse_accept_header(header, MIMEAccept)
+
+def test_choose_format():
+    assert choose_format(accept("")) == "json"
+    assert choose_format(accept("*/*")) == "json"
+    assert choose_format(accept("text/csv")) == "csv"
+    assert choose_format(accept("application/json;q=0.5, application/vnd.bookseller.table+json")) == "table"
+    assert choose_format(accept("image/png")) == "json"
+
+def test_columns_flatten_embedded_objects():
+    layout = layout_for("books", {"expand": "author", "fields": "book_Title,ISBN"})
+
+    assert layout_columns(layout) == ["book_Title", "ISBN", "author.author_FirstName", "author.author_LastName"]
+
+def test_table_envelope():
+    layout = layout_for("orders", {})
+    serializer = StdlibSerializer()
+    body = table_envelope(serializer, layout, serializer.arrays(layout, ORDERS), (2, "/orders?after_id=2&format=table"))
+
+    assert json.loads(body) == {
+        "columns": ["order_ID", "order_Date", "order_Value", "customer_ID", "book_ID"],
+        "rows": [
+            [1, "Fri, 05 Jan 2024 00:00:00 GMT", "12.50", 3, None],
+            [2, "Thu, 01 Feb 2024 00:00:00 GMT", "0.10", None, 7],
+        ],
+        "next_cursor": 2,
+        "next": "/orders?after_id=2&format=table",
+    }
+
+def test_csv_rows():
+    layout = layout_for("orders", {})
+    body = csv_rows(layout, ORDERS, header=True)
+
+    assert list(csv.reader(io.StringIO(body.decode("utf-8")))) == [
+        ["order_ID", "order_Date", "order_Value", "customer_ID", "book_ID"],
+        ["1", "Fri, 05 Jan 2024 00:00:00 GMT", "12.50", "3", ""],
+        ["2", "Thu, 01 Feb 2024 00:00:00 GMT", "0.10", "", "7"],
+    ]
+    assert csv_rows(layout, ORDERS[:1]).count(b"\n") == 1
+
+@pytest.mark.skipif(msgpack is None, reason="msgpack not installed")
+def test_msgpack_document():
+    layout = layout_for("orders", {"fields": "order_ID,order_Date"})
+    document = msgpack.unpackb(msgpack_document(layout, ORDERS))
+
+    assert "msgpack" in FORMATS
+    assert document == {
+        "columns": ["order_ID", "order_Date"],
+        "rows": [[1, "Fri, 05 Jan 2024 00:00:00 GMT"], [2, "Thu, 01 Feb 2024 00:00:00 GMT"]],
+    }
@@ -0,0 +1,115 @@
+import json
+import threading
+
+from journal import Journal
+
+
+# in-memory user registry keyed by username, backed by an append-only journal
+#
+# The journal is replayed once on first use; after that lookups are dict hits.
+# A lookup miss catches up with records appended by other worker processes
+# (only the new bytes are read), and registrations append a single record
+# instead of rewriting the whole file.
+class UserRegistry:
+    def __init__(self, path, legacy_path=None, fsync=True):
+        self.journal = Journal(path, fsync=fsync)
+        self.legacy_path = legacy_path
+        self._users = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _apply(self, records, reset):
+        if reset:
+            self._users.clear()
+
+        for record in records:
+            if record.get("op") == "add":
+                self._users[record["username"]] = {
+                    "username": record["username"],
+                    "password": record["password"],
+                    "role": record["role"],
+                }
+            elif record.get("op") == "password" and record["username"] in self._users:
+                self._users[record["username"]]["password"] = record["password"]
+
+    def _load(self):
+        if self._loaded:
+            return
+
+        if not self.journal.exists() and self.legacy_path:
+            self._import_legacy()
+
+        self._apply(*self.journal.read_new())
+        self._loaded = True
+
+    def _import_legacy(self):
+        # one-off migration from the old users.json store
+        try:
+            with open(self.legacy_path, "r") as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+
+        with self.journal.transaction() as f:
+            self._apply(*self.journal.read_new())
+            for user in legacy.get("users", []):
+                if user["username"] not in self._users:
+                    self._users[user["username"]] = dict(user)
+                    self.journal.append(f, {"op": "add", **user})
+
+    def _refresh(self):
+        self._apply(*self.journal.read_new())
+
+    def get(self, username):
+        with self._lock:
+            self._load()
+            user = self._users.get(username)
+            if user is None:
+                # may have been registered by another worker
+                self._refresh()
+                user = self._users.get(username)
+            return user
+
+    def add(self, username, password, role):
+        # returns False if the username is already taken
+        with self._lock:
+            self._load()
+            if username in self._users:
+                return False
+
+            with self.journal.transaction() as f:
+                self._refresh()
+                if username in self._users:
+                    return False
+
+                record = {"op": "add", "username": username, "password": password, "role": role}
+                self.journal.append(f, record)
+                self._apply([record], False)
+                return True
+
+    def set_password(self, username, password):
+        # e.g. after rehashing with a new cost factor
+        with self._lock:
+            self._load()
+            with self.journal.transaction() as f:
+                self._refresh()
+                if username not in self._users:
+                    return False
+
+                record = {"op": "password", "username": username, "password": password}
+                self.journal.append(f, record)
+                self._apply([record], False)
+                return True
+
+    def compact(self):
+        # drops superseded records, e.g. after many password rehashes
+        with self._lock:
+            self._load()
+            with self.journal.transaction():
+                self._refresh()
+                self.journal.rewrite([{"op": "add", **user} for user in self._users.values()])
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._users)
@@ -0,0 +1,58 @@
+import json
+from users import UserRegistry
+
+def test_add_and_get(tmp_path):
+    registry = UserRegistry(str(tmp_path / "users.log"))
+
+    assert registry.add('alice', 'hash', 'staff') is True
+    assert registry.add('alice', 'other', 'manager') is False
+    assert registry.get('alice')['role'] == 'staff'
+    assert registry.get('bob') is None
+
+def test_replay_from_log(tmp_path):
+    path = str(tmp_path / "users.log")
+    UserRegistry(path).add('alice', 'hash', 'staff')
+
+    registry = UserRegistry(path)
+    assert registry.get('alice')['password'] == 'hash'
+
+def test_sees_users_added_by_other_process(tmp_path):
+    path = str(tmp_path / "users.log")
+    worker_a = UserRegistry(path)
+    worker_b = UserRegistry(path)
+    assert worker_b.get('alice') is None
+
+    worker_a.add('alice', 'hash', 'staff')
+    assert worker_b.get('alice')['role'] == 'staff'
+    assert worker_b.add('alice', 'hash', 'staff') is False
+
+def test_torn_tail_is_ignored_and_truncated(tmp_path):
+    path = tmp_path / "users.log"
+    UserRegistry(str(path)).add('alice', 'hash', 'staff')
+    with open(path, "a") as f:
+        f.write('{"op": "add", "username": "bo')
+
+    registry = UserRegistry(str(path))
+    assert len(registry) == 1
+    registry.add('carol', 'hash', 'manager')
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["username"] for line in lines] == ['alice', 'carol']
+
+def test_imports_legacy_json(tmp_path):
+    legacy = tmp_path / "users.json"
+    legacy.write_text(json.dumps({"users": [{"username": "alice", "password": "hash", "role": "staff"}]}))
+
+    registry = UserRegistry(str(tmp_path / "users.log"), legacy_path=str(legacy))
+    assert registry.get('alice')['role'] == 'staff'
+    assert UserRegistry(str(tmp_path / "users.log")).get('alice') is not None
+
+def test_compact(tmp_path):
+    path = tmp_path / "users.log"
+    registry = UserRegistry(str(path))
+    registry.add('alice', 'hash', 'staff')
+    registry.add('bob', 'hash', 'staff')
+    registry.compact()
+
+    assert len(path.read_text().splitlines()) == 2
+    assert UserRegistry(str(path)).get('bob') is not None